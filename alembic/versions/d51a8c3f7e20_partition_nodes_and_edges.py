@@ -0,0 +1,113 @@
+"""Partition nodes and edges by graph_id
+
+Revision ID: d51a8c3f7e20
+Revises: 9c4d2e7b1a36
+Create Date: 2026-10-19 18:47:35.204961
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd51a8c3f7e20'
+down_revision: Union[str, None] = '9c4d2e7b1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Opt-in: rewriting nodes and edges copies the largest tables under lock, so the revision only partitions them
+# when asked explicitly (`alembic -x partitions=16 upgrade head`) and is a no-op otherwise
+PARTITIONS_ARGUMENT = 'partitions'
+
+# Foreign keys into nodes/edges: a partitioned table can only be referenced by a key containing graph_id
+REFERENCES = [
+    ('edges_source_id_fkey', 'edges', 'nodes', 'source_id'),
+    ('edges_target_id_fkey', 'edges', 'nodes', 'target_id'),
+    ('removed_nodes_node_id_fkey', 'removed_nodes', 'nodes', 'node_id'),
+    ('removed_edges_edge_id_fkey', 'removed_edges', 'edges', 'edge_id'),
+]
+INDEXES = {
+    'nodes': [
+        ('ix_nodes_id', ['id']),
+        ('ix_nodes_graph_id_name', ['graph_id', 'name']),
+        ('ix_nodes_graph_id_name_id', ['graph_id', 'name_id']),
+    ],
+    'edges': [
+        ('ix_edges_id', ['id']),
+        ('ix_edges_source_id', ['source_id']),
+        ('ix_edges_target_id', ['target_id']),
+    ],
+}
+FOREIGN_KEYS = {
+    'nodes': [
+        ('nodes_graph_id_fkey', 'graphs', 'graph_id', 'CASCADE'),
+        ('nodes_name_id_fkey', 'node_names', 'name_id', None),
+    ],
+    'edges': [
+        ('edges_graph_id_fkey', 'graphs', 'graph_id', 'CASCADE'),
+    ],
+}
+
+
+def requested_partitions() -> int:
+    if op.get_context().dialect.name != 'postgresql':
+        return 0
+    return int(context.get_x_argument(as_dictionary=True).get(PARTITIONS_ARGUMENT, 0))
+
+
+def is_partitioned(table: str) -> bool:
+    if op.get_context().dialect.name != 'postgresql':
+        return False
+    return op.get_bind().scalar(sa.text(f"SELECT relkind FROM pg_class WHERE oid = '{table}'::regclass")) == 'p'
+
+
+def partition_ddl(table: str, partitions: int) -> list[str]:
+    return [
+        f'CREATE TABLE {table}_p{remainder} PARTITION OF {table} '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    ]
+
+
+def rebuild_table(table: str, partitions: int) -> None:
+    old_table = f'{table}_old'
+    op.rename_table(table, old_table)
+
+    partition_by = ' PARTITION BY HASH (graph_id)' if partitions else ''
+    op.execute(f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS){partition_by}')
+    for statement in partition_ddl(table, partitions):
+        op.execute(statement)
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.drop_table(old_table)
+
+    op.create_primary_key(f'{table}_pkey', table, ['id', 'graph_id'] if partitions else ['id'])
+    for name, referent, column, ondelete in FOREIGN_KEYS[table]:
+        op.create_foreign_key(name, table, referent, [column], ['id'], ondelete=ondelete)
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    partitions = requested_partitions()
+    if not partitions:
+        return
+
+    for name, source, _, _ in REFERENCES:
+        op.drop_constraint(name, source, type_='foreignkey')
+    rebuild_table('nodes', partitions)
+    rebuild_table('edges', partitions)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not is_partitioned('nodes'):
+        return
+
+    rebuild_table('edges', 0)
+    rebuild_table('nodes', 0)
+    for name, source, referent, column in REFERENCES:
+        op.create_foreign_key(name, source, referent, [column], ['id'], ondelete='CASCADE')
@@ -2,11 +2,85 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
-    POSTGRES_HOST: str
-    POSTGRES_PORT: int
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
-    POSTGRES_DB: str
+    DB_BACKEND: str = "postgresql"
+
+    POSTGRES_HOST: str = "localhost"
+    POSTGRES_PORT: int = 5432
+    POSTGRES_USER: str = "postgres"
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_DB: str = "dag_service_db"
+
+    SQLITE_PATH: str = "dag_service.db"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    SQLITE_BUSY_TIMEOUT: int = 5000
+
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8080
+    WEB_WORKERS: int = 0
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    WARMUP_POOL: bool = True
+    WARMUP_GRAPH_IDS: list[int] = []
+
+    SHARD_URLS: list[str] = []
+    SHARD_BUCKETS: int = 1024
+
+    GRAPH_CACHE_SIZE: int = 1024
+    GRAPH_VERSION_MAX_DEPTH: int = 16
+    INGEST_WORKERS: int = 2
+    INGEST_MAX_QUEUED: int = 64
+    INGEST_JOB_LEASE_SECONDS: int = 600
+    INGEST_RECLAIM_INTERVAL_SECONDS: float = 60.0
+    MAX_BODY_BYTES: int = 64 * 1024 * 1024
+    MAX_GRAPH_NODES: int = 200000
+    ANCESTOR_INDEX_MAX_NODES: int = 10000
+    MAX_GRAPH_EDGES: int = 1000000
+    MAX_BATCH_GRAPHS: int = 1000
+    ADMISSION_MAX_CONCURRENT: int = 4
+    ADMISSION_MAX_QUEUED: int = 16
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0
+    ADMISSION_RETRY_AFTER: int = 1
+    MAX_DECOMPRESSED_BYTES: int = 256 * 1024 * 1024
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    CPU_POOL_WORKERS: int = 2
+    CPU_OFFLOAD_MIN_SIZE: int = 20000
+    PURGE_IN_BACKGROUND: bool = True
+    PURGE_BATCH_SIZE: int = 5000
+    PURGE_THROTTLE_SECONDS: float = 0.1
+    PURGE_INTERVAL_SECONDS: float = 600.0
+
+    NODE_NAME_DICTIONARY: bool = False
+    NODE_NAME_CACHE_SIZE: int = 65536
+
+    EXPORT_BATCH_SIZE: int = 50000
+    FEED_BATCH_SIZE: int = 500
+    FEED_POLL_INTERVAL: float = 1.0
+    FEED_RETENTION_SECONDS: int = 7 * 24 * 3600
+    FEED_GAP_SECONDS: float = 5.0
+
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "profiles"
+    TRACING_EXPORTER: str = ""
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_SAMPLE_RATE: float = 1.0
+
+    @property
+    def DATABASE_URL(self) -> str:
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+pysqlite:///{self.SQLITE_PATH}"
+        return self.DATABASE_URL_psycopg
+
+    @property
+    def USES_SQLITE(self) -> bool:
+        return any(url.startswith("sqlite") for url in self.SHARD_URLS or [self.DATABASE_URL])
 
     @property
     def DATABASE_URL_psycopg(self):
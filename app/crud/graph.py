@@ -1,59 +1,801 @@
-from app.models.graph import Graph, Node, Edge
-from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.shards import shard_router
+from app.db.writer import single_writer
+from app.models.event import GraphEvent
+from app.models.graph import Graph, Node, Edge, RemovedNode, RemovedEdge, NodeName
+from app.models.sequence import IdHighWaterMark
+from app.schemas.graph import Direction
+from app.utils.cache import node_name_cache
+from app.utils.feed import change_feed
+from app.utils.graph import depth_and_width
+from app.utils.tracing import traced
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import select, func, update, delete, or_, exists, bindparam, ColumnElement, Select, Row, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
 
 
 class NotFoundError(Exception):
     pass
 
 
-def db_create_graph(db: Session, names: list[str], edges: list[tuple[str, str]]) -> Graph:
-    graph: Graph = Graph()
-    db.add(graph)
-    db.flush()
-    graph_id: int = graph.id
+class ConflictError(Exception):
+    pass
 
-    nodes: list[Node] = [Node(name=name, graph_id=graph_id) for name in names]
-    db.bulk_save_objects(nodes)
-    db.flush()
 
-    rows = (
-        db.query(Node.id, Node.name)
-        .filter(Node.graph_id == graph_id)
-        .all()
+GRAPH_EVENTS_LOCK_KEY = 0x67726170
+# High water mark row holding the last graph event id removed by the retention window
+EXPIRED_EVENTS_MARK = "graph_events.expired"
+GRAPH_PURGE_LOCK_KEY = 0x70757267
+
+
+def _get_name_ids(db: Session, names: list[str]) -> dict[str, int]:
+    name_ids: dict[str, int] = node_name_cache.get_ids(names)
+    missing: list[str] = [name for name in dict.fromkeys(names) if name not in name_ids]
+    if not missing:
+        return name_ids
+
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        insert(NodeName).on_conflict_do_nothing(index_elements=[NodeName.name]),
+        [{"name": name} for name in missing],
     )
-    name_to_id: dict[str, int] = {name: _id for _id, name in rows}
+    name_ids.update(db.execute(select(NodeName.name, NodeName.id).where(NodeName.name.in_(missing))).all())
+    return name_ids
+
+
+def _load_node_names(db: Session, nodes: list[Node]) -> None:
+    name_ids: set[int] = {node.name_id for node in nodes if node.raw_name is None}
+    names: dict[int, str] = node_name_cache.get_names(name_ids)
+    missing: set[int] = name_ids - names.keys()
+    if missing:
+        loaded: dict[str, int] = dict(
+            db.execute(select(NodeName.name, NodeName.id).where(NodeName.id.in_(missing))).all()
+        )
+        node_name_cache.put(loaded)
+        names.update({name_id: name for name, name_id in loaded.items()})
+    for node in nodes:
+        if node.raw_name is None:
+            node.dictionary_name = names[node.name_id]
+
+
+def _node_name_condition(db: Session, node: type[Node], names: list[str]) -> ColumnElement[bool]:
+    condition: ColumnElement[bool] = node.raw_name.in_(names)
+    if not settings.NODE_NAME_DICTIONARY:
+        return condition
+
+    name_ids: dict[str, int] = node_name_cache.get_ids(names)
+    missing: list[str] = [name for name in names if name not in name_ids]
+    if missing:
+        loaded: dict[str, int] = dict(
+            db.execute(select(NodeName.name, NodeName.id).where(NodeName.name.in_(missing))).all()
+        )
+        node_name_cache.put(loaded)
+        name_ids.update(loaded)
+    if not name_ids:
+        return condition
+    return or_(condition, node.name_id.in_(list(name_ids.values())))
+
+
+def _node_name_column(node: type[Node], node_name: type[NodeName]) -> ColumnElement[str]:
+    return func.coalesce(node.raw_name, node_name.name)
+
+
+def _insert_nodes_and_edges(db: Session,
+                            graph_id: int,
+                            names: list[str],
+                            edges: list[tuple[str, str]],
+                            node_weights: dict[str, float],
+                            edge_weights: dict[tuple[str, str], float],
+                            name_to_id: dict[str, int]) -> dict[str, int]:
+    name_ids: dict[str, int] = _get_name_ids(db, names) if settings.NODE_NAME_DICTIONARY and names else {}
+    if name_ids:
+        nodes: list[Node] = [
+            Node(name_id=name_ids[name], graph_id=graph_id, weight=node_weights.get(name)) for name in names
+        ]
+        db.bulk_save_objects(nodes)
+        db.flush()
+
+        id_to_name: dict[int, str] = {name_id: name for name, name_id in name_ids.items()}
+        rows = db.query(Node.id, Node.name_id).filter(Node.graph_id == graph_id).all()
+        name_to_id.update({id_to_name[name_id]: _id for _id, name_id in rows})
+    else:
+        nodes = [Node(name=name, graph_id=graph_id, weight=node_weights.get(name)) for name in names]
+        db.bulk_save_objects(nodes)
+        db.flush()
+
+        rows = (
+            db.query(Node.id, Node.raw_name)
+            .filter(Node.graph_id == graph_id)
+            .all()
+        )
+        name_to_id.update({name: _id for _id, name in rows})
 
     edge_objs = [
         Edge(
             graph_id=graph_id,
             source_id=name_to_id[source],
             target_id=name_to_id[target],
+            weight=edge_weights.get((source, target)),
         )
         for source, target in edges
     ]
     db.bulk_save_objects(edge_objs)
+    return name_ids
+
+
+def _add_event(db: Session, event_type: str, graph_id: int, **payload) -> None:
+    # Events of one graph must become visible in id order, otherwise a reader following the graph could pass an
+    # id whose transaction commits later. The transaction-level lock is keyed by graph, so only writers of the same
+    # graph wait for each other; the feed of all graphs tolerates the resulting gaps instead (see routers.events).
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key, CAST(:graph_id % 2147483647 AS integer))"),
+                   {"key": GRAPH_EVENTS_LOCK_KEY, "graph_id": graph_id})
+    db.add(GraphEvent(graph_id=graph_id, type=event_type, payload=payload))
 
+
+@traced
+@single_writer.serialized
+def db_create_graph(db: Session,
+                    names: list[str],
+                    edges: list[tuple[str, str]],
+                    node_weights: dict[str, float] | None = None,
+                    edge_weights: dict[tuple[str, str], float] | None = None,
+                    parent_id: int | None = None,
+                    content_hash: str | None = None,
+                    is_reduced: bool = False,
+                    colocate_with: int | None = None) -> Graph:
+    graph: Graph = Graph(id=shard_router.allocate_id(db, Graph, parent_id if parent_id is not None else colocate_with),
+                         parent_id=parent_id, content_hash=content_hash, is_reduced=is_reduced)
+    db.add(graph)
+    db.flush()
+
+    name_ids: dict[str, int] = _insert_nodes_and_edges(
+        db, graph.id, names, edges, node_weights or {}, edge_weights or {}, {}
+    )
+    _add_event(db, "graph_created", graph.id, parent_id=parent_id)
     db.commit()
+    node_name_cache.put(name_ids)
+    change_feed.notify()
 
     return graph
 
 
+@traced
 def db_get_graph_by_id(db: Session, graph_id: int) -> Graph:
-    graph: Graph | None = db.query(Graph).filter(Graph.id == graph_id).first()
+    graph: Graph | None = db.query(Graph).filter(Graph.id == graph_id, Graph.is_deleted.is_(False)).first()
     if graph is None:
         raise NotFoundError("Graph not found")
     return graph
 
 
+@traced
+def db_get_graph_id_by_content_hash(db: Session, content_hash: str) -> int | None:
+    graph_ids: list[int] = []
+    for shard_db in shard_router.each_shard(db):
+        graph_id: int | None = shard_db.scalar(
+            select(func.min(Graph.id))
+            .where(Graph.content_hash == content_hash, Graph.is_deleted.is_(False))
+        )
+        if graph_id is not None:
+            graph_ids.append(graph_id)
+    return min(graph_ids, default=None)
+
+
+def _get_chain_ids(db: Session, graph: Graph) -> list[int]:
+    if graph.depth == 0:
+        return [graph.id]
+
+    chain = (
+        select(Graph.id, Graph.parent_id, Graph.depth)
+        .where(Graph.id == graph.id)
+        .cte("chain", recursive=True)
+    )
+    chain = chain.union_all(
+        select(Graph.id, Graph.parent_id, Graph.depth)
+        .join(chain, Graph.id == chain.c.parent_id)
+        .where(chain.c.depth > 0)
+    )
+    return list(db.scalars(select(chain.c.id)))
+
+
+def _get_removed_ids(db: Session, chain_ids: list[int]) -> tuple[set[int], set[int]]:
+    if len(chain_ids) == 1:
+        return set(), set()
+
+    removed_node_ids: set[int] = set(
+        db.scalars(select(RemovedNode.node_id).where(RemovedNode.graph_id.in_(chain_ids)))
+    )
+    removed_edge_ids: set[int] = set(
+        db.scalars(select(RemovedEdge.edge_id).where(RemovedEdge.graph_id.in_(chain_ids)))
+    )
+    return removed_node_ids, removed_edge_ids
+
+
+def _has_dependent_versions(db: Session, graph_id: int) -> bool:
+    return db.query(Graph.id).filter(
+        Graph.parent_id == graph_id,
+        Graph.depth > 0,
+        Graph.is_deleted.is_(False),
+    ).first() is not None
+
+
+@traced
+def db_get_graph_contents(db: Session, graph: Graph) -> tuple[list[Node], list[Edge]]:
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    removed_node_ids, removed_edge_ids = _get_removed_ids(db, chain_ids)
+
+    nodes: list[Node] = [
+        node for node in db.query(Node).filter(Node.graph_id.in_(chain_ids)).order_by(Node.id)
+        if node.id not in removed_node_ids
+    ]
+    _load_node_names(db, nodes)
+    edges: list[Edge] = [
+        edge for edge in db.query(Edge).filter(Edge.graph_id.in_(chain_ids)).order_by(Edge.id)
+        if edge.id not in removed_edge_ids
+           and edge.source_id not in removed_node_ids
+           and edge.target_id not in removed_node_ids
+    ]
+    return nodes, edges
+
+
+def _get_chains(db: Session, graphs: list[Graph]) -> dict[int, list[int]]:
+    chains: dict[int, list[int]] = {graph.id: [graph.id] for graph in graphs}
+    versioned_ids: list[int] = [graph.id for graph in graphs if graph.depth > 0]
+    if not versioned_ids:
+        return chains
+
+    chain = (
+        select(Graph.id.label("root_id"), Graph.id, Graph.parent_id, Graph.depth)
+        .where(Graph.id.in_(versioned_ids))
+        .cte("chains", recursive=True)
+    )
+    chain = chain.union_all(
+        select(chain.c.root_id, Graph.id, Graph.parent_id, Graph.depth)
+        .join(chain, Graph.id == chain.c.parent_id)
+        .where(chain.c.depth > 0)
+    )
+    for root_id, graph_id in db.execute(select(chain.c.root_id, chain.c.id).where(chain.c.id != chain.c.root_id)):
+        chains[root_id].append(graph_id)
+    return chains
+
+
+@traced
+def db_get_graphs_contents(db: Session, graph_ids: list[int]) -> dict[int, tuple[Graph, list[Node], list[Edge]]]:
+    graphs: list[Graph] = list(db.scalars(
+        select(Graph).where(Graph.id.in_(graph_ids), Graph.is_deleted.is_(False))
+    ))
+    chains: dict[int, list[int]] = _get_chains(db, graphs)
+    all_ids: set[int] = {graph_id for chain_ids in chains.values() for graph_id in chain_ids}
+
+    removed_nodes: dict[int, set[int]] = defaultdict(set)
+    removed_edges: dict[int, set[int]] = defaultdict(set)
+    if any(graph.depth > 0 for graph in graphs):
+        for graph_id, node_id in db.execute(
+                select(RemovedNode.graph_id, RemovedNode.node_id).where(RemovedNode.graph_id.in_(all_ids))
+        ):
+            removed_nodes[graph_id].add(node_id)
+        for graph_id, edge_id in db.execute(
+                select(RemovedEdge.graph_id, RemovedEdge.edge_id).where(RemovedEdge.graph_id.in_(all_ids))
+        ):
+            removed_edges[graph_id].add(edge_id)
+
+    nodes_by_graph: dict[int, list[Node]] = defaultdict(list)
+    all_nodes: list[Node] = list(db.scalars(select(Node).where(Node.graph_id.in_(all_ids)).order_by(Node.id)))
+    _load_node_names(db, all_nodes)
+    for node in all_nodes:
+        nodes_by_graph[node.graph_id].append(node)
+    edges_by_graph: dict[int, list[Edge]] = defaultdict(list)
+    for edge in db.scalars(select(Edge).where(Edge.graph_id.in_(all_ids)).order_by(Edge.id)):
+        edges_by_graph[edge.graph_id].append(edge)
+
+    contents: dict[int, tuple[Graph, list[Node], list[Edge]]] = {}
+    for graph in graphs:
+        chain_ids: list[int] = chains[graph.id]
+        removed_node_ids: set[int] = set().union(*(removed_nodes[graph_id] for graph_id in chain_ids))
+        removed_edge_ids: set[int] = set().union(*(removed_edges[graph_id] for graph_id in chain_ids))
+        nodes: list[Node] = sorted(
+            (node for graph_id in chain_ids for node in nodes_by_graph[graph_id] if node.id not in removed_node_ids),
+            key=lambda node: node.id,
+        )
+        edges: list[Edge] = sorted(
+            (
+                edge for graph_id in chain_ids for edge in edges_by_graph[graph_id]
+                if edge.id not in removed_edge_ids
+                   and edge.source_id not in removed_node_ids
+                   and edge.target_id not in removed_node_ids
+            ),
+            key=lambda edge: edge.id,
+        )
+        contents[graph.id] = graph, nodes, edges
+    return contents
+
+
+def _node_removed(chain_ids: list[int], node_id: ColumnElement[int]) -> ColumnElement[bool]:
+    return exists().where(RemovedNode.graph_id.in_(chain_ids), RemovedNode.node_id == node_id)
+
+
+def _live_conditions(graph: Graph,
+                     chain_ids: list[int]) -> tuple[list[ColumnElement[bool]], list[ColumnElement[bool]]]:
+    if graph.depth == 0:
+        return [Node.graph_id == graph.id], [Edge.graph_id == graph.id]
+
+    # Anti-joins against the removal tables, so the statement size does not grow with the removed ids
+    node_conditions = [Node.graph_id.in_(chain_ids), ~_node_removed(chain_ids, Node.id)]
+    edge_conditions = [
+        Edge.graph_id.in_(chain_ids),
+        ~exists().where(RemovedEdge.graph_id.in_(chain_ids), RemovedEdge.edge_id == Edge.id),
+        ~_node_removed(chain_ids, Edge.source_id),
+        ~_node_removed(chain_ids, Edge.target_id),
+    ]
+    return node_conditions, edge_conditions
+
+
+@traced
+def db_get_graph_stats(db: Session, graph: Graph) -> dict[str, int]:
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    node_conditions, edge_conditions = _live_conditions(graph, chain_ids)
+
+    nodes_cnt: int = db.scalar(select(func.count(Node.id)).where(*node_conditions))
+    edges_cnt, with_out_edges, with_in_edges = db.execute(
+        select(
+            func.count(Edge.id),
+            func.count(Edge.source_id.distinct()),
+            func.count(Edge.target_id.distinct()),
+        ).where(*edge_conditions)
+    ).one()
+
+    out_degrees = select(func.count(Edge.id).label("degree")).where(*edge_conditions).group_by(Edge.source_id)
+    in_degrees = select(func.count(Edge.id).label("degree")).where(*edge_conditions).group_by(Edge.target_id)
+    max_out_degree: int | None = db.scalar(select(func.max(out_degrees.subquery().c.degree)))
+    max_in_degree: int | None = db.scalar(select(func.max(in_degrees.subquery().c.degree)))
+
+    node_ids: list[int] = list(db.scalars(select(Node.id).where(*node_conditions)))
+    edges: list[tuple[int, int]] = [
+        (source_id, target_id)
+        for source_id, target_id in db.execute(select(Edge.source_id, Edge.target_id).where(*edge_conditions))
+    ]
+    depth, width = depth_and_width(node_ids, edges)
+
+    return {
+        "nodes": nodes_cnt,
+        "edges": edges_cnt,
+        "sources": nodes_cnt - with_in_edges,
+        "sinks": nodes_cnt - with_out_edges,
+        "max_in_degree": max_in_degree or 0,
+        "max_out_degree": max_out_degree or 0,
+        "depth": depth,
+        "width": width,
+    }
+
+
+@traced
+@single_writer.serialized
+def db_create_graph_version(db: Session,
+                            parent: Graph,
+                            parent_nodes: list[Node],
+                            parent_edges: list[Edge],
+                            add_names: list[str],
+                            remove_names: list[str],
+                            add_edges: list[tuple[str, str]],
+                            remove_edges: list[tuple[str, str]],
+                            node_weights: dict[str, float] | None = None,
+                            edge_weights: dict[tuple[str, str], float] | None = None) -> Graph:
+    node_weights = node_weights or {}
+    edge_weights = edge_weights or {}
+    removed_names: set[str] = set(remove_names)
+    removed_pairs: set[tuple[str, str]] = set(remove_edges)
+
+    if parent.depth + 1 > settings.GRAPH_VERSION_MAX_DEPTH:
+        names: list[str] = [node.name for node in parent_nodes if node.name not in removed_names] + add_names
+        kept_edges: list[Edge] = [
+            edge for edge in parent_edges
+            if edge.source not in removed_names
+               and edge.target not in removed_names
+               and (edge.source, edge.target) not in removed_pairs
+        ]
+        return db_create_graph(
+            db,
+            names,
+            [(edge.source, edge.target) for edge in kept_edges] + add_edges,
+            node_weights={node.name: node.weight for node in parent_nodes if node.weight is not None} | node_weights,
+            edge_weights={(edge.source, edge.target): edge.weight for edge in kept_edges if edge.weight is not None}
+                         | edge_weights,
+            parent_id=parent.id,
+            is_reduced=parent.is_reduced,
+        )
+
+    graph: Graph = Graph(id=shard_router.allocate_id(db, Graph, colocate_with=parent.id),
+                         parent_id=parent.id, depth=parent.depth + 1, is_reduced=parent.is_reduced)
+    db.add(graph)
+    db.flush()
+
+    name_to_id: dict[str, int] = {node.name: node.id for node in parent_nodes if node.name not in removed_names}
+    db.bulk_save_objects([
+        RemovedNode(graph_id=graph.id, node_id=node.id)
+        for node in parent_nodes if node.name in removed_names
+    ])
+    db.bulk_save_objects([
+        RemovedEdge(graph_id=graph.id, edge_id=edge.id)
+        for edge in parent_edges if (edge.source, edge.target) in removed_pairs
+    ])
+    name_ids: dict[str, int] = _insert_nodes_and_edges(
+        db, graph.id, add_names, add_edges, node_weights, edge_weights, name_to_id
+    )
+    _add_event(db, "graph_created", graph.id, parent_id=parent.id)
+    db.commit()
+    node_name_cache.put(name_ids)
+    change_feed.notify()
+
+    return graph
+
+
+@traced
+@single_writer.serialized
+def db_encode_node_names(db: Session, batch_size: int) -> int:
+    rows = db.execute(
+        select(Node.id, Node.graph_id, Node.raw_name)
+        .where(Node.name_id.is_(None))
+        .order_by(Node.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    name_ids: dict[str, int] = _get_name_ids(db, [name for _, _, name in rows])
+    nodes = Node.__table__
+    db.execute(
+        update(nodes)
+        .where(nodes.c.id == bindparam("node_id"), nodes.c.graph_id == bindparam("node_graph_id"))
+        .values(name_id=bindparam("node_name_id"), name=None),
+        [
+            {"node_id": _id, "node_graph_id": graph_id, "node_name_id": name_ids[name]}
+            for _id, graph_id, name in rows
+        ],
+    )
+    db.commit()
+    node_name_cache.put(name_ids)
+    return len(rows)
+
+
+@traced
+@single_writer.serialized
 def db_delete_node(db: Session, graph_id: int, node_name: str) -> None:
     graph: Graph = db_get_graph_by_id(db, graph_id)
+    if _has_dependent_versions(db, graph_id):
+        raise ConflictError("Graph has dependent versions")
 
-    node: Node | None = db.query(Node).filter(
-        Node.graph_id == graph_id,
-        Node.name == node_name
-    ).first()
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    removed_node_ids, removed_edge_ids = _get_removed_ids(db, chain_ids)
+    node: Node | None = next(
+        (
+            node for node in db.query(Node).filter(
+                Node.graph_id.in_(chain_ids),
+                _node_name_condition(db, Node, [node_name])
+            )
+            if node.id not in removed_node_ids
+        ),
+        None,
+    )
     if node is None:
         raise NotFoundError("Node not found")
 
-    db.delete(node)
+    source, target = aliased(Node), aliased(Node)
+    source_name, target_name = aliased(NodeName), aliased(NodeName)
+    node_edges: list[Row] = db.execute(
+        select(_node_name_column(source, source_name), _node_name_column(target, target_name))
+        .select_from(Edge)
+        .join(source, Edge.source_id == source.id)
+        .join(target, Edge.target_id == target.id)
+        .outerjoin(source_name, source.name_id == source_name.id)
+        .outerjoin(target_name, target.name_id == target_name.id)
+        .where(
+            Edge.graph_id.in_(chain_ids),
+            or_(Edge.source_id == node.id, Edge.target_id == node.id),
+            Edge.id.notin_(removed_edge_ids),
+            Edge.source_id.notin_(removed_node_ids),
+            Edge.target_id.notin_(removed_node_ids),
+        )
+        .order_by(Edge.id)
+    ).all()
+
+    if node.graph_id == graph_id:
+        db.execute(delete(Edge).where(
+            Edge.graph_id == graph_id,
+            or_(Edge.source_id == node.id, Edge.target_id == node.id),
+        ))
+        db.execute(delete(Node).where(Node.graph_id == graph_id, Node.id == node.id))
+    else:
+        db.add(RemovedNode(graph_id=graph_id, node_id=node.id))
+    graph.version += 1
+    graph.content_hash = None
+    _add_event(db, "node_deleted", graph_id, version=graph.version, node=node_name,
+               edges=[list(edge) for edge in node_edges])
+    db.commit()
+    change_feed.notify()
+
+
+@traced
+@single_writer.serialized
+def db_delete_graph(db: Session, graph_id: int) -> None:
+    graph: Graph = db_get_graph_by_id(db, graph_id)
+    if _has_dependent_versions(db, graph_id):
+        raise ConflictError("Graph has dependent versions")
+
+    graph.is_deleted = True
+    graph.content_hash = None
+    _add_event(db, "graph_deleted", graph_id)
+    db.commit()
+    change_feed.notify()
+
+
+@traced
+def db_get_deleted_graph_ids(db: Session) -> list[int]:
+    return list(db.scalars(select(Graph.id).where(Graph.is_deleted.is_(True)).order_by(Graph.id.desc())))
+
+
+@contextmanager
+def db_purge_lock(db: Session) -> Iterator[bool]:
+    # Every worker process runs a purger; the session-level lock lets one of them purge a database while the
+    # others skip it. It is held on a connection of its own because the purge commits after every batch.
+    if db.get_bind().dialect.name != "postgresql":
+        yield True
+        return
+    with db.get_bind().connect() as conn:
+        if not conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": GRAPH_PURGE_LOCK_KEY}):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": GRAPH_PURGE_LOCK_KEY})
+
+
+@traced
+@single_writer.serialized
+def db_purge_graph_batch(db: Session, graph_id: int, batch_size: int) -> bool:
+    for model in (Edge, Node):
+        batch = select(model.id).where(model.graph_id == graph_id).limit(batch_size)
+        result = db.execute(
+            delete(model)
+            .where(model.graph_id == graph_id, model.id.in_(batch.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            db.commit()
+            return False
+
+    db.execute(delete(RemovedEdge).where(RemovedEdge.graph_id == graph_id))
+    db.execute(delete(RemovedNode).where(RemovedNode.graph_id == graph_id))
+    db.execute(delete(GraphEvent).where(GraphEvent.graph_id == graph_id, GraphEvent.type != "graph_deleted"))
+    db.execute(
+        update(Graph)
+        .where(Graph.parent_id == graph_id)
+        .values(parent_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(Graph).where(Graph.id == graph_id).execution_options(synchronize_session=False))
+    db.commit()
+    return True
+
+
+@traced
+@single_writer.serialized
+def db_delete_expired_events(db: Session, before: datetime, batch_size: int) -> int:
+    batch = select(GraphEvent.id).where(GraphEvent.created_at < before).order_by(GraphEvent.id).limit(batch_size)
+    last_id: int | None = db.scalar(select(func.max(batch.subquery().c.id)))
+    if last_id is None:
+        return 0
+    result = db.execute(
+        delete(GraphEvent)
+        .where(GraphEvent.id <= last_id, GraphEvent.created_at < before)
+        .execution_options(synchronize_session=False)
+    )
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        insert(IdHighWaterMark)
+        .values(table_name=EXPIRED_EVENTS_MARK, last_id=0)
+        .on_conflict_do_nothing(index_elements=[IdHighWaterMark.table_name])
+    )
+    db.execute(
+        update(IdHighWaterMark)
+        .where(IdHighWaterMark.table_name == EXPIRED_EVENTS_MARK, IdHighWaterMark.last_id < last_id)
+        .values(last_id=last_id)
+    )
+    db.commit()
+    return result.rowcount
+
+
+@traced
+def db_get_expired_event_id(db: Session) -> int:
+    return db.scalar(select(IdHighWaterMark.last_id).where(IdHighWaterMark.table_name == EXPIRED_EVENTS_MARK)) or 0
+
+
+@traced
+def db_get_graph_ids_in_range(db: Session, start_id: int, end_id: int) -> list[int]:
+    return list(db.scalars(
+        select(Graph.id)
+        .where(Graph.id.between(start_id, end_id), Graph.is_deleted.is_(False))
+        .order_by(Graph.id)
+    ))
+
+
+def _iter_batches(db: Session, query: Select, id_column: ColumnElement[int], batch_size: int) -> Iterator[list[Row]]:
+    last_id: int = 0
+    while rows := db.execute(query.where(id_column > last_id).order_by(id_column).limit(batch_size)).all():
+        yield rows
+        last_id = rows[-1][0]
+
+
+@traced
+def db_iter_graph_nodes(db: Session, graph: Graph, batch_size: int) -> Iterator[list[Row]]:
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    node_conditions, _ = _live_conditions(graph, chain_ids)
+    query: Select = (
+        select(Node.id, _node_name_column(Node, NodeName))
+        .outerjoin(NodeName, Node.name_id == NodeName.id)
+        .where(*node_conditions)
+    )
+    yield from _iter_batches(db, query, Node.id, batch_size)
+
+
+@traced
+def db_iter_graph_edges(db: Session, graph: Graph, batch_size: int) -> Iterator[list[Row]]:
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    _, edge_conditions = _live_conditions(graph, chain_ids)
+    query: Select = select(Edge.id, Edge.source_id, Edge.target_id).where(*edge_conditions)
+    yield from _iter_batches(db, query, Edge.id, batch_size)
+
+
+@traced
+def db_get_events(db: Session, since: int, graph_id: int | None, limit: int | None) -> list[GraphEvent]:
+    query: Select = select(GraphEvent).where(GraphEvent.id > since)
+    if graph_id is not None:
+        query = query.where(GraphEvent.graph_id == graph_id)
+    return list(db.scalars(query.order_by(GraphEvent.id).limit(limit)))
+
+
+@traced
+def db_get_last_event_id(db: Session) -> int:
+    return db.scalar(select(func.max(GraphEvent.id))) or 0
+
+
+@traced
+def db_get_graphs(db: Session) -> list[Graph]:
+    return list(db.scalars(select(Graph).where(Graph.is_deleted.is_(False)).order_by(Graph.id)))
+
+
+def db_has_graph(db: Session, graph_id: int) -> bool:
+    return db.scalar(select(Graph.id).where(Graph.id == graph_id)) is not None
+
+
+def _unpack_contents(nodes: list[Node], edges: list[Edge]) -> tuple[
+    list[str], list[tuple[str, str]], dict[str, float], dict[tuple[str, str], float]
+]:
+    pairs: list[tuple[str, str]] = [(edge.source, edge.target) for edge in edges]
+    return (
+        [node.name for node in nodes],
+        pairs,
+        {node.name: node.weight for node in nodes if node.weight is not None},
+        {pair: edge.weight for pair, edge in zip(pairs, edges) if edge.weight is not None},
+    )
+
+
+@traced
+@single_writer.serialized
+def db_copy_graph(db: Session,
+                  graph: Graph,
+                  nodes: list[Node],
+                  edges: list[Edge],
+                  events: list[GraphEvent],
+                  keep_parent: bool) -> None:
+    names, pairs, node_weights, edge_weights = _unpack_contents(nodes, edges)
+    db.add(Graph(id=graph.id, version=graph.version, parent_id=graph.parent_id if keep_parent else None,
+                 content_hash=graph.content_hash, is_reduced=graph.is_reduced))
+    db.flush()
+    _insert_nodes_and_edges(db, graph.id, names, pairs, node_weights, edge_weights, {})
+    db.add_all([
+        GraphEvent(graph_id=event.graph_id, type=event.type, payload=event.payload, created_at=event.created_at)
+        for event in events
+    ])
+    db.commit()
+
+
+@traced
+@single_writer.serialized
+def db_materialize_graph(db: Session, graph: Graph, nodes: list[Node], edges: list[Edge], keep_parent: bool) -> None:
+    names, pairs, node_weights, edge_weights = _unpack_contents(nodes, edges)
+    for model in (RemovedEdge, RemovedNode, Edge, Node):
+        db.execute(delete(model).where(model.graph_id == graph.id).execution_options(synchronize_session=False))
+    _insert_nodes_and_edges(db, graph.id, names, pairs, node_weights, edge_weights, {})
+    db.execute(
+        update(Graph)
+        .where(Graph.id == graph.id)
+        .values(depth=0, parent_id=graph.parent_id if keep_parent else None)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
+
+
+@traced
+@single_writer.serialized
+def db_detach_graph(db: Session, graph_id: int) -> None:
+    db.execute(update(Graph).where(Graph.id == graph_id).values(parent_id=None)
+               .execution_options(synchronize_session=False))
+    db.commit()
+
+
+@traced
+@single_writer.serialized
+def db_delete_graph_events(db: Session, graph_id: int) -> None:
+    db.execute(delete(GraphEvent).where(GraphEvent.graph_id == graph_id))
+    db.commit()
+
+
+@traced
+def db_get_subgraph(
+        db: Session,
+        graph_id: int,
+        roots: list[str],
+        direction: Direction,
+        max_depth: int | None = None,
+) -> tuple[list[str], list[tuple[str, str]]]:
+    graph: Graph = db_get_graph_by_id(db, graph_id)
+    chain_ids: list[int] = _get_chain_ids(db, graph)
+    removed_node_ids, removed_edge_ids = _get_removed_ids(db, chain_ids)
+
+    rows = [
+        (_id, name) for _id, name in (
+            db.query(Node.id, _node_name_column(Node, NodeName))
+            .outerjoin(NodeName, Node.name_id == NodeName.id)
+            .filter(Node.graph_id.in_(chain_ids), _node_name_condition(db, Node, roots))
+        )
+        if _id not in removed_node_ids
+    ]
+    if len(rows) != len(set(roots)):
+        raise NotFoundError("Node not found")
+    id_to_name: dict[int, str] = {_id: name for _id, name in rows}
+
+    if direction == Direction.downstream:
+        near_id, far_id = Edge.source_id, Edge.target_id
+    else:
+        near_id, far_id = Edge.target_id, Edge.source_id
+
+    found_edges: dict[int, tuple[int, int]] = {}
+    frontier: set[int] = set(id_to_name)
+    depth: int = 0
+    while frontier:
+        expand: bool = max_depth is None or depth < max_depth
+        query = (
+            db.query(Edge.id, Edge.source_id, Edge.target_id, far_id, _node_name_column(Node, NodeName))
+            .join(Node, (Node.id == far_id) & Node.graph_id.in_(chain_ids))
+            .outerjoin(NodeName, Node.name_id == NodeName.id)
+            .filter(Edge.graph_id.in_(chain_ids), near_id.in_(frontier))
+        )
+        if not expand:
+            query = query.filter(far_id.in_(id_to_name))
+
+        next_frontier: set[int] = set()
+        for edge_id, source_id, target_id, neighbour_id, neighbour_name in query.all():
+            if edge_id in removed_edge_ids or neighbour_id in removed_node_ids:
+                continue
+            if neighbour_id not in id_to_name:
+                id_to_name[neighbour_id] = neighbour_name
+                next_frontier.add(neighbour_id)
+            found_edges[edge_id] = (source_id, target_id)
+
+        if not expand:
+            break
+        frontier = next_frontier
+        depth += 1
+
+    names: list[str] = [id_to_name[_id] for _id in sorted(id_to_name)]
+    edges: list[tuple[str, str]] = [
+        (id_to_name[source_id], id_to_name[target_id])
+        for _, (source_id, target_id) in sorted(found_edges.items())
+    ]
+    return names, edges
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.crud.graph import NotFoundError
+from app.db.shards import shard_router
+from app.db.writer import single_writer
+from app.models.job import IngestJob
+from app.schemas.job import JobStatus
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session
+
+UNFINISHED_STATUSES: list[str] = [JobStatus.pending.value, JobStatus.validating.value, JobStatus.saving.value]
+
+
+@single_writer.serialized
+def db_create_job(db: Session, payload: dict, dedupe: bool = False, reduce: bool = False) -> IngestJob:
+    job: IngestJob = IngestJob(id=shard_router.allocate_id(db, IngestJob), status=JobStatus.pending.value,
+                               payload=payload, dedupe=dedupe, reduce=reduce)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def db_get_job_by_id(db: Session, job_id: int) -> IngestJob:
+    job: IngestJob | None = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+    if job is None:
+        raise NotFoundError("Job not found")
+    return job
+
+
+def db_get_unfinished_job_ids(db: Session) -> list[int]:
+    rows = (
+        db.query(IngestJob.id)
+        .filter(IngestJob.status.in_(UNFINISHED_STATUSES))
+        .order_by(IngestJob.id)
+        .all()
+    )
+    return [_id for _id, in rows]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def db_get_reclaimable_job_ids(db: Session) -> list[int]:
+    rows = (
+        db.query(IngestJob.id)
+        .filter(IngestJob.status.in_(UNFINISHED_STATUSES),
+                or_(IngestJob.owner.is_(None), IngestJob.lease_expires_at < _utcnow()))
+        .order_by(IngestJob.id)
+        .all()
+    )
+    return [_id for _id, in rows]
+
+
+@single_writer.serialized
+def db_claim_job(db: Session, job_id: int, owner: str) -> bool:
+    now: datetime = _utcnow()
+    result = db.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id,
+               IngestJob.status.in_(UNFINISHED_STATUSES),
+               or_(IngestJob.owner.is_(None), IngestJob.lease_expires_at < now))
+        .values(owner=owner, lease_expires_at=now + timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS))
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+@single_writer.serialized
+def db_update_job(db: Session,
+                  job: IngestJob,
+                  status: JobStatus,
+                  graph_id: int | None = None,
+                  error: str | None = None) -> None:
+    job.status = status.value
+    job.graph_id = graph_id
+    job.error = error
+    if status in (JobStatus.done, JobStatus.failed):
+        job.payload = None
+    elif job.owner is not None:
+        job.lease_expires_at = _utcnow() + timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS)
+    db.commit()
+
+
+def db_get_jobs(db: Session) -> list[IngestJob]:
+    return db.query(IngestJob).order_by(IngestJob.id).all()
+
+
+def db_has_job(db: Session, job_id: int) -> bool:
+    return db.query(IngestJob.id).filter(IngestJob.id == job_id).first() is not None
+
+
+@single_writer.serialized
+def db_copy_job(db: Session, job: IngestJob, keep_graph: bool) -> None:
+    db.add(IngestJob(id=job.id, status=job.status, payload=job.payload, dedupe=job.dedupe, reduce=job.reduce,
+                     graph_id=job.graph_id if keep_graph else None, error=job.error,
+                     created_at=job.created_at, updated_at=job.updated_at))
+    db.commit()
+
+
+@single_writer.serialized
+def db_delete_job(db: Session, job_id: int) -> None:
+    db.query(IngestJob).filter(IngestJob.id == job_id).delete(synchronize_session=False)
+    db.commit()
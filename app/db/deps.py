@@ -1,8 +1,20 @@
-from app.db.session import SessionLocal
+from fastapi import Request
 
+from app.db.shards import shard_router
 
-def get_db():
-    db = SessionLocal()
+ROUTING_PARAMS: tuple[str, ...] = ("graph_id", "job_id")
+
+
+def _routing_id(request: Request) -> int | None:
+    for param in ROUTING_PARAMS:
+        value: str | None = request.path_params.get(param)
+        if value is not None and value.isdigit():
+            return int(value)
+    return None
+
+
+def get_db(request: Request):
+    db = shard_router.session_for(_routing_id(request))
     try:
         yield db
     finally:
@@ -1,15 +1,66 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+
+from sqlalchemy import create_engine, event, Engine
+from sqlalchemy.orm import sessionmaker, Session
 from app.config import settings
 
-engine = create_engine(
-    url=settings.DATABASE_URL_psycopg,
-    pool_pre_ping=True,
-)
+engine: Engine | None = None
 
 SessionLocal = sessionmaker(
-    bind=engine,
     autocommit=False,
     autoflush=False,
     expire_on_commit=False,
 )
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_db_engine(url: str | None = None) -> Engine:
+    url = url or settings.DATABASE_URL
+    if url.startswith("sqlite"):
+        sqlite_engine: Engine = create_engine(
+            url=url,
+            connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT / 1000},
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+        return sqlite_engine
+
+    return create_engine(
+        url=url,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
+
+
+def get_engine() -> Engine:
+    global engine
+    if engine is None:
+        engine = create_db_engine()
+        SessionLocal.configure(bind=engine)
+    return engine
+
+
+def new_session() -> Session:
+    get_engine()
+    return SessionLocal()
+
+
+def _dispose_after_fork() -> None:
+    if engine is not None:
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_after_fork)
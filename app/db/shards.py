@@ -0,0 +1,127 @@
+import itertools
+import os
+from collections import defaultdict
+from threading import Lock
+from typing import Iterator
+
+from sqlalchemy import Engine, select, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, create_db_engine, get_engine, new_session
+from app.models.sequence import IdHighWaterMark
+
+SHARD_KEY = "shard"
+
+
+class ShardRouter:
+    def __init__(self, urls: list[str], buckets: int) -> None:
+        if len(urls) > buckets:
+            raise ValueError(f"Cannot spread {buckets} id buckets over {len(urls)} shards")
+        if urls and settings.NODE_NAME_DICTIONARY:
+            raise ValueError("NODE_NAME_DICTIONARY is not supported together with SHARD_URLS")
+        self.urls: list[str] = urls
+        self.buckets: int = buckets
+        self._engines: dict[int, Engine] = {}
+        self._lock: Lock = Lock()
+        self._next_shard: Iterator[int] = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def shards_cnt(self) -> int:
+        return len(self.urls)
+
+    def shard_for(self, object_id: int) -> int:
+        return object_id % self.buckets % self.shards_cnt
+
+    def get_engine(self, shard: int) -> Engine:
+        with self._lock:
+            if shard not in self._engines:
+                self._engines[shard] = create_db_engine(self.urls[shard])
+            return self._engines[shard]
+
+    def engines(self) -> list[Engine]:
+        if not self.enabled:
+            return [get_engine()]
+        return [self.get_engine(shard) for shard in range(self.shards_cnt)]
+
+    def new_session(self, shard: int) -> Session:
+        db: Session = SessionLocal(bind=self.get_engine(shard))
+        db.info[SHARD_KEY] = shard
+        return db
+
+    def session_for(self, object_id: int | None = None) -> Session:
+        if not self.enabled:
+            return new_session()
+        if object_id is None:
+            return self.new_session(next(self._next_shard) % self.shards_cnt)
+        return self.new_session(self.shard_for(object_id))
+
+    def each_shard(self, db: Session) -> Iterator[Session]:
+        if not self.enabled:
+            yield db
+            return
+        for shard in range(self.shards_cnt):
+            if db.info.get(SHARD_KEY) == shard:
+                yield db
+                continue
+            shard_db: Session = self.new_session(shard)
+            try:
+                yield shard_db
+            finally:
+                shard_db.close()
+
+    def partition(self, db: Session, object_ids: list[int]) -> Iterator[tuple[Session, list[int]]]:
+        if not self.enabled:
+            yield db, object_ids
+            return
+        by_shard: defaultdict[int, list[int]] = defaultdict(list)
+        for object_id in object_ids:
+            by_shard[self.shard_for(object_id)].append(object_id)
+        for shard_db in self.each_shard(db):
+            if by_shard[shard_db.info[SHARD_KEY]]:
+                yield shard_db, by_shard[shard_db.info[SHARD_KEY]]
+
+    def allocate_id(self, db: Session, model: type[Base], colocate_with: int | None = None) -> int | None:
+        shard: int | None = db.info.get(SHARD_KEY)
+        if shard is None:
+            return None
+        # The high water mark row is locked until commit and never moves backwards,
+        # so ids of purged objects are not handed out again.
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db.execute(
+            insert(IdHighWaterMark)
+            .values(table_name=model.__tablename__, last_id=0)
+            .on_conflict_do_nothing(index_elements=[IdHighWaterMark.table_name])
+        )
+        last_id: int = db.scalar(
+            select(IdHighWaterMark.last_id)
+            .where(IdHighWaterMark.table_name == model.__tablename__)
+            .with_for_update()
+        )
+
+        next_id: int = max(last_id, db.scalar(select(func.max(model.id))) or 0) + 1
+        if colocate_with is not None:
+            next_id += (colocate_with - next_id) % self.buckets
+        while self.shard_for(next_id) != shard:
+            next_id += 1
+        db.execute(
+            update(IdHighWaterMark)
+            .where(IdHighWaterMark.table_name == model.__tablename__)
+            .values(last_id=next_id)
+        )
+        return next_id
+
+    def dispose(self, close: bool = True) -> None:
+        for engine in self._engines.values():
+            engine.dispose(close=close)
+
+
+shard_router = ShardRouter(settings.SHARD_URLS, settings.SHARD_BUCKETS)
+
+os.register_at_fork(after_in_child=lambda: shard_router.dispose(close=False))
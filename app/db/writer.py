@@ -0,0 +1,55 @@
+import functools
+from threading import Condition, get_ident
+from typing import Any, Callable
+
+from app.config import settings
+
+
+class SingleWriter:
+    def __init__(self, enabled: bool) -> None:
+        self.enabled: bool = enabled
+        self._condition: Condition = Condition()
+        self._next_ticket: int = 0
+        self._serving: int = 0
+        self._owner: int | None = None
+        self._depth: int = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._next_ticket - self._serving - (self._owner is not None)
+
+    def acquire(self) -> None:
+        with self._condition:
+            if self._owner == get_ident():
+                self._depth += 1
+                return
+            ticket: int = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: self._serving == ticket and self._owner is None)
+            self._owner = get_ident()
+            self._depth = 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._depth -= 1
+            if self._depth:
+                return
+            self._owner = None
+            self._serving += 1
+            self._condition.notify_all()
+
+    def serialized(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not self.enabled:
+                return func(*args, **kwargs)
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.release()
+
+        return wrapper
+
+
+single_writer = SingleWriter(settings.USES_SQLITE)
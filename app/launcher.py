@@ -0,0 +1,27 @@
+import os
+
+import uvicorn
+
+from app.config import settings
+
+
+def get_workers_count() -> int:
+    if settings.USES_SQLITE:
+        return 1
+    return settings.WEB_WORKERS or os.cpu_count() or 1
+
+
+def main() -> None:
+    uvicorn.run(
+        "app.main:app",
+        host=settings.WEB_HOST,
+        port=settings.WEB_PORT,
+        workers=get_workers_count(),
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,48 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
 
-app: FastAPI = FastAPI()
+from app.config import settings
+from app.db.base import Base
+from app.db.shards import shard_router
+from app.utils.admission import AdmissionError, BodySizeLimitMiddleware, PayloadTooLargeError
+from app.utils.compression import BodyDecodingError, CompressionMiddleware
+from app.utils.jobs import ingest_pool
+from app.utils.offload import cpu_pool
+from app.utils.profiling import install_profiling
+from app.utils.purge import graph_purger
+from app.utils.tracing import install_tracing, create_exporter
+from app.utils.warmup import warm_up_pool, prefetch_graphs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for engine in shard_router.engines():
+        if engine.dialect.name == "sqlite":
+            Base.metadata.create_all(engine)
+        if settings.WARMUP_POOL:
+            warm_up_pool(engine, settings.DB_POOL_SIZE)
+    if settings.WARMUP_GRAPH_IDS:
+        db = shard_router.session_for()
+        try:
+            for shard_db, graph_ids in shard_router.partition(db, settings.WARMUP_GRAPH_IDS):
+                prefetch_graphs(shard_db, graph_ids)
+        finally:
+            db.close()
+    ingest_pool.start()
+    if settings.PURGE_IN_BACKGROUND:
+        graph_purger.start()
+    yield
+    graph_purger.stop(timeout=5)
+    ingest_pool.shutdown()
+    cpu_pool.shutdown()
+
+
+app: FastAPI = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(BodySizeLimitMiddleware)
 
 
 @app.exception_handler(IntegrityError)
@@ -13,6 +53,24 @@ async def integrity_error_handler(request: Request, exc: IntegrityError):
     )
 
 
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, exc: AdmissionError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"message": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PayloadTooLargeError)
+@app.exception_handler(BodyDecodingError)
+async def request_body_error_handler(request: Request, exc: PayloadTooLargeError | BodyDecodingError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"message": exc.detail},
+    )
+
+
 from app.routers import main_router
 
 app.include_router(main_router)
@@ -21,3 +79,9 @@ app.include_router(main_router)
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+if settings.PROFILING_ENABLED:
+    install_profiling(app)
+if settings.TRACING_EXPORTER:
+    install_tracing(app, create_exporter(settings.TRACING_EXPORTER))
@@ -0,0 +1,103 @@
+import argparse
+
+from app.config import settings
+from app.crud.graph import db_encode_node_names, db_get_graph_ids_in_range
+from app.db.base import Base
+from app.db.session import new_session, get_engine
+from app.db.shards import shard_router
+from app.schemas.export import ExportTable, ExportFormat
+from app.utils.bench import run_benchmark
+from app.utils.export import graph_exporter
+from app.utils.rebalance import rebalance
+
+
+def encode_node_names(batch_size: int) -> int:
+    total: int = 0
+    with new_session() as db:
+        while encoded := db_encode_node_names(db, batch_size):
+            total += encoded
+            print(f"Encoded {total} nodes")
+    return total
+
+
+def export_graphs(table: ExportTable,
+                  fmt: ExportFormat,
+                  start_id: int,
+                  end_id: int | None,
+                  output: str,
+                  batch_size: int) -> int:
+    with shard_router.session_for() as db:
+        graph_ids: list[int] = sorted(
+            graph_id for shard_db in shard_router.each_shard(db)
+            for graph_id in db_get_graph_ids_in_range(shard_db, start_id, start_id if end_id is None else end_id)
+        )
+
+    graph_exporter.batch_size = batch_size
+    written: int = 0
+    with open(output, "wb") as file:
+        for chunk in graph_exporter.iter_export(table, fmt, graph_ids):
+            written += file.write(chunk)
+    print(f"Exported {table.value} of {len(graph_ids)} graphs to {output} ({written} bytes)")
+    return written
+
+
+def benchmark(graphs_cnt: int, nodes_cnt: int, readers: int, writers: int) -> None:
+    if settings.DB_BACKEND == "sqlite":
+        Base.metadata.create_all(get_engine())
+    print(f"Backend: {settings.DB_BACKEND}, graphs: {graphs_cnt}, nodes per graph: {nodes_cnt}, "
+          f"readers: {readers}, writers: {writers}")
+    for result in run_benchmark(graphs_cnt, nodes_cnt, readers, writers):
+        print(f"{result['phase']:<22} {result['ops_per_s']:>9} ops/s  "
+              f"p50 {result['p50_ms']:>8} ms  p99 {result['p99_ms']:>8} ms")
+
+
+def rebalance_shards(source_urls: list[str], batch_size: int) -> None:
+    for engine in shard_router.engines():
+        if engine.dialect.name == "sqlite":
+            Base.metadata.create_all(engine)
+    report = rebalance(shard_router, source_urls, batch_size)
+    print(f"Shards: {shard_router.shards_cnt}, moved graphs: {report['moved']}, "
+          f"materialized versions: {report['materialized']}, detached versions: {report['detached']}, "
+          f"moved jobs: {report['jobs_moved']}, purged deleted graphs: {report['purged']}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser = commands.add_parser("encode-names", help="move node names into the node_names dictionary")
+    encode_parser.add_argument("--batch-size", type=int, default=10000)
+
+    export_parser = commands.add_parser("export", help="export nodes or edges as Arrow IPC stream or Parquet")
+    export_parser.add_argument("table", choices=[table.value for table in ExportTable])
+    export_parser.add_argument("--start-id", type=int, required=True)
+    export_parser.add_argument("--end-id", type=int)
+    export_parser.add_argument("--format", choices=[fmt.value for fmt in ExportFormat], default=ExportFormat.parquet.value)
+    export_parser.add_argument("--output", required=True)
+    export_parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+
+    bench_parser = commands.add_parser("bench", help="benchmark writes and reads against the configured database")
+    bench_parser.add_argument("--graphs", type=int, default=200)
+    bench_parser.add_argument("--nodes", type=int, default=500)
+    bench_parser.add_argument("--readers", type=int, default=8)
+    bench_parser.add_argument("--writers", type=int, default=4)
+
+    rebalance_parser = commands.add_parser("rebalance", help="move graphs to the shards that own their ids (offline)")
+    rebalance_parser.add_argument("--source", action="append", default=[])
+    rebalance_parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+    if args.command == "encode-names":
+        encode_node_names(args.batch_size)
+    elif args.command == "export":
+        export_graphs(ExportTable(args.table), ExportFormat(args.format), args.start_id, args.end_id, args.output, args.batch_size)
+    elif args.command == "bench":
+        benchmark(args.graphs, args.nodes, args.readers, args.writers)
+    elif args.command == "rebalance":
+        if not shard_router.enabled:
+            parser.error("SHARD_URLS is not configured")
+        rebalance_shards(args.source, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
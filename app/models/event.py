@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import String, JSON, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.graph import intpk
+
+
+class GraphEvent(Base):
+    __tablename__ = "graph_events"
+    __table_args__ = (
+        Index("ix_graph_events_graph_id_id", "graph_id", "id"),
+    )
+
+    id: Mapped[intpk]
+    graph_id: Mapped[int]
+    type: Mapped[str] = mapped_column(String(32))
+    payload: Mapped[dict] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, String
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing_extensions import Annotated
 
@@ -6,43 +6,79 @@ from app.db.base import Base
 
 intpk = Annotated[int, mapped_column(primary_key=True, index=True)]
 
+# In PostgreSQL the schema comes from migrations: nodes and edges can be hash-partitioned by graph_id there
+# (d51a8c3f7e20, opt-in), and since a partitioned table can only be referenced through a key that includes
+# graph_id, the foreign keys into nodes/edges declared below are then dropped; crud deletes those links explicitly.
+
+
+class NodeName(Base):
+    __tablename__ = "node_names"
+
+    id: Mapped[intpk]
+    name: Mapped[str] = mapped_column(unique=True)
+
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        Index("ix_nodes_graph_id_name", "graph_id", "name"),
+        Index("ix_nodes_graph_id_name_id", "graph_id", "name_id"),
+    )
 
-    id: Mapped[intpk]
-    name: Mapped[str]
+    id: Mapped[intpk] = mapped_column(autoincrement=True)
+    raw_name: Mapped[str | None] = mapped_column("name")
+    name_id: Mapped[int | None] = mapped_column(ForeignKey("node_names.id"))
     graph_id: Mapped[int] = mapped_column(ForeignKey("graphs.id", ondelete="CASCADE"))
+    weight: Mapped[float | None]
 
     edges_from: Mapped[list["Edge"]] = relationship(
         back_populates="source_node",
         cascade="all, delete-orphan",
+        primaryjoin="Node.id == Edge.source_id",
         foreign_keys="Edge.source_id",
     )
     edges_to: Mapped[list["Edge"]] = relationship(
         back_populates="target_node",
         cascade="all, delete-orphan",
+        primaryjoin="Node.id == Edge.target_id",
         foreign_keys="Edge.target_id",
     )
     graph: Mapped["Graph"] = relationship(
         back_populates="nodes",
     )
 
+    # Filled by crud for nodes stored through the name dictionary (name_id instead of name).
+    dictionary_name = None
+
+    @property
+    def name(self) -> str:
+        if self.raw_name is not None:
+            return self.raw_name
+        return self.dictionary_name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self.raw_name = value
+        self.name_id = None
+
 
 class Edge(Base):
     __tablename__ = "edges"
 
-    id: Mapped[intpk]
+    id: Mapped[intpk] = mapped_column(autoincrement=True)
     graph_id: Mapped[int] = mapped_column(ForeignKey("graphs.id", ondelete="CASCADE"), nullable=False)
-    source_id: Mapped[int] = mapped_column(ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False)
-    target_id: Mapped[int] = mapped_column(ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False)
+    source_id: Mapped[int] = mapped_column(ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False, index=True)
+    target_id: Mapped[int] = mapped_column(ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False, index=True)
+    weight: Mapped[float | None]
 
     source_node: Mapped["Node"] = relationship(
         back_populates="edges_from",
+        primaryjoin="Edge.source_id == Node.id",
         foreign_keys=[source_id],
     )
     target_node: Mapped["Node"] = relationship(
         back_populates="edges_to",
+        primaryjoin="Edge.target_id == Node.id",
         foreign_keys=[target_id],
     )
     graph: Mapped["Graph"] = relationship(
@@ -62,6 +98,12 @@ class Graph(Base):
     __tablename__ = "graphs"
 
     id: Mapped[intpk]
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+    parent_id: Mapped[int | None] = mapped_column(ForeignKey("graphs.id"), index=True)
+    depth: Mapped[int] = mapped_column(default=0, server_default="0")
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True)
+    is_reduced: Mapped[bool] = mapped_column(default=False, server_default="0")
+    is_deleted: Mapped[bool] = mapped_column(default=False, server_default="0")
 
     nodes: Mapped[list["Node"]] = relationship(
         back_populates="graph",
@@ -71,3 +113,17 @@ class Graph(Base):
         back_populates="graph",
         cascade="all, delete-orphan",
     )
+
+
+class RemovedNode(Base):
+    __tablename__ = "removed_nodes"
+
+    graph_id: Mapped[int] = mapped_column(ForeignKey("graphs.id", ondelete="CASCADE"), primary_key=True)
+    node_id: Mapped[int] = mapped_column(ForeignKey("nodes.id", ondelete="CASCADE"), primary_key=True)
+
+
+class RemovedEdge(Base):
+    __tablename__ = "removed_edges"
+
+    graph_id: Mapped[int] = mapped_column(ForeignKey("graphs.id", ondelete="CASCADE"), primary_key=True)
+    edge_id: Mapped[int] = mapped_column(ForeignKey("edges.id", ondelete="CASCADE"), primary_key=True)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, String, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.graph import intpk
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[intpk]
+    status: Mapped[str] = mapped_column(String(16), index=True)
+    payload: Mapped[dict | None] = mapped_column(JSON)
+    dedupe: Mapped[bool] = mapped_column(default=False, server_default="0")
+    reduce: Mapped[bool] = mapped_column(default=False, server_default="0")
+    graph_id: Mapped[int | None] = mapped_column(ForeignKey("graphs.id", ondelete="SET NULL"))
+    error: Mapped[str | None]
+    owner: Mapped[str | None] = mapped_column(String(128))
+    lease_expires_at: Mapped[datetime | None]
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,14 @@
 from fastapi import APIRouter
 
+from app.routers.admission import router as admission_router
+from app.routers.events import router as events_router
+from app.routers.export import router as export_router
 from app.routers.graph import router as graph_router
+from app.routers.job import router as job_router
 
 main_router = APIRouter()
 main_router.include_router(graph_router)
+main_router.include_router(job_router)
+main_router.include_router(admission_router)
+main_router.include_router(export_router)
+main_router.include_router(events_router)
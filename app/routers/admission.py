@@ -0,0 +1,15 @@
+from fastapi import APIRouter, status
+from app.schemas.admission import AdmissionMetricsResponse
+from app.utils.admission import admission
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/admission/metrics",
+    response_model=AdmissionMetricsResponse,
+    status_code=status.HTTP_200_OK,
+    description="Ручка для мониторинга ограничений нагрузки: лимиты размера запроса и графа, число отклоненных запросов, а также для каждой тяжелой ручки - число выполняющихся и ожидающих запросов, принятых, отклоненных по переполнению очереди (429) и по таймауту ожидания (503).",
+)
+def get_admission_metrics():
+    return admission.metrics()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Header, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.graph import db_get_events, db_get_last_event_id, db_get_expired_event_id
+from app.db.shards import shard_router
+from app.models.event import GraphEvent
+from app.schemas.common import ErrorResponse
+from app.utils.feed import change_feed
+
+router = APIRouter()
+
+
+def _settled(events: list[GraphEvent], since: int) -> list[GraphEvent]:
+    # Writers of different graphs commit in any order, so a missing id may still belong to an open transaction.
+    # Events after a recent gap are held back until it fills; gaps older than FEED_GAP_SECONDS come from
+    # rolled back transactions or purged graphs and are skipped.
+    now: datetime = datetime.now(timezone.utc).replace(tzinfo=None)
+    settled_before: datetime = now - timedelta(seconds=settings.FEED_GAP_SECONDS)
+    expected_id: int = since + 1
+    for i, event in enumerate(events):
+        if event.id != expected_id and event.created_at > settled_before:
+            return events[:i]
+        expected_id = event.id + 1
+    return events
+
+
+def _read_events(since: int, graph_id: int | None) -> list[tuple[int, str]]:
+    db: Session = change_feed.session_factory(graph_id)
+    try:
+        events: list[GraphEvent] = db_get_events(db, since, graph_id, settings.FEED_BATCH_SIZE)
+        if graph_id is None:
+            events = _settled(events, since)
+        return [(event.id, _format_event(event)) for event in events]
+    finally:
+        db.close()
+
+
+def _read_last_event_id(graph_id: int | None) -> int:
+    db: Session = change_feed.session_factory(graph_id)
+    try:
+        return db_get_last_event_id(db)
+    finally:
+        db.close()
+
+
+def _read_history_expired(since: int, graph_id: int | None) -> bool:
+    db: Session = change_feed.session_factory(graph_id)
+    try:
+        return db_get_expired_event_id(db) > since
+    finally:
+        db.close()
+
+
+def _format_event(event: GraphEvent) -> str:
+    data: str = json.dumps({"seq": event.id, "type": event.type, "graph_id": event.graph_id, **event.payload},
+                           separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+def _format_reset(since: int, graph_id: int | None) -> str:
+    data: str = json.dumps({"seq": since, "type": "reset", "graph_id": graph_id}, separators=(",", ":"))
+    return f"id: {since}\nevent: reset\ndata: {data}\n\n"
+
+
+async def _event_stream(request: Request,
+                        since: int,
+                        graph_id: int | None,
+                        follow: bool,
+                        reset: bool) -> AsyncIterator[str]:
+    if reset:
+        yield _format_reset(since, graph_id)
+    with change_feed.subscribe() as wakeup:
+        while True:
+            wakeup.clear()
+            events: list[tuple[int, str]] = await run_in_threadpool(_read_events, since, graph_id)
+            for since, event in events:
+                yield event
+            if len(events) == settings.FEED_BATCH_SIZE:
+                continue
+            if not follow or await request.is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(wakeup.wait(), settings.FEED_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+
+
+@router.get(
+    "/api/events",
+    status_code=status.HTTP_200_OK,
+    description="Ручка для подписки на изменения графов вместо периодического опроса (Server-Sent Events).\nСобытия: `graph_created` (`parent_id` для версий), `node_deleted` (новая `version` графа, имя вершины `node` и удаленные вместе с ней ребра `edges`), `graph_deleted`. Каждое событие содержит сквозной порядковый номер `seq`, он же передается в поле `id`.\nС параметром `graph_id` приходят только события этого графа, без него - события всех графов (при шардировании `graph_id` обязателен, так как номера событий сквозные только в пределах шарда). Чтобы продолжить с места разрыва, передайте последний полученный номер в `since` или заголовке `Last-Event-ID` (браузерный `EventSource` делает это сам); без них поток начинается с новых событий. Если часть событий после этого номера уже удалена по сроку хранения, поток начинается с события `reset`: клиент должен заново загрузить состояние графов, дальше приходят только новые события. С параметром `follow=false` поток закрывается после выдачи накопленных событий.",
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        400: {"model": ErrorResponse, "description": "Invalid Last-Event-ID or graph_id is missing for sharded graphs"},
+    }
+)
+async def stream_events(request: Request,
+                        graph_id: int | None = None,
+                        since: int | None = None,
+                        follow: bool = True,
+                        last_event_id: str | None = Header(None)):
+    if graph_id is None and shard_router.enabled:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"message": "graph_id is required when graphs are sharded"},
+        )
+    if since is None and last_event_id is not None:
+        if not last_event_id.isdigit():
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"message": "Last-Event-ID must be an event sequence number"},
+            )
+        since = int(last_event_id)
+    reset: bool = False
+    if since is not None:
+        reset = await run_in_threadpool(_read_history_expired, since, graph_id)
+    if since is None or reset:
+        since = await run_in_threadpool(_read_last_event_id, graph_id)
+
+    return StreamingResponse(
+        _event_stream(request, since, graph_id, follow, reset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.crud.graph import db_get_graph_ids_in_range
+from app.db.deps import get_db
+from app.db.shards import shard_router
+from app.schemas.common import ErrorResponse
+from app.schemas.export import ExportTable, ExportFormat
+from app.utils.admission import admission, AdmissionSlot
+from app.utils.export import graph_exporter, ExportUnavailableError, MEDIA_TYPES
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/export/{table}",
+    status_code=status.HTTP_200_OK,
+    description="Ручка для выгрузки вершин (`nodes`) или ребер (`edges`) одного графа или диапазона графов `start_id`..`end_id` (включительно) в колоночном формате для аналитики: Arrow IPC stream (`arrow`) или Parquet (`parquet`).\nИмена вершин кодируются словарем, ребра хранятся целочисленными колонками `source_id`/`target_id`, ссылающимися на `node_id`. Данные читаются из бд и отдаются потоково пачками, поэтому память не зависит от размера выгрузки.",
+    responses={
+        200: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}},
+        400: {"model": ErrorResponse, "description": "Invalid graph id range"},
+        404: {"model": ErrorResponse, "description": "Graph entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded or pyarrow is not installed"},
+    }
+)
+def export_graphs(table: ExportTable,
+                  start_id: int,
+                  end_id: int | None = None,
+                  format: ExportFormat = ExportFormat.parquet,
+                  db: Session = Depends(get_db),
+                  slot: AdmissionSlot = Depends(admission.limit_stream("export"))):
+    if end_id is None:
+        end_id = start_id
+    if end_id < start_id:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"message": "end_id must not be less than start_id"},
+        )
+
+    try:
+        graph_exporter.check_available()
+    except ExportUnavailableError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": str(e)},
+        )
+
+    graph_ids: list[int] = sorted(
+        graph_id for shard_db in shard_router.each_shard(db)
+        for graph_id in db_get_graph_ids_in_range(shard_db, start_id, end_id)
+    )
+    if not graph_ids:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": "Graph not found"},
+        )
+
+    filename: str = f"{table.value}-{start_id}-{end_id}.{format.value}"
+    return StreamingResponse(
+        slot.hold(graph_exporter.iter_export(table, format, graph_ids)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
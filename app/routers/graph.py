@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
 from app.models.graph import Graph
-from app.schemas.graph import GraphCreate, GraphCreateResponse, GraphReadResponse, AdjacencyListResponse
+from app.models.job import IngestJob
+from app.schemas.graph import GraphCreate, GraphCreateResponse, GraphReadResponse, AdjacencyListResponse, Direction, \
+    CriticalPathResponse, GraphVersionCreate, LcaQuery, LcaResponse, DominatorsQuery, DominatorsResponse, \
+    GraphStatsResponse, PathsQuery, PathsInfo, PathsResponse, GraphBatchQuery, GraphBatchResponse
 from app.schemas.common import ErrorResponse
+from app.schemas.job import JobResponse, JobStatus
+from app.config import settings
 from app.db.deps import get_db
+from app.db.shards import shard_router
 from sqlalchemy.orm import Session
 from fastapi.responses import JSONResponse
-from app.utils.graph import detect_cycles, build_adjacency_list, build_reverse_adjacency_list
-from app.crud.graph import db_create_graph, db_get_graph_by_id, NotFoundError, db_delete_node
-import re
+from app.utils.graph import validate_graph, build_adjacency_list, build_reverse_adjacency_list, critical_path, \
+    graph_content_hash, unpack_graph_create, transitive_reduction, graph_read_response
+from app.utils.admission import admission
+from app.utils.jobs import ingest_pool, QueueFullError
+from app.utils.offload import cpu_pool
+from app.utils.purge import graph_purger
+from app.utils.tracing import TracedRoute
+from app.crud.job import db_create_job, db_update_job
+from app.utils.cache import graph_cache
+from app.utils.graph_index import AncestorIndex, DominatorTree, PathIndex
+from app.crud.graph import db_create_graph, db_get_graph_by_id, NotFoundError, db_delete_node, db_get_subgraph, \
+    db_get_graph_contents, db_create_graph_version, ConflictError, db_get_graph_id_by_content_hash, db_get_graph_stats, \
+    db_delete_graph, db_get_graphs_contents
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.post(
@@ -17,76 +33,195 @@ router = APIRouter()
     response_model=GraphCreateResponse,
     response_description="Successful response",
     status_code=status.HTTP_201_CREATED,
-    description="Ручка для создания графа, принимает граф в виде списка вершин и списка ребер.",
+    dependencies=[Depends(admission.limit("create_graph"))],
+    description="Ручка для создания графа, принимает граф в виде списка вершин и списка ребер.\nС параметром `dedupe=true` граф, полностью совпадающий с уже сохраненным (с точностью до порядка вершин и ребер), не сохраняется повторно - возвращается id существующего графа.\nС параметром `reduce=true` сохраняется только транзитивное сокращение графа (избыточные ребра без весов отбрасываются), граф помечается признаком `reduced`.\nС параметром `async=true` граф валидируется и сохраняется в фоне: сразу возвращается задача со статусом 202, ее состояние можно получить через `GET /api/graph/jobs/{job_id}`.",
     responses={
+        200: {"model": GraphCreateResponse, "description": "Identical graph already exists"},
+        202: {"model": JobResponse, "description": "Ingest job accepted"},
         400: {"model": ErrorResponse, "description": "Failed to add graph"},
+        413: {"model": ErrorResponse, "description": "Graph is too large"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Ingest queue is full or service is overloaded"},
     }, )
-def create_graph(graph_in: GraphCreate, db: Session = Depends(get_db)):
-    node_names: list[str] = [node.name for node in graph_in.nodes]
-    edges: list[tuple[str, str]] = [(edge.source, edge.target) for edge in graph_in.edges]
-
-    if not node_names:
+def create_graph(graph_in: GraphCreate,
+                 dedupe: bool = False,
+                 reduce: bool = False,
+                 run_async: bool = Query(False, alias="async"),
+                 db: Session = Depends(get_db)):
+    node_names, edges, node_weights, edge_weights = unpack_graph_create(graph_in)
+    error: str | None = admission.check_graph_size(len(node_names), len(edges))
+    if error is not None:
         return JSONResponse(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            content={"message": "There must be at least one node"},
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"message": error},
         )
 
-    for name in node_names:
-        if not (1 <= len(name)):
+    content_hash: str = graph_content_hash(node_names, edges, node_weights, edge_weights, reduced=reduce)
+    if dedupe:
+        existing_id: int | None = db_get_graph_id_by_content_hash(db, content_hash)
+        if existing_id is not None:
             return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "message": f"Node name '{name}' must be at least 1 character long"},
+                status_code=status.HTTP_200_OK,
+                content={"id": existing_id},
             )
-        if not (len(name) <= 255):
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "message": f"Node name '{name}' must be at most 255 characters long"},
-            )
-        if not re.match(r'^[a-zA-Z]+$', name):
+
+    if run_async:
+        job: IngestJob = db_create_job(db, graph_in.model_dump(), dedupe=dedupe, reduce=reduce)
+        job_response: JobResponse = JobResponse.model_validate(job, from_attributes=True)
+        try:
+            ingest_pool.submit(job.id)
+        except QueueFullError as e:
+            db_update_job(db, job, JobStatus.failed, error=str(e))
             return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "message": f"Node name '{name}' must consist only of Latin letters"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"message": str(e)},
             )
-    if len(node_names) != len(set(node_names)):
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job_response.model_dump(mode="json"),
+        )
+
+    error = cpu_pool.run(validate_graph, node_names, edges)
+    if error is not None:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
-            content={"message": "Node names must be unique"},
+            content={"message": error},
         )
 
-    for source, target in edges:
-        if source not in node_names or target not in node_names:
+    if reduce:
+        edges = cpu_pool.run(transitive_reduction, node_names, edges, set(edge_weights))
+
+    new_graph = db_create_graph(db, node_names, edges, node_weights=node_weights, edge_weights=edge_weights,
+                                content_hash=content_hash, is_reduced=reduce)
+    return GraphCreateResponse(id=new_graph.id)
+
+
+@router.post(
+    "/api/graph/{graph_id}/versions",
+    response_model=GraphCreateResponse,
+    response_description="Successful response",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admission.limit("create_graph_version"))],
+    description="Ручка для создания новой неизменяемой версии графа.\nПринимает изменения относительно родительской версии (добавляемые и удаляемые вершины и ребра). В базе хранятся только изменения, а полный граф собирается при чтении. Длинные цепочки версий периодически уплотняются в полную копию.",
+    responses={
+        400: {"model": ErrorResponse, "description": "Failed to add graph version"},
+        404: {"model": ErrorResponse, "description": "Graph entity not found"},
+        413: {"model": ErrorResponse, "description": "Graph is too large"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }, )
+def create_graph_version(graph_id: int, version_in: GraphVersionCreate, db: Session = Depends(get_db)):
+    try:
+        parent: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+    parent_nodes, parent_edges = db_get_graph_contents(db, parent)
+
+    add_names: list[str] = [node.name for node in version_in.add_nodes]
+    add_edges: list[tuple[str, str]] = [(edge.source, edge.target) for edge in version_in.add_edges]
+    remove_edges: list[tuple[str, str]] = [(edge.source, edge.target) for edge in version_in.remove_edges]
+
+    parent_names: set[str] = {node.name for node in parent_nodes}
+    for name in version_in.remove_nodes:
+        if name not in parent_names:
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "message": f"Edge ({source}->{target}) with a non-existent vertex"},
+                content={"message": f"Node '{name}' does not exist"},
             )
-
-    seen: set[tuple[str, str]] = set()
-    for source, target in edges:
-        if (source, target) in seen:
+    parent_pairs: set[tuple[str, str]] = {(edge.source, edge.target) for edge in parent_edges}
+    for source, target in remove_edges:
+        if (source, target) not in parent_pairs:
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "message": f"Duplicate edge ({source}->{target})"},
+                content={"message": f"Edge ({source}->{target}) does not exist"},
             )
-        seen.add((source, target))
 
-    if detect_cycles(node_names, edges):
+    removed_names: set[str] = set(version_in.remove_nodes)
+    removed_pairs: set[tuple[str, str]] = set(remove_edges)
+    node_names: list[str] = [node.name for node in parent_nodes if node.name not in removed_names] + add_names
+    edges: list[tuple[str, str]] = [
+        pair for pair in parent_pairs
+        if pair not in removed_pairs and pair[0] not in removed_names and pair[1] not in removed_names
+    ] + add_edges
+
+    error: str | None = admission.check_graph_size(len(node_names), len(edges))
+    if error is not None:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"message": error},
+        )
+
+    error = cpu_pool.run(validate_graph, node_names, edges)
+    if error is not None:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
-            content={"message": "Graph must not contain cycles"},
+            content={"message": error},
         )
 
-    new_graph = db_create_graph(db, node_names, edges)
+    node_weights: dict[str, float] = {
+        node.name: node.weight for node in version_in.add_nodes if node.weight is not None
+    }
+    edge_weights: dict[tuple[str, str], float] = {
+        (edge.source, edge.target): edge.weight for edge in version_in.add_edges if edge.weight is not None
+    }
+
+    new_graph = db_create_graph_version(
+        db, parent, parent_nodes, parent_edges,
+        add_names, version_in.remove_nodes, add_edges, remove_edges,
+        node_weights=node_weights, edge_weights=edge_weights,
+    )
     return GraphCreateResponse(id=new_graph.id)
 
 
+@router.post(
+    "/api/graph/batch_get",
+    response_model=GraphBatchResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("batch_get"))],
+    description="Ручка для чтения сразу многих графов по списку `ids` за постоянное число запросов к бд (независимо от числа графов; при шардировании - на каждый затронутый шард).\nПо умолчанию графы возвращаются в `graphs` в том же виде, что и `GET /api/graph/{graph_id}/`, с `adjacency_list=true` - в `adjacency_lists` в виде списков смежности по id графа. Несуществующие и удаленные id не приводят к ошибке, а перечисляются в `missing`.",
+    responses={
+        413: {"model": ErrorResponse, "description": "Too many graph ids"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def batch_get_graphs(query: GraphBatchQuery, db: Session = Depends(get_db)):
+    graph_ids: list[int] = list(dict.fromkeys(query.ids))
+    if len(graph_ids) > settings.MAX_BATCH_GRAPHS:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"message": f"Batch has more than {settings.MAX_BATCH_GRAPHS} graph ids"},
+        )
+
+    found: dict[int, GraphReadResponse | dict[str, list[str]]] = {}
+    for shard_db, shard_graph_ids in shard_router.partition(db, graph_ids):
+        for graph, nodes, edges in db_get_graphs_contents(shard_db, shard_graph_ids).values():
+            if query.adjacency_list:
+                found[graph.id] = build_adjacency_list([node.name for node in nodes],
+                                                       [(edge.source, edge.target) for edge in edges])
+            else:
+                found[graph.id] = graph_read_response(graph, nodes, edges)
+
+    missing: list[int] = [graph_id for graph_id in graph_ids if graph_id not in found]
+    if query.adjacency_list:
+        return GraphBatchResponse(
+            adjacency_lists={graph_id: found[graph_id] for graph_id in graph_ids if graph_id in found},
+            missing=missing,
+        )
+    return GraphBatchResponse(
+        graphs=[found[graph_id] for graph_id in graph_ids if graph_id in found],
+        missing=missing,
+    )
+
+
 @router.get(
     "/api/graph/{graph_id}/",
     response_model=GraphReadResponse,
+    response_model_exclude_none=True,
     status_code=status.HTTP_200_OK,
     description="Ручка для чтения графа в виде списка вершин и списка ребер.",
     responses={
@@ -101,7 +236,15 @@ def read_graph(graph_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             content={"message": str(e)},
         )
-    return GraphReadResponse.model_validate(graph, from_attributes=True)
+
+    cached: GraphReadResponse | None = graph_cache.get(graph.id, graph.version, "read")
+    if cached is not None:
+        return cached
+
+    nodes, edges = db_get_graph_contents(db, graph)
+    response: GraphReadResponse = graph_read_response(graph, nodes, edges)
+    graph_cache.put(graph.id, graph.version, "read", response)
+    return response
 
 
 @router.get(
@@ -121,8 +264,9 @@ def get_adjacency_list(graph_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             content={"message": str(e)},
         )
-    node_names = [node.name for node in graph.nodes]
-    edges = [(edge.source, edge.target) for edge in graph.edges]
+    nodes, edges = db_get_graph_contents(db, graph)
+    node_names = [node.name for node in nodes]
+    edges = [(edge.source, edge.target) for edge in edges]
     adjacency_list = build_adjacency_list(node_names, edges)
     return AdjacencyListResponse.model_validate({"adjacency_list": adjacency_list}, from_attributes=True)
 
@@ -145,24 +289,315 @@ def get_reverse_adjacency_list(graph_id: int, db: Session = Depends(get_db)):
             content={"message": str(e)},
         )
 
-    node_names = [node.name for node in graph.nodes]
-    edges = [(edge.source, edge.target) for edge in graph.edges]
+    nodes, edges = db_get_graph_contents(db, graph)
+    node_names = [node.name for node in nodes]
+    edges = [(edge.source, edge.target) for edge in edges]
     adjacency_list = build_reverse_adjacency_list(node_names, edges)
     return AdjacencyListResponse.model_validate({"adjacency_list": adjacency_list}, from_attributes=True)
 
 
+@router.get(
+    "/api/graph/{graph_id}/critical_path",
+    response_model=CriticalPathResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("critical_path"))],
+    description="Ручка для вычисления критического (самого длинного взвешенного) пути в графе.\nДлина пути - сумма весов его вершин и ребер (отсутствующий вес считается равным 0).\nДля каждой вершины возвращается резерв времени (slack) - на сколько можно увеличить ее вес без изменения длины критического пути.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_critical_path(graph_id: int, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    cached: CriticalPathResponse | None = graph_cache.get(graph.id, graph.version, "critical_path")
+    if cached is not None:
+        return cached
+
+    nodes, edge_objs = db_get_graph_contents(db, graph)
+    node_names = [node.name for node in nodes]
+    node_weights = {node.name: node.weight for node in nodes if node.weight is not None}
+    edges = [(edge.source, edge.target) for edge in edge_objs]
+    edge_weights = {(edge.source, edge.target): edge.weight for edge in edge_objs if edge.weight is not None}
+    path, length, slack = cpu_pool.run(critical_path, node_names, edges, node_weights, edge_weights)
+
+    response = CriticalPathResponse(path=path, length=length, slack=slack)
+    graph_cache.put(graph.id, graph.version, "critical_path", response)
+    return response
+
+
+def _get_graph_index(db: Session,
+                     graph: Graph,
+                     kind: str,
+                     index_cls: type,
+                     *args) -> AncestorIndex | DominatorTree | PathIndex:
+    index = graph_cache.get(graph.id, graph.version, kind)
+    if index is None:
+        nodes, edges = db_get_graph_contents(db, graph)
+        index = cpu_pool.run(index_cls, [node.name for node in nodes], [(edge.source, edge.target) for edge in edges],
+                             *args)
+        graph_cache.put(graph.id, graph.version, kind, index)
+    return index
+
+
+@router.post(
+    "/api/graph/{graph_id}/lca",
+    response_model=LcaResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("lca"))],
+    description="Ручка для пакетного поиска наименьших общих предков пар вершин.\nДля каждой пары возвращается множество общих предков (вершина считается своим предком), у которых нет потомков среди общих предков. Индекс предков строится один раз для версии графа и кешируется; для графов больше `ANCESTOR_INDEX_MAX_NODES` вершин битовые маски предков не строятся, и каждый запрос обходит предков пары вершин (O(N + E)).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph or node entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_lowest_common_ancestors(graph_id: int, query: LcaQuery, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    index: AncestorIndex = _get_graph_index(db, graph, "ancestor_index", AncestorIndex,
+                                            settings.ANCESTOR_INDEX_MAX_NODES)
+    for u, v in query.pairs:
+        if u not in index or v not in index:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message": "Node not found"},
+            )
+    return LcaResponse(lca=[index.lowest_common_ancestors(u, v) for u, v in query.pairs])
+
+
+def _paths_info(index: PathIndex, source: str, target: str) -> PathsInfo:
+    count, shortest, longest = index.paths(source, target)
+    return PathsInfo(source=source, target=target, count=count, shortest=shortest, longest=longest)
+
+
+@router.get(
+    "/api/graph/{graph_id}/paths",
+    response_model=PathsInfo,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("paths"))],
+    description="Ручка для анализа путей между двумя вершинами графа: число различных путей из `source` в `target` (без ограничения разрядности), а также кратчайший и самый длинный по числу ребер путь.\nСчитается одним проходом динамического программирования по топологическому порядку только среди вершин, лежащих между `source` и `target`. Если пути нет, возвращается `count` = 0.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph or node entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_paths(graph_id: int, source: str, target: str, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    index: PathIndex = _get_graph_index(db, graph, "path_index", PathIndex)
+    if source not in index or target not in index:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": "Node not found"},
+        )
+    return _paths_info(index, source, target)
+
+
+@router.post(
+    "/api/graph/{graph_id}/paths",
+    response_model=PathsResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("paths"))],
+    description="Пакетная ручка для анализа путей между парами вершин: для каждой пары `[source, target]` возвращается число путей, кратчайший и самый длинный по числу ребер путь.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph or node entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_paths_batch(graph_id: int, query: PathsQuery, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    index: PathIndex = _get_graph_index(db, graph, "path_index", PathIndex)
+    for source, target in query.pairs:
+        if source not in index or target not in index:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message": "Node not found"},
+            )
+    return PathsResponse(paths=[_paths_info(index, source, target) for source, target in query.pairs])
+
+
+@router.post(
+    "/api/graph/{graph_id}/dominators",
+    response_model=DominatorsResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("dominators"))],
+    description="Ручка для пакетных запросов к дереву доминаторов графа (от всех истоков).\n- `dominators` - для каждой вершины из `nodes` список вершин, через которые проходит любой путь от истока до нее (от ближайшей к дальней),\n- `common_dominators` - для каждой пары из `pairs` ближайшая вершина, через которую проходят все пути к обеим вершинам, не считая самих вершин пары (или `null`).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph or node entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_dominators(graph_id: int, query: DominatorsQuery, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    tree: DominatorTree = _get_graph_index(db, graph, "dominator_tree", DominatorTree)
+    names: list[str] = query.nodes + [name for pair in query.pairs for name in pair]
+    if any(name not in tree for name in names):
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": "Node not found"},
+        )
+    return DominatorsResponse(
+        dominators={name: tree.dominators(name) for name in query.nodes},
+        common_dominators=[tree.nearest_common_dominator(u, v) for u, v in query.pairs],
+    )
+
+
+@router.get(
+    "/api/graph/{graph_id}/stats",
+    response_model=GraphStatsResponse,
+    status_code=status.HTTP_200_OK,
+    description="Ручка для получения характеристик формы графа без загрузки самого графа: число вершин и ребер, истоков и стоков, максимальные входящая и исходящая степени, глубина (число уровней) и ширина (максимальное число вершин на одном уровне).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph entity not found"},
+    }
+)
+def get_graph_stats(graph_id: int, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    cached: GraphStatsResponse | None = graph_cache.get(graph.id, graph.version, "stats")
+    if cached is not None:
+        return cached
+
+    response = GraphStatsResponse(**db_get_graph_stats(db, graph))
+    graph_cache.put(graph.id, graph.version, "stats", response)
+    return response
+
+
+@router.get(
+    "/api/graph/{graph_id}/transitive_reduction",
+    response_model=GraphReadResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("transitive_reduction"))],
+    description="Ручка для чтения транзитивного сокращения графа - графа с минимальным набором ребер и той же достижимостью (ребро A->C удаляется, если существует путь A->B->C).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_transitive_reduction(graph_id: int, db: Session = Depends(get_db)):
+    try:
+        graph: Graph = db_get_graph_by_id(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+
+    cached: GraphReadResponse | None = graph_cache.get(graph.id, graph.version, "transitive_reduction")
+    if cached is not None:
+        return cached
+
+    nodes, edge_objs = db_get_graph_contents(db, graph)
+    node_names = [node.name for node in nodes]
+    kept: set[tuple[str, str]] = set(
+        cpu_pool.run(transitive_reduction, node_names, [(edge.source, edge.target) for edge in edge_objs])
+    )
+    response = GraphReadResponse.model_validate(
+        {
+            "id": graph.id,
+            "parent_id": graph.parent_id,
+            "reduced": True,
+            "nodes": nodes,
+            "edges": [edge for edge in edge_objs if (edge.source, edge.target) in kept],
+        },
+        from_attributes=True,
+    )
+    graph_cache.put(graph.id, graph.version, "transitive_reduction", response)
+    return response
+
+
+@router.get(
+    "/api/graph/{graph_id}/subgraph",
+    response_model=GraphReadResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admission.limit("subgraph"))],
+    description="Ручка для чтения подграфа, индуцированного вершинами, достижимыми из заданных корней.\n- `direction=downstream` - обход по направлению ребер (потомки),\n- `direction=upstream` - обход против направления ребер (предки),\n- `max_depth` - максимальная глубина обхода (без ограничения, если не задана).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph or node entity not found"},
+        429: {"model": ErrorResponse, "description": "Too many concurrent requests"},
+        503: {"model": ErrorResponse, "description": "Service is overloaded"},
+    }
+)
+def get_subgraph(graph_id: int,
+                 roots: list[str] = Query(..., min_length=1),
+                 direction: Direction = Direction.downstream,
+                 max_depth: int | None = Query(None, ge=0),
+                 db: Session = Depends(get_db)):
+    try:
+        node_names, edges = db_get_subgraph(db, graph_id, roots, direction, max_depth)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+    return GraphReadResponse(
+        id=graph_id,
+        nodes=[{"name": name} for name in node_names],
+        edges=[{"source": source, "target": target} for source, target in edges],
+    )
+
+
 @router.delete(
     "/api/graph/{graph_id}/node/{node_name}",
     status_code=status.HTTP_204_NO_CONTENT,
     description="Ручка для удаления вершины из графа по ее имени.",
     responses={
         404: {"model": ErrorResponse, "description": "Graph entity not found"},
+        409: {"model": ErrorResponse, "description": "Graph has dependent versions"},
     }
 )
 def delete_node(graph_id: int, node_name: str, db: Session = Depends(get_db)):
     try:
         graph: Graph = db_get_graph_by_id(db, graph_id)
-        nodes_cnt: int = len(graph.nodes)
+        nodes_cnt: int = len(db_get_graph_contents(db, graph)[0])
         if nodes_cnt == 1:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                                 detail=f"The node '{node_name}' is the only in the graph with id={graph_id}")
@@ -179,3 +614,34 @@ def delete_node(graph_id: int, node_name: str, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             content={"message": str(e)},
         )
+    except ConflictError as e:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"message": str(e)},
+        )
+
+
+@router.delete(
+    "/api/graph/{graph_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Ручка для удаления графа. Граф сразу становится недоступен для чтения, а его вершины и ребра удаляются в фоне небольшими порциями.",
+    responses={
+        404: {"model": ErrorResponse, "description": "Graph not found"},
+        409: {"model": ErrorResponse, "description": "Graph has dependent versions"},
+    }
+)
+def delete_graph(graph_id: int, db: Session = Depends(get_db)):
+    try:
+        db_delete_graph(db, graph_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+    except ConflictError as e:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"message": str(e)},
+        )
+    graph_cache.invalidate(graph_id)
+    graph_purger.notify()
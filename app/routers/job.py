@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, status
+from app.models.job import IngestJob
+from app.schemas.job import JobResponse
+from app.schemas.common import ErrorResponse
+from app.db.deps import get_db
+from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from app.crud.graph import NotFoundError
+from app.crud.job import db_get_job_by_id
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/graph/jobs/{job_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_200_OK,
+    description="Ручка для получения состояния фоновой задачи загрузки графа.\nСтатусы: `pending` - в очереди, `validating` - проверка графа, `saving` - сохранение в бд, `done` - граф сохранен (`graph_id`), `failed` - ошибка (`error`).",
+    responses={
+        404: {"model": ErrorResponse, "description": "Job entity not found"},
+    }
+)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    try:
+        job: IngestJob = db_get_job_by_id(db, job_id)
+    except NotFoundError as e:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": str(e)},
+        )
+    return JobResponse.model_validate(job, from_attributes=True)
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+
+class LimiterMetrics(BaseModel):
+    max_concurrent: int
+    max_queued: int
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+    timed_out: int
+
+
+class AdmissionMetricsResponse(BaseModel):
+    max_body_bytes: int
+    max_graph_nodes: int
+    max_graph_edges: int
+    payload_rejected: int
+    graph_size_rejected: int
+    endpoints: dict[str, LimiterMetrics]
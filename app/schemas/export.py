@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class ExportTable(str, Enum):
+    nodes = "nodes"
+    edges = "edges"
+
+
+class ExportFormat(str, Enum):
+    arrow = "arrow"
+    parquet = "parquet"
@@ -1,13 +1,17 @@
+from enum import Enum
+
 from pydantic import BaseModel
 
 
 class Node(BaseModel):
     name: str
+    weight: float | None = None
 
 
 class Edge(BaseModel):
     source: str
     target: str
+    weight: float | None = None
 
 
 class GraphCreate(BaseModel):
@@ -19,11 +23,87 @@ class GraphCreateResponse(BaseModel):
     id: int
 
 
+class GraphVersionCreate(BaseModel):
+    add_nodes: list[Node] = []
+    remove_nodes: list[str] = []
+    add_edges: list[Edge] = []
+    remove_edges: list[Edge] = []
+
+
 class GraphReadResponse(BaseModel):
     id: int
+    parent_id: int | None = None
+    reduced: bool = False
     nodes: list[Node]
     edges: list[Edge]
 
 
 class AdjacencyListResponse(BaseModel):
     adjacency_list: dict[str, list[str]]
+
+
+class GraphBatchQuery(BaseModel):
+    ids: list[int]
+    adjacency_list: bool = False
+
+
+class GraphBatchResponse(BaseModel):
+    graphs: list[GraphReadResponse] | None = None
+    adjacency_lists: dict[int, dict[str, list[str]]] | None = None
+    missing: list[int]
+
+
+class CriticalPathResponse(BaseModel):
+    path: list[str]
+    length: float
+    slack: dict[str, float]
+
+
+class Direction(str, Enum):
+    downstream = "downstream"
+    upstream = "upstream"
+
+
+class GraphStatsResponse(BaseModel):
+    nodes: int
+    edges: int
+    sources: int
+    sinks: int
+    max_in_degree: int
+    max_out_degree: int
+    depth: int
+    width: int
+
+
+class LcaQuery(BaseModel):
+    pairs: list[tuple[str, str]]
+
+
+class LcaResponse(BaseModel):
+    lca: list[list[str]]
+
+
+class PathsQuery(BaseModel):
+    pairs: list[tuple[str, str]]
+
+
+class PathsInfo(BaseModel):
+    source: str
+    target: str
+    count: int
+    shortest: list[str] | None = None
+    longest: list[str] | None = None
+
+
+class PathsResponse(BaseModel):
+    paths: list[PathsInfo]
+
+
+class DominatorsQuery(BaseModel):
+    nodes: list[str] = []
+    pairs: list[tuple[str, str]] = []
+
+
+class DominatorsResponse(BaseModel):
+    dominators: dict[str, list[str]]
+    common_dominators: list[str | None]
@@ -0,0 +1,18 @@
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    pending = "pending"
+    validating = "validating"
+    saving = "saving"
+    done = "done"
+    failed = "failed"
+
+
+class JobResponse(BaseModel):
+    id: int
+    status: JobStatus
+    graph_id: int | None = None
+    error: str | None = None
@@ -0,0 +1,218 @@
+import asyncio
+from collections import deque
+from threading import Lock
+from typing import AsyncIterator, Callable, Iterator
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import iterate_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+
+class AdmissionError(Exception):
+    def __init__(self, status_code: int, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.status_code: int = status_code
+        self.retry_after: int = retry_after
+
+
+class PayloadTooLargeError(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Request body is too large")
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float) -> None:
+        self.max_concurrent: int = max_concurrent
+        self.max_queued: int = max_queued
+        self.queue_timeout: float = queue_timeout
+        self.active: int = 0
+        self.admitted: int = 0
+        self.rejected: int = 0
+        self.timed_out: int = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionError(status.HTTP_429_TOO_MANY_REQUESTS, "Too many concurrent requests",
+                                 settings.ADMISSION_RETRY_AFTER)
+
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self.timed_out += 1
+            raise AdmissionError(status.HTTP_503_SERVICE_UNAVAILABLE, "Service is overloaded",
+                                 settings.ADMISSION_RETRY_AFTER)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter: asyncio.Future = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionSlot:
+    def __init__(self, limiter: ConcurrencyLimiter) -> None:
+        self.detached: bool = False
+        self._limiter: ConcurrencyLimiter | None = limiter
+
+    def release(self) -> None:
+        if self._limiter is not None:
+            self._limiter.release()
+            self._limiter = None
+
+    def hold(self, body: Iterator[bytes]) -> AsyncIterator[bytes]:
+        self.detached = True
+
+        async def held_body() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in iterate_in_threadpool(body):
+                    yield chunk
+            finally:
+                self.release()
+
+        return held_body()
+
+
+class AdmissionController:
+    def __init__(self) -> None:
+        self.limiters: dict[str, ConcurrencyLimiter] = {}
+        self.payload_rejected: int = 0
+        self.graph_size_rejected: int = 0
+        self._lock: Lock = Lock()
+
+    def _get_limiter(self, name: str) -> ConcurrencyLimiter:
+        limiter: ConcurrencyLimiter | None = self.limiters.get(name)
+        if limiter is None:
+            limiter = self.limiters.setdefault(name, ConcurrencyLimiter(
+                settings.ADMISSION_MAX_CONCURRENT,
+                settings.ADMISSION_MAX_QUEUED,
+                settings.ADMISSION_QUEUE_TIMEOUT,
+            ))
+        return limiter
+
+    def limit(self, name: str) -> Callable[[], AsyncIterator[None]]:
+        async def dependency() -> AsyncIterator[None]:
+            limiter: ConcurrencyLimiter = self._get_limiter(name)
+            await limiter.acquire()
+            try:
+                yield
+            finally:
+                limiter.release()
+
+        return dependency
+
+    def limit_stream(self, name: str) -> Callable[[], AsyncIterator[AdmissionSlot]]:
+        async def dependency() -> AsyncIterator[AdmissionSlot]:
+            limiter: ConcurrencyLimiter = self._get_limiter(name)
+            await limiter.acquire()
+            slot: AdmissionSlot = AdmissionSlot(limiter)
+            try:
+                yield slot
+            finally:
+                if not slot.detached:
+                    slot.release()
+
+        return dependency
+
+    def check_graph_size(self, nodes_cnt: int, edges_cnt: int) -> str | None:
+        error: str | None = None
+        if nodes_cnt > settings.MAX_GRAPH_NODES:
+            error = f"Graph has more than {settings.MAX_GRAPH_NODES} nodes"
+        elif edges_cnt > settings.MAX_GRAPH_EDGES:
+            error = f"Graph has more than {settings.MAX_GRAPH_EDGES} edges"
+        if error is not None:
+            with self._lock:
+                self.graph_size_rejected += 1
+        return error
+
+    def reject_payload(self) -> None:
+        with self._lock:
+            self.payload_rejected += 1
+
+    def metrics(self) -> dict:
+        return {
+            "max_body_bytes": settings.MAX_BODY_BYTES,
+            "max_graph_nodes": settings.MAX_GRAPH_NODES,
+            "max_graph_edges": settings.MAX_GRAPH_EDGES,
+            "payload_rejected": self.payload_rejected,
+            "graph_size_rejected": self.graph_size_rejected,
+            "endpoints": {name: limiter.metrics() for name, limiter in self.limiters.items()},
+        }
+
+    def reset(self) -> None:
+        self.limiters.clear()
+        self.payload_rejected = 0
+        self.graph_size_rejected = 0
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit: int = settings.MAX_BODY_BYTES
+        for key, value in scope["headers"]:
+            if key == b"content-length" and value.isdigit() and int(value) > limit:
+                admission.reject_payload()
+                response = JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"message": "Request body is too large"},
+                )
+                await response(scope, receive, send)
+                return
+
+        received: int = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message: Message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    admission.reject_payload()
+                    raise PayloadTooLargeError()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+admission = AdmissionController()
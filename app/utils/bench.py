@@ -0,0 +1,70 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import islice, product
+from string import ascii_lowercase
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.crud.graph import db_create_graph, db_get_graph_by_id, db_get_graph_contents, db_delete_node
+from app.db.session import new_session
+
+
+def bench_graph(nodes_cnt: int) -> tuple[list[str], list[tuple[str, str]]]:
+    names: list[str] = ["".join(letters) for letters in islice(product(ascii_lowercase, repeat=4), nodes_cnt)]
+    edges: list[tuple[str, str]] = [
+        (names[i], names[j]) for i in range(len(names)) for j in range(i + 1, min(len(names), i + 3))
+    ]
+    return names, edges
+
+
+def _timed(op: Callable[[Session, int], None], i: int) -> float:
+    started: float = time.perf_counter()
+    with new_session() as db:
+        op(db, i)
+    return time.perf_counter() - started
+
+
+def _start_phase(executor: ThreadPoolExecutor,
+                 ops_cnt: int,
+                 op: Callable[[Session, int], None]) -> tuple[float, list[Future]]:
+    return time.perf_counter(), [executor.submit(_timed, op, i) for i in range(ops_cnt)]
+
+
+def _phase_result(name: str, started: float, futures: list[Future]) -> dict[str, float | str]:
+    latencies: list[float] = sorted(future.result() for future in futures)
+    elapsed: float = time.perf_counter() - started
+    return {
+        "phase": name,
+        "ops": len(latencies),
+        "ops_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+def run_benchmark(graphs_cnt: int, nodes_cnt: int, readers: int, writers: int) -> list[dict[str, float | str]]:
+    names, edges = bench_graph(nodes_cnt)
+    graph_ids: list[int] = []
+    results: list[dict[str, float | str]] = []
+
+    def create(db: Session, i: int) -> None:
+        graph_ids.append(db_create_graph(db, names, edges).id)
+
+    def read(db: Session, i: int) -> None:
+        db_get_graph_contents(db, db_get_graph_by_id(db, random.choice(graph_ids)))
+
+    def delete(db: Session, i: int) -> None:
+        db_delete_node(db, graph_ids[i], names[0])
+
+    with ThreadPoolExecutor(writers) as write_executor, ThreadPoolExecutor(readers) as read_executor:
+        results.append(_phase_result("create_graph", *_start_phase(write_executor, graphs_cnt, create)))
+        results.append(_phase_result("read_graph", *_start_phase(read_executor, graphs_cnt, read)))
+
+        read_phase = _start_phase(read_executor, graphs_cnt, read)
+        delete_phase = _start_phase(write_executor, graphs_cnt, delete)
+        results.append(_phase_result("delete_node (mixed)", *delete_phase))
+        results.append(_phase_result("read_graph (mixed)", *read_phase))
+    return results
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Iterable
+
+from app.config import settings
+
+
+class GraphCache:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize: int = maxsize
+        self._data: OrderedDict[tuple[int, int, str], Any] = OrderedDict()
+        self._lock: Lock = Lock()
+
+    def get(self, graph_id: int, version: int, kind: str) -> Any | None:
+        key = (graph_id, version, kind)
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, graph_id: int, version: int, kind: str, value: Any) -> None:
+        key = (graph_id, version, kind)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, graph_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._data if key[0] == graph_id]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class NodeNameCache:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize: int = maxsize
+        self._names: OrderedDict[int, str] = OrderedDict()
+        self._ids: dict[str, int] = {}
+        self._lock: Lock = Lock()
+
+    def get_ids(self, names: Iterable[str]) -> dict[str, int]:
+        with self._lock:
+            found: dict[str, int] = {name: self._ids[name] for name in names if name in self._ids}
+            for name_id in found.values():
+                self._names.move_to_end(name_id)
+            return found
+
+    def get_names(self, name_ids: Iterable[int]) -> dict[int, str]:
+        with self._lock:
+            found: dict[int, str] = {name_id: self._names[name_id] for name_id in name_ids if name_id in self._names}
+            for name_id in found:
+                self._names.move_to_end(name_id)
+            return found
+
+    def put(self, name_ids: dict[str, int]) -> None:
+        with self._lock:
+            for name, name_id in name_ids.items():
+                self._names[name_id] = name
+                self._names.move_to_end(name_id)
+                self._ids[name] = name_id
+            while len(self._names) > self.maxsize:
+                _, name = self._names.popitem(last=False)
+                del self._ids[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names.clear()
+            self._ids.clear()
+
+
+graph_cache = GraphCache(settings.GRAPH_CACHE_SIZE)
+node_name_cache = NodeNameCache(settings.NODE_NAME_CACHE_SIZE)
@@ -0,0 +1,173 @@
+import zlib
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils.admission import PayloadTooLargeError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DECODE_CHUNK_SIZE = 64 * 1024
+DECODE_ERRORS: tuple[type[Exception], ...] = (zlib.error,) if zstandard is None else (zlib.error, zstandard.ZstdError)
+
+
+class BodyDecodingError(HTTPException):
+    def __init__(self, encoding: str) -> None:
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Request body is not valid {encoding} data")
+
+
+def supported_encodings() -> list[str]:
+    if zstandard is None:
+        return ["gzip"]
+    return ["zstd", "gzip"]
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q: float = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = -1.0
+        if coding and 0 <= q <= 1:
+            qualities[coding.lower()] = q
+    return qualities
+
+
+def preferred_encoding(accept_encoding: str) -> str | None:
+    qualities: dict[str, float] = _parse_accept_encoding(accept_encoding)
+    best: str | None = None
+    best_q: float = 0.0
+    for coding in supported_encodings():
+        q: float = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data: bytes = self.compressor.compress(body)
+        if more_body:
+            return data + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return data + self.compressor.flush()
+
+
+class LimitedBuffer:
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.size: int = 0
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.limit:
+            raise PayloadTooLargeError()
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data: bytes = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BodyDecoder:
+    def __init__(self, encoding: str, limit: int) -> None:
+        self.encoding: str = encoding
+        self.output: LimitedBuffer = LimitedBuffer(limit)
+        if encoding == "zstd":
+            self._writer = zstandard.ZstdDecompressor().stream_writer(
+                self.output, write_size=DECODE_CHUNK_SIZE, closefd=False
+            )
+        else:
+            self._inflater = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def decode(self, data: bytes, final: bool) -> bytes:
+        try:
+            if self.encoding == "zstd":
+                self._writer.write(data)
+                if final:
+                    self._writer.flush()
+            else:
+                while data:
+                    self.output.write(self._inflater.decompress(data, DECODE_CHUNK_SIZE))
+                    data = self._inflater.unconsumed_tail
+                if final:
+                    self.output.write(self._inflater.flush())
+                    if not self._inflater.eof:
+                        raise BodyDecodingError(self.encoding)
+        except DECODE_ERRORS:
+            raise BodyDecodingError(self.encoding)
+        return self.output.take()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers: Headers = Headers(scope=scope)
+        content_encoding: str = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding != "identity":
+            if content_encoding not in supported_encodings():
+                response = JSONResponse(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    content={"message": f"Unsupported Content-Encoding '{content_encoding}'"},
+                )
+                await response(scope, receive, send)
+                return
+            scope, receive = self._decode_request(scope, receive, content_encoding)
+
+        encoding: str | None = preferred_encoding(headers.get("accept-encoding", ""))
+        minimum_size: int = settings.COMPRESSION_MIN_SIZE
+        if encoding == "zstd":
+            responder = ZstdResponder(self.app, minimum_size, settings.COMPRESSION_ZSTD_LEVEL)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, minimum_size, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+        else:
+            responder = IdentityResponder(self.app, minimum_size)
+        await responder(scope, receive, send)
+
+    @staticmethod
+    def _decode_request(scope: Scope, receive: Receive, encoding: str) -> tuple[Scope, Receive]:
+        decoder: BodyDecoder = BodyDecoder(encoding, settings.MAX_DECOMPRESSED_BYTES)
+
+        async def decoded_receive() -> Message:
+            message: Message = await receive()
+            if message["type"] == "http.request":
+                more_body: bool = message.get("more_body", False)
+                message = {
+                    "type": "http.request",
+                    "body": decoder.decode(message.get("body", b""), final=not more_body),
+                    "more_body": more_body,
+                }
+            return message
+
+        headers = [
+            (key, value) for key, value in scope["headers"]
+            if key not in (b"content-encoding", b"content-length")
+        ]
+        return {**scope, "headers": headers}, decoded_receive
@@ -0,0 +1,121 @@
+from typing import Callable, Iterator
+
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.graph import NotFoundError, db_get_graph_by_id, db_iter_graph_nodes, db_iter_graph_edges
+from app.db.shards import shard_router
+from app.models.graph import Graph
+from app.schemas.export import ExportTable, ExportFormat
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailableError(Exception):
+    pass
+
+
+class ChunkSink:
+    def __init__(self) -> None:
+        self.closed: bool = False
+        self._position: int = 0
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data: bytes = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_schema(table: ExportTable) -> "pyarrow.Schema":
+    if table == ExportTable.nodes:
+        return pyarrow.schema([
+            ("graph_id", pyarrow.int64()),
+            ("node_id", pyarrow.int64()),
+            ("name", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+        ])
+    return pyarrow.schema([
+        ("graph_id", pyarrow.int64()),
+        ("edge_id", pyarrow.int64()),
+        ("source_id", pyarrow.int64()),
+        ("target_id", pyarrow.int64()),
+    ])
+
+
+def _record_batch(schema: "pyarrow.Schema", graph_id: int, rows: list[Row]) -> "pyarrow.RecordBatch":
+    columns: list = [pyarrow.array([graph_id] * len(rows), pyarrow.int64())]
+    for i, field in enumerate(list(schema)[1:]):
+        values: list = [row[i] for row in rows]
+        if pyarrow.types.is_dictionary(field.type):
+            columns.append(pyarrow.array(values, pyarrow.string()).dictionary_encode())
+        else:
+            columns.append(pyarrow.array(values, field.type))
+    return pyarrow.record_batch(columns, schema=schema)
+
+
+class GraphExporter:
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size: int = batch_size
+        self.session_factory: Callable[..., Session] = shard_router.session_for
+
+    @staticmethod
+    def check_available() -> None:
+        if pyarrow is None:
+            raise ExportUnavailableError("Columnar export requires pyarrow")
+
+    def _iter_rows(self, db: Session, table: ExportTable, graph: Graph) -> Iterator[list[Row]]:
+        if table == ExportTable.nodes:
+            return db_iter_graph_nodes(db, graph, self.batch_size)
+        return db_iter_graph_edges(db, graph, self.batch_size)
+
+    def iter_export(self, table: ExportTable, fmt: ExportFormat, graph_ids: list[int]) -> Iterator[bytes]:
+        self.check_available()
+        schema: pyarrow.Schema = export_schema(table)
+        sink: ChunkSink = ChunkSink()
+        if fmt == ExportFormat.arrow:
+            writer = pyarrow.ipc.new_stream(sink, schema)
+        else:
+            writer = pyarrow.parquet.ParquetWriter(sink, schema)
+
+        db: Session = self.session_factory()
+        try:
+            for shard_db, shard_graph_ids in shard_router.partition(db, graph_ids):
+                for graph_id in shard_graph_ids:
+                    try:
+                        graph: Graph = db_get_graph_by_id(shard_db, graph_id)
+                    except NotFoundError:
+                        continue
+                    for rows in self._iter_rows(shard_db, table, graph):
+                        writer.write_batch(_record_batch(schema, graph_id, rows))
+                        yield sink.take()
+            writer.close()
+            yield sink.take()
+        finally:
+            db.close()
+
+
+graph_exporter = GraphExporter(settings.EXPORT_BATCH_SIZE)
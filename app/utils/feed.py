@@ -0,0 +1,40 @@
+import asyncio
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+from app.db.shards import shard_router
+
+
+class ChangeFeed:
+    def __init__(self) -> None:
+        self.session_factory: Callable[..., Session] = shard_router.session_for
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock: Lock = Lock()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Event]:
+        subscriber: tuple[asyncio.AbstractEventLoop, asyncio.Event] = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def notify(self) -> None:
+        with self._lock:
+            subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = list(self._subscribers)
+        for loop, wakeup in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(wakeup.set)
+
+
+change_feed = ChangeFeed()
@@ -1,4 +1,32 @@
-from app.models.graph import Node, Edge
+import hashlib
+import json
+import re
+from typing import Hashable
+
+from app.models.graph import Graph, Node, Edge
+from app.schemas.graph import GraphCreate, GraphReadResponse
+from app.utils.tracing import traced
+
+NODE_NAME_PATTERN = re.compile(r'^[a-zA-Z]+$')
+
+
+def unpack_graph_create(graph_in: GraphCreate) -> tuple[
+    list[str], list[tuple[str, str]], dict[str, float], dict[tuple[str, str], float]
+]:
+    node_names: list[str] = [node.name for node in graph_in.nodes]
+    edges: list[tuple[str, str]] = [(edge.source, edge.target) for edge in graph_in.edges]
+    node_weights: dict[str, float] = {node.name: node.weight for node in graph_in.nodes if node.weight is not None}
+    edge_weights: dict[tuple[str, str], float] = {
+        (edge.source, edge.target): edge.weight for edge in graph_in.edges if edge.weight is not None
+    }
+    return node_names, edges, node_weights, edge_weights
+
+
+def graph_read_response(graph: Graph, nodes: list[Node], edges: list[Edge]) -> GraphReadResponse:
+    return GraphReadResponse.model_validate(
+        {"id": graph.id, "parent_id": graph.parent_id, "reduced": graph.is_reduced, "nodes": nodes, "edges": edges},
+        from_attributes=True,
+    )
 
 
 def build_adjacency_list(node_names: list[str], edges: list[tuple[str, str]]) -> dict[str, list[str]]:
@@ -15,6 +43,7 @@ def build_reverse_adjacency_list(node_names: list[str], edges: list[tuple[str, s
     return adj
 
 
+@traced
 def detect_cycles(node_names: list[str], edges: list[tuple[str, str]]) -> bool:
     visited: set[str] = set()
     stack: set[str] = set()
@@ -37,3 +66,140 @@ def detect_cycles(node_names: list[str], edges: list[tuple[str, str]]) -> bool:
             if dfs(node):
                 return True
     return False
+
+
+def topological_sort(node_names: list[str], edges: list[tuple[str, str]]) -> list[str]:
+    adj: dict[str, list[str]] = build_adjacency_list(node_names, edges)
+    in_degree: dict[str, int] = {node: 0 for node in node_names}
+    for _, target in edges:
+        in_degree[target] += 1
+
+    order: list[str] = [node for node in node_names if in_degree[node] == 0]
+    for u in order:
+        for v in adj[u]:
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                order.append(v)
+    return order
+
+
+def critical_path(node_names: list[str],
+                  edges: list[tuple[str, str]],
+                  node_weights: dict[str, float],
+                  edge_weights: dict[tuple[str, str], float]) -> tuple[list[str], float, dict[str, float]]:
+    if not node_names:
+        return [], 0.0, {}
+
+    order: list[str] = topological_sort(node_names, edges)
+    adj: dict[str, list[str]] = build_adjacency_list(node_names, edges)
+
+    head: dict[str, float] = {node: node_weights.get(node, 0.0) for node in node_names}
+    prev: dict[str, str | None] = {node: None for node in node_names}
+    for u in order:
+        for v in adj[u]:
+            candidate = head[u] + edge_weights.get((u, v), 0.0) + node_weights.get(v, 0.0)
+            if candidate >= head[v]:
+                head[v] = candidate
+                prev[v] = u
+
+    tail: dict[str, float] = {}
+    for u in reversed(order):
+        best: float = 0.0
+        for v in adj[u]:
+            best = max(best, edge_weights.get((u, v), 0.0) + tail[v])
+        tail[u] = node_weights.get(u, 0.0) + best
+
+    end: str = max(order, key=lambda node: head[node])
+    length: float = head[end]
+
+    path: list[str] = [end]
+    while prev[path[-1]] is not None:
+        path.append(prev[path[-1]])
+    path.reverse()
+
+    slack: dict[str, float] = {
+        node: length - (head[node] + tail[node] - node_weights.get(node, 0.0))
+        for node in node_names
+    }
+    return path, length, slack
+
+
+@traced
+def validate_graph(node_names: list[str], edges: list[tuple[str, str]]) -> str | None:
+    if not node_names:
+        return "There must be at least one node"
+
+    for name in node_names:
+        if not (1 <= len(name)):
+            return f"Node name '{name}' must be at least 1 character long"
+        if not (len(name) <= 255):
+            return f"Node name '{name}' must be at most 255 characters long"
+        if not NODE_NAME_PATTERN.match(name):
+            return f"Node name '{name}' must consist only of Latin letters"
+    names: set[str] = set(node_names)
+    if len(node_names) != len(names):
+        return "Node names must be unique"
+
+    for source, target in edges:
+        if source not in names or target not in names:
+            return f"Edge ({source}->{target}) with a non-existent vertex"
+
+    seen: set[tuple[str, str]] = set()
+    for source, target in edges:
+        if (source, target) in seen:
+            return f"Duplicate edge ({source}->{target})"
+        seen.add((source, target))
+
+    if detect_cycles(node_names, edges):
+        return "Graph must not contain cycles"
+    return None
+
+
+def graph_content_hash(node_names: list[str],
+                       edges: list[tuple[str, str]],
+                       node_weights: dict[str, float],
+                       edge_weights: dict[tuple[str, str], float],
+                       reduced: bool = False) -> str:
+    canonical = [
+        sorted((name, node_weights.get(name)) for name in node_names),
+        sorted((source, target, edge_weights.get((source, target))) for source, target in edges),
+    ]
+    if reduced:
+        canonical.append("reduced")
+    payload: bytes = json.dumps(canonical, separators=(",", ":")).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def transitive_reduction(node_names: list[str],
+                         edges: list[tuple[str, str]],
+                         keep: set[tuple[str, str]] | None = None) -> list[tuple[str, str]]:
+    keep = keep or set()
+    order: list[str] = topological_sort(node_names, edges)
+    position: dict[str, int] = {name: i for i, name in enumerate(order)}
+    adj: dict[str, list[str]] = build_adjacency_list(node_names, edges)
+
+    reach: list[int] = [0] * len(order)
+    redundant: set[tuple[str, str]] = set()
+    for u in reversed(order):
+        covered: int = 0
+        for v in sorted(adj[u], key=position.__getitem__):
+            bit: int = 1 << position[v]
+            if covered & bit and (u, v) not in keep:
+                redundant.add((u, v))
+            covered |= bit | reach[position[v]]
+        reach[position[u]] = covered
+
+    return [edge for edge in edges if edge not in redundant]
+
+
+def depth_and_width(nodes: list[Hashable], edges: list[tuple[Hashable, Hashable]]) -> tuple[int, int]:
+    adj: dict[Hashable, list[Hashable]] = build_adjacency_list(nodes, edges)
+    level: dict[Hashable, int] = {node: 0 for node in nodes}
+    for u in topological_sort(nodes, edges):
+        for v in adj[u]:
+            level[v] = max(level[v], level[u] + 1)
+
+    widths: dict[int, int] = {}
+    for node_level in level.values():
+        widths[node_level] = widths.get(node_level, 0) + 1
+    return len(widths), max(widths.values(), default=0)
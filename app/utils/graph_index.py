@@ -0,0 +1,176 @@
+from app.utils.graph import topological_sort, build_adjacency_list, build_reverse_adjacency_list
+
+
+def _iter_bits(mask: int):
+    while mask:
+        low: int = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class AncestorIndex:
+    """Lowest common ancestors of node pairs.
+
+    Graphs with at most `max_bitset_nodes` nodes keep an ancestor bitset per node: O(N^2) bits of memory and
+    O(|common| * N/64 + E) word operations per query, where common are the common ancestors of the pair.
+    Larger graphs keep only the adjacency lists and walk the ancestors of both nodes on every query:
+    O(N + E) memory and O(N + E) per query.
+    """
+
+    def __init__(self,
+                 node_names: list[str],
+                 edges: list[tuple[str, str]],
+                 max_bitset_nodes: int | None = None) -> None:
+        self.names: list[str] = topological_sort(node_names, edges)
+        self.position: dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.preds: list[list[int]] = [[] for _ in self.names]
+        self.succs: list[list[int]] = [[] for _ in self.names]
+        for source, target in edges:
+            self.preds[self.position[target]].append(self.position[source])
+            self.succs[self.position[source]].append(self.position[target])
+
+        self.ancestors: list[int] | None = None
+        if max_bitset_nodes is None or len(self.names) <= max_bitset_nodes:
+            self.ancestors = [0] * len(self.names)
+            for i in range(len(self.names)):
+                mask: int = 1 << i
+                for j in self.preds[i]:
+                    mask |= self.ancestors[j]
+                self.ancestors[i] = mask
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.position
+
+    def _walk_ancestors(self, i: int) -> set[int]:
+        seen: set[int] = {i}
+        stack: list[int] = [i]
+        while stack:
+            for j in self.preds[stack.pop()]:
+                if j not in seen:
+                    seen.add(j)
+                    stack.append(j)
+        return seen
+
+    def lowest_common_ancestors(self, u: str, v: str) -> list[str]:
+        i, j = self.position[u], self.position[v]
+        common: set[int]
+        if self.ancestors is not None:
+            common = set(_iter_bits(self.ancestors[i] & self.ancestors[j]))
+        else:
+            common = self._walk_ancestors(i) & self._walk_ancestors(j)
+        # Common ancestors are closed upwards, so one is lowest when none of its children is common
+        return [self.names[k] for k in sorted(common) if not any(child in common for child in self.succs[k])]
+
+
+class DominatorTree:
+    def __init__(self, node_names: list[str], edges: list[tuple[str, str]]) -> None:
+        self.names: list[str] = topological_sort(node_names, edges)
+        self.position: dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        preds: dict[str, list[str]] = build_reverse_adjacency_list(node_names, edges)
+
+        self.root: int = len(self.names)
+        self.depth: list[int] = [0] * (len(self.names) + 1)
+        levels: int = max(1, self.root.bit_length())
+        self.up: list[list[int]] = [[self.root] * (len(self.names) + 1) for _ in range(levels)]
+
+        for i, v in enumerate(self.names):
+            idom: int = self.root
+            if preds[v]:
+                idom = self.position[preds[v][0]]
+                for u in preds[v][1:]:
+                    idom = self._lca(idom, self.position[u])
+            self.depth[i] = self.depth[idom] + 1
+            self.up[0][i] = idom
+            for j in range(1, levels):
+                self.up[j][i] = self.up[j - 1][self.up[j - 1][i]]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.position
+
+    def _lca(self, a: int, b: int) -> int:
+        if self.depth[a] < self.depth[b]:
+            a, b = b, a
+        diff: int = self.depth[a] - self.depth[b]
+        j: int = 0
+        while diff:
+            if diff & 1:
+                a = self.up[j][a]
+            diff >>= 1
+            j += 1
+        if a == b:
+            return a
+        for j in range(len(self.up) - 1, -1, -1):
+            if self.up[j][a] != self.up[j][b]:
+                a, b = self.up[j][a], self.up[j][b]
+        return self.up[0][a]
+
+    def immediate_dominator(self, name: str) -> str | None:
+        idom: int = self.up[0][self.position[name]]
+        return None if idom == self.root else self.names[idom]
+
+    def dominators(self, name: str) -> list[str]:
+        result: list[str] = []
+        i: int = self.up[0][self.position[name]]
+        while i != self.root:
+            result.append(self.names[i])
+            i = self.up[0][i]
+        return result
+
+    def nearest_common_dominator(self, u: str, v: str) -> str | None:
+        i: int = self._lca(self.up[0][self.position[u]], self.up[0][self.position[v]])
+        return None if i == self.root else self.names[i]
+
+
+class PathIndex:
+    def __init__(self, node_names: list[str], edges: list[tuple[str, str]]) -> None:
+        self.names: list[str] = topological_sort(node_names, edges)
+        self.position: dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        succs: dict[str, list[str]] = build_adjacency_list(node_names, edges)
+        preds: dict[str, list[str]] = build_reverse_adjacency_list(node_names, edges)
+        self.succs: list[list[int]] = [[self.position[w] for w in succs[v]] for v in self.names]
+        self.preds: list[list[int]] = [[self.position[u] for u in preds[v]] for v in self.names]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.position
+
+    def _between(self, s: int, t: int) -> list[int]:
+        reachable: set[int] = {s}
+        for i in range(s, t):
+            if i in reachable:
+                reachable.update(j for j in self.succs[i] if j <= t)
+        if t not in reachable:
+            return []
+
+        between: set[int] = {t}
+        for i in range(t - 1, s - 1, -1):
+            if i in reachable and any(j in between for j in self.succs[i]):
+                between.add(i)
+        return sorted(between)
+
+    def _path(self, parent: dict[int, int | None], t: int) -> list[str]:
+        path: list[str] = []
+        v: int | None = t
+        while v is not None:
+            path.append(self.names[v])
+            v = parent[v]
+        return path[::-1]
+
+    def paths(self, source: str, target: str) -> tuple[int, list[str] | None, list[str] | None]:
+        s, t = self.position[source], self.position[target]
+        nodes: list[int] = self._between(s, t)
+        if not nodes:
+            return 0, None, None
+
+        count: dict[int, int] = {s: 1}
+        shortest: dict[int, int] = {s: 0}
+        longest: dict[int, int] = {s: 0}
+        shortest_parent: dict[int, int | None] = {s: None}
+        longest_parent: dict[int, int | None] = {s: None}
+        for v in nodes[1:]:
+            preds: list[int] = [u for u in self.preds[v] if u in count]
+            count[v] = sum(count[u] for u in preds)
+            shortest_parent[v] = min(preds, key=shortest.__getitem__)
+            longest_parent[v] = max(preds, key=longest.__getitem__)
+            shortest[v] = shortest[shortest_parent[v]] + 1
+            longest[v] = longest[longest_parent[v]] + 1
+        return count[t], self._path(shortest_parent, t), self._path(longest_parent, t)
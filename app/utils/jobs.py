@@ -0,0 +1,162 @@
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import Event, Lock, Thread
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.graph import db_create_graph, db_get_graph_id_by_content_hash
+from app.crud.job import db_get_job_by_id, db_get_unfinished_job_ids, db_update_job, db_claim_job, \
+    db_get_reclaimable_job_ids
+from app.db.shards import shard_router
+from app.schemas.graph import GraphCreate
+from app.schemas.job import JobStatus
+from app.utils.graph import validate_graph, graph_content_hash, unpack_graph_create, transitive_reduction
+from app.utils.offload import cpu_pool
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class IngestWorkerPool:
+    def __init__(self, max_workers: int, max_queued: int, reclaim_interval: float) -> None:
+        self.max_workers: int = max_workers
+        self.max_queued: int = max_queued
+        self.reclaim_interval: float = reclaim_interval
+        self.session_factory: Callable[..., Session] = shard_router.session_for
+        self.owner: str = self._new_owner()
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: set[Future] = set()
+        self._job_ids: set[int] = set()
+        self._lock: Lock = Lock()
+        self._stopped: Event = Event()
+        self._thread: Thread | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        return self._executor
+
+    def submit(self, job_id: int, bounded: bool = True) -> None:
+        with self._lock:
+            if job_id in self._job_ids:
+                return
+            if bounded and len(self._futures) >= self.max_queued:
+                raise QueueFullError("Ingest queue is full")
+            future: Future = self._get_executor().submit(self._run, job_id)
+            self._futures.add(future)
+            self._job_ids.add(job_id)
+        future.add_done_callback(lambda done: self._discard(done, job_id))
+
+    @staticmethod
+    def _new_owner() -> str:
+        # Unique per start: a restarted process often gets the same hostname and pid (e.g. pid 1 in a container)
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _discard(self, future: Future, job_id: int) -> None:
+        with self._lock:
+            self._futures.discard(future)
+            self._job_ids.discard(job_id)
+
+    def start(self) -> None:
+        self.owner = self._new_owner()
+        self.resume()
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._loop, name="ingest-reclaim", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        # Jobs whose lease was still held by a previous run of a process (or by a crashed one) are picked up
+        # here once the lease expires
+        while not self._stopped.wait(self.reclaim_interval):
+            try:
+                self.reclaim()
+            except Exception:
+                logger.exception("Ingest job reclaim failed")
+
+    def _collect(self, get_job_ids: Callable[[Session], list[int]]) -> int:
+        db: Session = self.session_factory()
+        try:
+            job_ids: list[int] = [
+                job_id for shard_db in shard_router.each_shard(db) for job_id in get_job_ids(shard_db)
+            ]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.submit(job_id, bounded=False)
+        return len(job_ids)
+
+    def resume(self) -> int:
+        return self._collect(db_get_unfinished_job_ids)
+
+    def reclaim(self) -> int:
+        return self._collect(db_get_reclaimable_job_ids)
+
+    def drain(self, timeout: float | None = None) -> None:
+        with self._lock:
+            futures: set[Future] = set(self._futures)
+        wait(futures, timeout=timeout)
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, job_id: int) -> None:
+        db: Session = self.session_factory(job_id)
+        try:
+            if not db_claim_job(db, job_id, self.owner):
+                return
+            run_ingest_job(db, job_id)
+        except Exception:
+            logger.exception("Ingest job %s failed", job_id)
+            db.rollback()
+            db_update_job(db, db_get_job_by_id(db, job_id), JobStatus.failed, error="Internal error")
+        finally:
+            db.close()
+
+
+def run_ingest_job(db: Session, job_id: int) -> None:
+    job = db_get_job_by_id(db, job_id)
+    if job.status in (JobStatus.done.value, JobStatus.failed.value):
+        return
+
+    graph_in: GraphCreate = GraphCreate.model_validate(job.payload)
+    node_names, edges, node_weights, edge_weights = unpack_graph_create(graph_in)
+    content_hash: str = graph_content_hash(node_names, edges, node_weights, edge_weights, reduced=job.reduce)
+
+    if job.dedupe or job.status == JobStatus.saving.value:
+        existing_id: int | None = db_get_graph_id_by_content_hash(db, content_hash)
+        if existing_id is not None:
+            db_update_job(db, job, JobStatus.done, graph_id=existing_id)
+            return
+
+    db_update_job(db, job, JobStatus.validating)
+    error: str | None = cpu_pool.run(validate_graph, node_names, edges)
+    if error is not None:
+        db_update_job(db, job, JobStatus.failed, error=error)
+        return
+
+    db_update_job(db, job, JobStatus.saving)
+    if job.reduce:
+        edges = cpu_pool.run(transitive_reduction, node_names, edges, set(edge_weights))
+    graph = db_create_graph(db, node_names, edges, node_weights=node_weights, edge_weights=edge_weights,
+                            content_hash=content_hash, is_reduced=job.reduce, colocate_with=job.id)
+    db_update_job(db, job, JobStatus.done, graph_id=graph.id)
+
+
+ingest_pool = IngestWorkerPool(settings.INGEST_WORKERS, settings.INGEST_MAX_QUEUED,
+                               settings.INGEST_RECLAIM_INTERVAL_SECONDS)
@@ -0,0 +1,68 @@
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Any, Callable, TypeVar
+
+from app.config import settings
+from app.utils.tracing import traced
+
+T = TypeVar("T")
+
+
+def pack_graph(node_names: list[str], edges: list[tuple[str, str]]) -> tuple[list[str], array]:
+    symbols: list[str] = list(node_names)
+    index: dict[str, int] = {}
+    for i, name in enumerate(symbols):
+        index.setdefault(name, i)
+
+    packed: array = array("i")
+    for source, target in edges:
+        for name in (source, target):
+            if name not in index:
+                index[name] = len(symbols)
+                symbols.append(name)
+            packed.append(index[name])
+    return symbols, packed
+
+
+def unpack_edges(symbols: list[str], packed: array) -> list[tuple[str, str]]:
+    return [(symbols[packed[i]], symbols[packed[i + 1]]) for i in range(0, len(packed), 2)]
+
+
+def _run_packed(func: Callable[..., T], symbols: list[str], names_cnt: int, packed: array, args: tuple) -> T:
+    return func(symbols[:names_cnt], unpack_edges(symbols, packed), *args)
+
+
+class CpuWorkerPool:
+    def __init__(self, max_workers: int, min_size: int) -> None:
+        self.max_workers: int = max_workers
+        self.min_size: int = min_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock: Lock = Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    @traced
+    def run(self, func: Callable[..., T], node_names: list[str], edges: list[tuple[str, str]], *args: Any) -> T:
+        if self.max_workers <= 0 or len(node_names) + len(edges) < self.min_size:
+            return func(node_names, edges, *args)
+
+        symbols, packed = pack_graph(node_names, edges)
+        return self._get_executor().submit(_run_packed, func, symbols, len(node_names), packed, args).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+cpu_pool = CpuWorkerPool(settings.CPU_POOL_WORKERS, settings.CPU_OFFLOAD_MIN_SIZE)
@@ -0,0 +1,185 @@
+import asyncio
+import cProfile
+import functools
+import json
+import pstats
+import secrets
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable
+
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event, Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+PROFILE_HEADER = "x-profile-token"
+QUERY_START_KEY = "profile_query_start"
+TOP_FUNCTIONS_CNT = 30
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str) -> None:
+        self.id: str = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method: str = method
+        self.path: str = path
+        self.status_code: int | None = None
+        self.started: float = time.perf_counter()
+        self.queries: list[tuple[str, float]] = []
+        self._profilers: list[cProfile.Profile] = []
+        self._lock: Lock = Lock()
+
+    def start_profiler(self) -> cProfile.Profile:
+        profiler: cProfile.Profile = cProfile.Profile()
+        with self._lock:
+            self._profilers.append(profiler)
+        profiler.enable()
+        return profiler
+
+    def runcall(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        profiler: cProfile.Profile = self.start_profiler()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    def add_query(self, statement: str, duration: float) -> None:
+        with self._lock:
+            self.queries.append((statement, duration))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def sql_time(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def server_timing(self) -> str:
+        return (f'total;dur={self.elapsed() * 1000:.1f}, '
+                f'db;dur={self.sql_time() * 1000:.1f};desc="{len(self.queries)} queries"')
+
+    def stats(self) -> pstats.Stats:
+        stats: pstats.Stats = pstats.Stats(self._profilers[0])
+        for profiler in self._profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def save(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        stats: pstats.Stats = self.stats()
+        stats.dump_stats(directory / f"{self.id}.prof")
+
+        top: list[tuple] = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS_CNT]
+        report: dict = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "total_ms": round(self.elapsed() * 1000, 3),
+            "sql_total_ms": round(self.sql_time() * 1000, 3),
+            "queries": [
+                {"statement": statement, "duration_ms": round(duration * 1000, 3)}
+                for statement, duration in self.queries
+            ],
+            "functions": [
+                {
+                    "function": f"{file}:{line}({name})",
+                    "calls": calls,
+                    "own_ms": round(own * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+                for (file, line, name), (_, calls, own, cumulative, _) in top
+            ],
+        }
+        path: Path = directory / f"{self.id}.json"
+        path.write_text(json.dumps(report, indent=2))
+        return path
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+# cProfile measures whole threads, including the shared event loop, so only one request is profiled at a time
+profiling_lock: Lock = Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if current_profile.get() is not None:
+        conn.info.setdefault(QUERY_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile: RequestProfile | None = current_profile.get()
+    started: list[float] = conn.info.get(QUERY_START_KEY, [])
+    if profile is not None and started:
+        profile.add_query(statement, time.perf_counter() - started.pop())
+
+
+def profiled(func: Callable) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profile: RequestProfile | None = current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        return profile.runcall(func, *args, **kwargs)
+
+    return wrapper
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token: str | None = Headers(scope=scope).get(PROFILE_HEADER) if scope["type"] == "http" else None
+        if not settings.PROFILING_TOKEN or token is None \
+                or not secrets.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode()):
+            await self.app(scope, receive, send)
+            return
+
+        if not profiling_lock.acquire(blocking=False):
+            response = JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"message": "Another profiled request is in progress"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            profiling_lock.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profile: RequestProfile = RequestProfile(scope["method"], scope["path"])
+
+        async def profiled_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                headers: MutableHeaders = MutableHeaders(scope=message)
+                headers.append("X-Profile-Id", profile.id)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        reset_token = current_profile.set(profile)
+        profiler: cProfile.Profile = profile.start_profiler()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            profiler.disable()
+            current_profile.reset(reset_token)
+            await asyncio.to_thread(profile.save, Path(settings.PROFILING_DIR))
+
+
+def install_profiling(app: FastAPI) -> None:
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = profiled(route.dependant.call)
+    app.add_middleware(ProfilingMiddleware)
@@ -0,0 +1,94 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from threading import Event, Thread
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.graph import db_get_deleted_graph_ids, db_purge_graph_batch, db_delete_expired_events, \
+    db_purge_lock
+from app.db.shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+
+class GraphPurger:
+    def __init__(self, batch_size: int, throttle: float, interval: float, event_retention: int) -> None:
+        self.batch_size: int = batch_size
+        self.throttle: float = throttle
+        self.interval: float = interval
+        self.event_retention: int = event_retention
+        self.session_factory: Callable[..., Session] = shard_router.session_for
+        self._wakeup: Event = Event()
+        self._stopped: Event = Event()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._wakeup.set()
+        self._thread = Thread(target=self._loop, name="purge", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.purge_pending()
+                self.expire_events()
+            except Exception:
+                logger.exception("Graph purge failed")
+
+    def purge_pending(self) -> int:
+        purged: int = 0
+        db: Session = self.session_factory()
+        try:
+            for shard_db in shard_router.each_shard(db):
+                with db_purge_lock(shard_db) as locked:
+                    if not locked:
+                        continue
+                    for graph_id in db_get_deleted_graph_ids(shard_db):
+                        while not db_purge_graph_batch(shard_db, graph_id, self.batch_size):
+                            if self._stopped.wait(self.throttle):
+                                return purged
+                        purged += 1
+        finally:
+            db.close()
+        return purged
+
+    def expire_events(self) -> int:
+        if self.event_retention <= 0:
+            return 0
+        before: datetime = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.event_retention)
+        expired: int = 0
+        db: Session = self.session_factory()
+        try:
+            for shard_db in shard_router.each_shard(db):
+                with db_purge_lock(shard_db) as locked:
+                    if not locked:
+                        continue
+                    while deleted := db_delete_expired_events(shard_db, before, self.batch_size):
+                        expired += deleted
+                        if self._stopped.wait(self.throttle):
+                            return expired
+        finally:
+            db.close()
+        return expired
+
+
+graph_purger = GraphPurger(settings.PURGE_BATCH_SIZE, settings.PURGE_THROTTLE_SECONDS,
+                           settings.PURGE_INTERVAL_SECONDS, settings.FEED_RETENTION_SECONDS)
@@ -0,0 +1,90 @@
+from collections import Counter
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from app.crud.graph import db_get_graphs, db_get_graph_contents, db_get_deleted_graph_ids, db_purge_graph_batch, \
+    db_has_graph, db_copy_graph, db_materialize_graph, db_detach_graph, db_get_events, db_delete_graph_events
+from app.crud.job import db_get_jobs, db_has_job, db_copy_job, db_delete_job
+from app.db.session import SessionLocal, create_db_engine
+from app.db.shards import ShardRouter
+from app.models.graph import Graph
+
+
+def _purge(db: Session, graph_id: int, batch_size: int) -> None:
+    while not db_purge_graph_batch(db, graph_id, batch_size):
+        pass
+
+
+def _crosses_shards(router: ShardRouter, graph: Graph, graphs: dict[int, Graph], shard: int) -> bool:
+    while graph.depth > 0:
+        graph = graphs[graph.parent_id]
+        if router.shard_for(graph.id) != shard:
+            return True
+    return False
+
+
+def _rebalance_database(router: ShardRouter,
+                        db: Session,
+                        shard: int | None,
+                        targets: dict[int, Session],
+                        batch_size: int,
+                        report: Counter) -> None:
+    for graph_id in db_get_deleted_graph_ids(db):
+        _purge(db, graph_id, batch_size)
+        report["purged"] += 1
+
+    graphs: dict[int, Graph] = {graph.id: graph for graph in db_get_graphs(db)}
+    moved: list[Graph] = [graph for graph in graphs.values() if router.shard_for(graph.id) != shard]
+    for graph in moved:
+        target_db: Session = targets[router.shard_for(graph.id)]
+        if db_has_graph(target_db, graph.id):
+            continue
+        nodes, edges = db_get_graph_contents(db, graph)
+        keep_parent: bool = graph.parent_id is not None and db_has_graph(target_db, graph.parent_id)
+        db_copy_graph(target_db, graph, nodes, edges, db_get_events(db, 0, graph.id, limit=None), keep_parent)
+        report["moved"] += 1
+
+    for graph in reversed(graphs.values()):
+        if router.shard_for(graph.id) != shard:
+            continue
+        parent_moved: bool = graph.parent_id is not None and router.shard_for(graph.parent_id) != shard
+        if _crosses_shards(router, graph, graphs, shard):
+            nodes, edges = db_get_graph_contents(db, graph)
+            db_materialize_graph(db, graph, nodes, edges, keep_parent=not parent_moved)
+            report["materialized"] += 1
+        elif parent_moved:
+            db_detach_graph(db, graph.id)
+            report["detached"] += 1
+
+    for job in db_get_jobs(db):
+        if router.shard_for(job.id) == shard:
+            continue
+        target_db = targets[router.shard_for(job.id)]
+        if not db_has_job(target_db, job.id):
+            db_copy_job(target_db, job, keep_graph=job.graph_id is not None and db_has_graph(target_db, job.graph_id))
+        db_delete_job(db, job.id)
+        report["jobs_moved"] += 1
+
+    for graph in reversed(moved):
+        db_delete_graph_events(db, graph.id)
+        _purge(db, graph.id, batch_size)
+
+
+def rebalance(router: ShardRouter, source_urls: list[str], batch_size: int) -> Counter:
+    report: Counter = Counter()
+    targets: dict[int, Session] = {shard: router.new_session(shard) for shard in range(router.shards_cnt)}
+    try:
+        for url in source_urls:
+            engine: Engine = create_db_engine(url)
+            try:
+                with SessionLocal(bind=engine) as db:
+                    _rebalance_database(router, db, None, targets, batch_size, report)
+            finally:
+                engine.dispose()
+        for shard, db in targets.items():
+            _rebalance_database(router, db, shard, targets, batch_size, report)
+    finally:
+        for db in targets.values():
+            db.close()
+    return report
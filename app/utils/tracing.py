@@ -0,0 +1,256 @@
+import asyncio
+import functools
+import importlib
+import inspect
+import json
+import random
+import re
+import secrets
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import event, Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SPAN_STACK_KEY = "tracing_span_stack"
+MAX_STATEMENT_LENGTH = 1000
+
+
+class Trace:
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id: str = trace_id
+        self.spans: list["Span"] = []
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, parent_id: str | None, attributes: dict[str, Any]) -> None:
+        self.trace: Trace = trace
+        self.name: str = name
+        self.span_id: str = secrets.token_hex(8)
+        self.parent_id: str | None = parent_id
+        self.attributes: dict[str, Any] = attributes
+        self.error: str | None = None
+        self.start_ns: int = time.time_ns()
+        self.end_ns: int | None = None
+
+    def finish(self) -> None:
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: list[Span]) -> None:
+        pass
+
+
+class JsonFileExporter(SpanExporter):
+    def __init__(self, path: str) -> None:
+        self.path: Path = Path(path)
+        self._lock: Lock = Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        lines: str = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with self._lock, self.path.open("a") as file:
+            file.write(lines)
+
+
+def create_exporter(name: str) -> SpanExporter:
+    if name == "json":
+        return JsonFileExporter(settings.TRACING_FILE)
+    module_name, _, factory_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), factory_name)()
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.exporter: SpanExporter | None = None
+
+    def start_trace(self, traceparent: str | None) -> tuple[Trace, str | None] | None:
+        match: re.Match | None = TRACEPARENT_PATTERN.match(traceparent or "")
+        if match is not None and match.group(1) != "0" * 32:
+            if not int(match.group(3), 16) & 1:
+                return None
+            return Trace(match.group(1)), match.group(2)
+        if random.random() >= settings.TRACING_SAMPLE_RATE:
+            return None
+        return Trace(secrets.token_hex(16)), None
+
+    def start_span(self, name: str, attributes: dict[str, Any]) -> Span | None:
+        parent: Span | None = current_span.get()
+        if parent is None:
+            return None
+        return Span(parent.trace, name, parent.span_id, attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        span: Span | None = self.start_span(name, attributes)
+        if span is None:
+            yield None
+            return
+        token = current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            span.finish()
+
+    def export(self, trace: Trace) -> None:
+        if self.exporter is not None:
+            self.exporter.export(trace.spans)
+
+
+tracer = Tracer()
+
+
+def _traced_generator(func: Callable, name: str) -> Callable:
+    # A generator may be resumed from different threads and contexts (e.g. a streamed response),
+    # so the span is made current only around each step instead of for the generator's lifetime.
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Iterator[Any]:
+        span: Span | None = tracer.start_span(name, {})
+        if span is None:
+            yield from func(*args, **kwargs)
+            return
+
+        generator: Iterator[Any] = func(*args, **kwargs)
+        try:
+            while True:
+                token = current_span.set(span)
+                try:
+                    item: Any = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    current_span.reset(token)
+                yield item
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            generator.close()
+            span.finish()
+
+    return wrapper
+
+
+def traced(func: Callable) -> Callable:
+    name: str = f"{func.__module__.removeprefix('app.')}.{func.__qualname__}"
+    if inspect.isgeneratorfunction(func):
+        return _traced_generator(func, name)
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if current_span.get() is None:
+            return func(*args, **kwargs)
+        with tracer.span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        if not asyncio.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = traced(self.dependant.call)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    span: Span | None = tracer.start_span("sql", {"db.statement": statement[:MAX_STATEMENT_LENGTH]})
+    if span is not None:
+        conn.info.setdefault(SPAN_STACK_KEY, []).append(span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    spans: list[Span] = conn.info.get(SPAN_STACK_KEY, [])
+    if spans and current_span.get() is not None:
+        span: Span = spans.pop()
+        span.attributes["db.rowcount"] = cursor.rowcount
+        span.finish()
+
+
+def _handle_error(context) -> None:
+    spans: list[Span] = context.connection.info.get(SPAN_STACK_KEY, []) if context.connection is not None else []
+    if spans and current_span.get() is not None:
+        span: Span = spans.pop()
+        span.error = repr(context.original_exception)
+        span.finish()
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        started: tuple[Trace, str | None] | None = None
+        if scope["type"] == "http":
+            started = tracer.start_trace(Headers(scope=scope).get("traceparent"))
+        if started is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace, parent_id = started
+        span: Span = Span(trace, "http.request", parent_id, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+
+        async def traced_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                headers: MutableHeaders = MutableHeaders(scope=message)
+                headers.append("traceparent", f"00-{trace.trace_id}-{span.span_id}-01")
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, traced_send)
+        except Exception as e:
+            span.error = repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            route: APIRoute | None = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+            span.finish()
+            await asyncio.to_thread(tracer.export, trace)
+
+
+def install_tracing(app: FastAPI, exporter: SpanExporter) -> None:
+    tracer.exporter = exporter
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    app.add_middleware(TracingMiddleware)
@@ -0,0 +1,32 @@
+import logging
+
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+
+from app.crud.graph import db_get_graph_by_id, db_get_graph_contents, NotFoundError
+from app.models.graph import Graph
+from app.utils.cache import graph_cache
+from app.utils.graph import graph_read_response
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_pool(engine: Engine, size: int) -> None:
+    connections = [engine.connect() for _ in range(size)]
+    for connection in connections:
+        connection.execute(text("SELECT 1"))
+        connection.close()
+
+
+def prefetch_graphs(db: Session, graph_ids: list[int]) -> int:
+    prefetched: int = 0
+    for graph_id in graph_ids:
+        try:
+            graph: Graph = db_get_graph_by_id(db, graph_id)
+        except NotFoundError:
+            logger.warning("Graph %s from WARMUP_GRAPH_IDS not found", graph_id)
+            continue
+        nodes, edges = db_get_graph_contents(db, graph)
+        graph_cache.put(graph.id, graph.version, "read", graph_read_response(graph, nodes, edges))
+        prefetched += 1
+    return prefetched
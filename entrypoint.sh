@@ -1,8 +1,10 @@
 #!/usr/bin/env bash
 set -e
 
-alembic upgrade head
+if [ "${DB_BACKEND:-postgresql}" = "postgresql" ]; then
+  alembic upgrade head
+fi
 
 ls -l /app
 
-exec uvicorn app.main:app --host 0.0.0.0 --port 8080
+exec python -m app.launcher
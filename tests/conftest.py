@@ -1,11 +1,24 @@
+import itertools
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from app.config import settings
 from app.main import app
 from app.db.base import Base
 from app.db.deps import get_db
+from app.db.shards import shard_router
+from app.utils.admission import admission
+from app.utils.cache import graph_cache, node_name_cache
+from app.utils.export import graph_exporter
+from app.utils.feed import change_feed
+from app.utils.jobs import ingest_pool
+from app.utils.purge import graph_purger
 
 DATABASE_URL = "sqlite+pysqlite:///:memory:"
 
@@ -27,6 +40,14 @@ def init_db():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def clear_graph_cache():
+    graph_cache.clear()
+    node_name_cache.clear()
+    admission.reset()
+    yield
+
+
 @pytest.fixture()
 def db_session():
     connection = engine.connect()
@@ -39,16 +60,66 @@ def db_session():
 
 
 @pytest.fixture()
-def client(db_session):
+def client(db_session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "WARMUP_POOL", False)
+    monkeypatch.setattr(settings, "PURGE_IN_BACKGROUND", False)
+    monkeypatch.setattr(graph_purger, "session_factory", lambda: db_session)
+    monkeypatch.setattr(graph_purger, "throttle", 0)
+    monkeypatch.setattr(graph_exporter, "session_factory", lambda: db_session)
+    monkeypatch.setattr(change_feed, "session_factory", lambda *args: db_session)
+
     def override_get_db():
         yield db_session
 
     original = app.dependency_overrides.get(get_db)
     app.dependency_overrides[get_db] = override_get_db
+    original_session_factory = ingest_pool.session_factory
+    ingest_pool.session_factory = lambda *args: db_session
     with TestClient(app) as c:
         yield c
 
+    ingest_pool.session_factory = original_session_factory
+
     if original is None:
         app.dependency_overrides.pop(get_db, None)
     else:
         app.dependency_overrides[get_db] = original
+
+
+@pytest.fixture()
+def use_shards(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Callable[[int], list[str]]]:
+    def configure(shards_cnt: int) -> list[str]:
+        shard_router.dispose()
+        urls: list[str] = [f"sqlite+pysqlite:///{tmp_path / f'shard{shard}.db'}" for shard in range(shards_cnt)]
+        monkeypatch.setattr(shard_router, "urls", urls)
+        monkeypatch.setattr(shard_router, "buckets", 16)
+        monkeypatch.setattr(shard_router, "_engines", {})
+        monkeypatch.setattr(shard_router, "_next_shard", itertools.count())
+        for shard_engine in shard_router.engines():
+            Base.metadata.create_all(shard_engine)
+        return urls
+
+    yield configure
+    shard_router.dispose()
+
+
+@pytest.fixture()
+def query_budget() -> Callable[[int], ContextManager[list[str]]]:
+    @contextmanager
+    def check(budget: int) -> Iterator[list[str]]:
+        statements: list[str] = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+        assert len(statements) <= budget, (
+                f"Expected at most {budget} SQL statements, got {len(statements)}:\n" + "\n".join(statements)
+        )
+
+    return check
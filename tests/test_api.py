@@ -1,6 +1,32 @@
+import gzip
+import io
+import json
+import pstats
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pyarrow
+import pyarrow.parquet
 import pytest
+import zstandard
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.graph import db_delete_expired_events
+from app.db.deps import get_db
+from app.db.shards import shard_router
+from app.models.event import GraphEvent
+from app.routers import main_router
+from app.utils.export import graph_exporter
+from app.utils.jobs import ingest_pool
+from app.utils.profiling import install_profiling, profiling_lock
+from app.utils.purge import graph_purger
+from app.utils.tracing import install_tracing, tracer, JsonFileExporter
 
 
 def get_dict_data(nodes: list[str], edges: list[tuple[str, str]]) -> dict[str, list[dict[str, str]]]:
@@ -55,7 +81,7 @@ def test_db_integrity_error_returns_400(client: TestClient,
                                         edges: list[tuple[str, str]]):
     payload = get_dict_data(nodes, edges)
 
-    def fake_db_create_graph(db, names, edges):
+    def fake_db_create_graph(db, names, edges, **kwargs):
         raise IntegrityError("orig statement", params=None, orig=None)
 
     monkeypatch.setattr("app.routers.graph.db_create_graph", fake_db_create_graph)
@@ -347,3 +373,873 @@ def test_delete_node_invalid(client: TestClient,
 
     response = client.delete(f"/api/graph/{graph_id}/node/{node_name}/")
     assert response.status_code == expected_status
+
+
+@pytest.mark.parametrize(
+    "query, result_nodes, result_edges",
+    [
+        ("roots=b", ["b", "c", "d"], [("b", "c"), ("c", "d")]),
+        ("roots=c&direction=upstream&max_depth=1", ["b", "c"], [("b", "c")]),
+        ("roots=a&roots=d&max_depth=0", ["a", "d"], []),
+    ], ids=[
+        "downstream",
+        "upstream-bounded",
+        "several-roots",
+    ]
+)
+def test_get_subgraph(client: TestClient, query: str, result_nodes: list[str], result_edges: list[tuple[str, str]]):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c", "d"], [("a", "b"), ("b", "c"), ("c", "d")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/subgraph?{query}")
+    assert response.status_code == 200
+
+    data = response.json()
+    result = get_dict_data(result_nodes, result_edges)
+    assert data["id"] == graph_id
+    assert data["nodes"] == result["nodes"]
+    assert data["edges"] == result["edges"]
+
+
+@pytest.mark.parametrize(
+    "graph_id, query, expected_status",
+    [
+        (100, "roots=a", 404),
+        (None, "roots=x", 404),
+        (None, "", 422),
+        (None, "roots=a&direction=sideways", 422),
+        (None, "roots=a&max_depth=-1", 422),
+    ], ids=[
+        "not-found-id",
+        "not-found-root",
+        "no-roots",
+        "invalid-direction",
+        "negative-depth",
+    ]
+)
+def test_get_subgraph_invalid(client: TestClient, graph_id: int | None, query: str, expected_status: int):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b"], [("a", "b")]))
+    assert response.status_code == 201
+
+    response = client.get(f"/api/graph/{graph_id or response.json()['id']}/subgraph?{query}")
+    assert response.status_code == expected_status
+
+
+def test_create_and_read_weighted_graph(client: TestClient):
+    payload = {"nodes": [{"name": "a", "weight": 2.0}, {"name": "b"}],
+               "edges": [{"source": "a", "target": "b", "weight": 0.5}]}
+    response = client.post("/api/graph/", json=payload)
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["nodes"] == payload["nodes"]
+    assert data["edges"] == payload["edges"]
+
+
+def test_get_critical_path(client: TestClient):
+    payload = {"nodes": [{"name": "a", "weight": 1}, {"name": "b", "weight": 5},
+                         {"name": "c", "weight": 2}, {"name": "d", "weight": 1}],
+               "edges": [{"source": "a", "target": "b"}, {"source": "a", "target": "c"},
+                         {"source": "b", "target": "d"}, {"source": "c", "target": "d"}]}
+    response = client.post("/api/graph/", json=payload)
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/critical_path")
+    assert response.status_code == 200
+    assert response.json() == {"path": ["a", "b", "d"], "length": 7.0,
+                               "slack": {"a": 0.0, "b": 0.0, "c": 3.0, "d": 0.0}}
+
+    response = client.delete(f"/api/graph/{graph_id}/node/b/")
+    assert response.status_code == 204
+
+    response = client.get(f"/api/graph/{graph_id}/critical_path")
+    assert response.status_code == 200
+    assert response.json() == {"path": ["a", "c", "d"], "length": 4.0,
+                               "slack": {"a": 0.0, "c": 0.0, "d": 0.0}}
+
+
+@pytest.mark.parametrize(
+    "graph_id, expected_status",
+    [
+        (100, 404),
+        ("invalid", 422),
+    ], ids=[
+        "not-found-id",
+        "invalid-id-format",
+    ]
+)
+def test_get_critical_path_invalid(client: TestClient, graph_id: int | str, expected_status: int):
+    response = client.get(f"/api/graph/{graph_id}/critical_path")
+    assert response.status_code == expected_status
+
+
+def test_create_graph_version(client: TestClient):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    patch = {"add_nodes": [{"name": "d"}], "remove_nodes": ["a"],
+             "add_edges": [{"source": "c", "target": "d"}], "remove_edges": [{"source": "b", "target": "c"}]}
+    response = client.post(f"/api/graph/{graph_id}/versions", json=patch)
+    assert response.status_code == 201
+    version_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{version_id}/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["parent_id"] == graph_id
+    assert data["nodes"] == get_dict_data(["b", "c", "d"], [])["nodes"]
+    assert data["edges"] == get_dict_data([], [("c", "d")])["edges"]
+
+    response = client.get(f"/api/graph/{graph_id}/adjacency_list")
+    assert response.json()["adjacency_list"] == {"a": ["b"], "b": ["c"], "c": []}
+
+    response = client.delete(f"/api/graph/{graph_id}/node/a/")
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize(
+    "graph_id, patch, expected_status",
+    [
+        (100, {}, 404),
+        (None, {"remove_nodes": ["x"]}, 400),
+        (None, {"remove_edges": [{"source": "b", "target": "a"}]}, 400),
+        (None, {"add_edges": [{"source": "b", "target": "a"}]}, 400),
+        (None, {"add_nodes": [{"name": "a"}]}, 400),
+        (None, {"remove_nodes": ["a", "b"]}, 400),
+    ], ids=[
+        "not-found-id",
+        "remove-missing-node",
+        "remove-missing-edge",
+        "cycle",
+        "duplicate-node",
+        "no-nodes-left",
+    ]
+)
+def test_create_graph_version_invalid(client: TestClient, graph_id: int | None, patch: dict, expected_status: int):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b"], [("a", "b")]))
+    assert response.status_code == 201
+
+    response = client.post(f"/api/graph/{graph_id or response.json()['id']}/versions", json=patch)
+    assert response.status_code == expected_status
+
+
+def test_create_graph_dedupe(client: TestClient):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    payload = get_dict_data(["c", "b", "a"], [("b", "c"), ("a", "b")])
+    response = client.post("/api/graph/?dedupe=true", json=payload)
+    assert response.status_code == 200
+    assert response.json() == {"id": graph_id}
+
+    response = client.post("/api/graph/", json=payload)
+    assert response.status_code == 201
+    assert response.json()["id"] != graph_id
+
+    response = client.delete(f"/api/graph/{graph_id}/node/a/")
+    assert response.status_code == 204
+
+    response = client.post("/api/graph/?dedupe=true", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]))
+    assert response.status_code == 200
+    assert response.json()["id"] not in (graph_id, None)
+
+
+@pytest.mark.parametrize(
+    "nodes, edges, expected_status, expected_error",
+    [
+        (["a", "b"], [("a", "b")], "done", None),
+        (["a", "b"], [("a", "b"), ("b", "a")], "failed", "Graph must not contain cycles"),
+    ], ids=[
+        "valid-graph",
+        "cyclic-graph",
+    ]
+)
+def test_create_graph_async(client: TestClient,
+                            nodes: list[str],
+                            edges: list[tuple[str, str]],
+                            expected_status: str,
+                            expected_error: str | None):
+    payload = get_dict_data(nodes, edges)
+    response = client.post("/api/graph/?async=true", json=payload)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "pending"
+
+    ingest_pool.drain(timeout=10)
+
+    response = client.get(f"/api/graph/jobs/{job['id']}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == expected_status
+    assert data["error"] == expected_error
+
+    if expected_status == "done":
+        response = client.get(f"/api/graph/{data['graph_id']}/")
+        assert response.status_code == 200
+        assert response.json()["nodes"] == payload["nodes"]
+
+
+def test_create_graph_async_queue_full(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(ingest_pool, "max_queued", 0)
+    response = client.post("/api/graph/?async=true", json=get_dict_data(["a"], []))
+    assert response.status_code == 503
+
+
+def test_get_job_invalid(client: TestClient):
+    response = client.get("/api/graph/jobs/100")
+    assert response.status_code == 404
+
+
+def test_get_lca_and_dominators(client: TestClient):
+    edges = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("x", "e")]
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c", "d", "e", "x"], edges))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.post(f"/api/graph/{graph_id}/lca", json={"pairs": [["b", "c"], ["e", "x"], ["b", "x"]]})
+    assert response.status_code == 200
+    assert response.json() == {"lca": [["a"], ["x"], []]}
+
+    response = client.post(f"/api/graph/{graph_id}/dominators", json={"nodes": ["d", "e"], "pairs": [["b", "c"]]})
+    assert response.status_code == 200
+    assert response.json() == {"dominators": {"d": ["a"], "e": []}, "common_dominators": ["a"]}
+
+
+@pytest.mark.parametrize(
+    "graph_id, path, payload, expected_status",
+    [
+        (100, "lca", {"pairs": []}, 404),
+        (None, "lca", {"pairs": [["a", "z"]]}, 404),
+        (None, "lca", {"pairs": [["a"]]}, 422),
+        (100, "dominators", {"nodes": []}, 404),
+        (None, "dominators", {"nodes": ["z"]}, 404),
+        (None, "dominators", {"pairs": [["a", "z"]]}, 404),
+    ], ids=[
+        "lca-not-found-id",
+        "lca-not-found-node",
+        "lca-invalid-pair",
+        "dominators-not-found-id",
+        "dominators-not-found-node",
+        "dominators-not-found-pair-node",
+    ]
+)
+def test_get_lca_and_dominators_invalid(client: TestClient, graph_id: int | None, path: str, payload: dict,
+                                        expected_status: int):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b"], [("a", "b")]))
+    assert response.status_code == 201
+
+    response = client.post(f"/api/graph/{graph_id or response.json()['id']}/{path}", json=payload)
+    assert response.status_code == expected_status
+
+
+def test_get_paths(client: TestClient):
+    edges = [("a", "b"), ("b", "c"), ("c", "d"), ("a", "c"), ("a", "d"), ("x", "d")]
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c", "d", "x"], edges))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/paths?source=a&target=d")
+    assert response.status_code == 200
+    assert response.json() == {"source": "a", "target": "d", "count": 3,
+                               "shortest": ["a", "d"], "longest": ["a", "b", "c", "d"]}
+
+    response = client.post(f"/api/graph/{graph_id}/paths", json={"pairs": [["b", "d"], ["x", "a"]]})
+    assert response.status_code == 200
+    assert response.json() == {"paths": [
+        {"source": "b", "target": "d", "count": 1, "shortest": ["b", "c", "d"], "longest": ["b", "c", "d"]},
+        {"source": "x", "target": "a", "count": 0},
+    ]}
+
+    response = client.get(f"/api/graph/{graph_id}/paths?source=a&target=z")
+    assert response.status_code == 404
+    response = client.post(f"/api/graph/{graph_id}/paths", json={"pairs": [["z", "a"]]})
+    assert response.status_code == 404
+    response = client.get("/api/graph/100/paths?source=a&target=d")
+    assert response.status_code == 404
+
+
+def test_batch_get_graphs(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]))
+    base_id = response.json()["id"]
+    response = client.post(f"/api/graph/{base_id}/versions", json={"remove_nodes": ["c"], "add_nodes": [{"name": "d"}],
+                                                                   "add_edges": [{"source": "a", "target": "d"}]})
+    version_id = response.json()["id"]
+    response = client.post("/api/graph/", json=get_dict_data(["x"], []))
+    deleted_id = response.json()["id"]
+    assert client.delete(f"/api/graph/{deleted_id}").status_code == 204
+
+    response = client.post("/api/graph/batch_get", json={"ids": [version_id, 100000, base_id, deleted_id, base_id]})
+    assert response.status_code == 200
+    assert response.json() == {
+        "graphs": [
+            {"id": version_id, "parent_id": base_id, "reduced": False,
+             "nodes": [{"name": "a"}, {"name": "b"}, {"name": "d"}],
+             "edges": [{"source": "a", "target": "b"}, {"source": "a", "target": "d"}]},
+            client.get(f"/api/graph/{base_id}/").json(),
+        ],
+        "missing": [100000, deleted_id],
+    }
+
+    response = client.post("/api/graph/batch_get", json={"ids": [base_id, version_id, 100000], "adjacency_list": True})
+    assert response.status_code == 200
+    assert response.json() == {
+        "adjacency_lists": {
+            str(base_id): {"a": ["b"], "b": ["c"], "c": []},
+            str(version_id): {"a": ["b", "d"], "b": [], "d": []},
+        },
+        "missing": [100000],
+    }
+
+    monkeypatch.setattr(settings, "MAX_BATCH_GRAPHS", 2)
+    response = client.post("/api/graph/batch_get", json={"ids": [1, 2, 3]})
+    assert response.status_code == 413
+
+
+def test_get_transitive_reduction(client: TestClient):
+    payload = get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")])
+    response = client.post("/api/graph/", json=payload)
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/transitive_reduction")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["reduced"] is True
+    assert data["edges"] == get_dict_data([], [("a", "b"), ("b", "c")])["edges"]
+
+    response = client.get(f"/api/graph/{graph_id}/")
+    assert response.json()["reduced"] is False
+    assert response.json()["edges"] == payload["edges"]
+
+    response = client.get("/api/graph/100/transitive_reduction")
+    assert response.status_code == 404
+
+
+def test_create_reduced_graph(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    payload = {"nodes": [{"name": "a"}, {"name": "b"}, {"name": "c"}, {"name": "d"}],
+               "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "c"},
+                         {"source": "a", "target": "c"}, {"source": "c", "target": "d"},
+                         {"source": "a", "target": "d", "weight": 3}]}
+    response = client.post("/api/graph/?reduce=true", json=payload)
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/")
+    data = response.json()
+    assert data["reduced"] is True
+    assert data["edges"] == [{"source": "a", "target": "b"}, {"source": "b", "target": "c"},
+                             {"source": "c", "target": "d"}, {"source": "a", "target": "d", "weight": 3}]
+
+    response = client.post("/api/graph/?dedupe=true", json=payload)
+    assert response.status_code == 201
+    assert response.json()["id"] != graph_id
+
+    for max_depth in (settings.GRAPH_VERSION_MAX_DEPTH, 0):
+        monkeypatch.setattr(settings, "GRAPH_VERSION_MAX_DEPTH", max_depth)
+        response = client.post(f"/api/graph/{graph_id}/versions", json={"remove_nodes": ["d"]})
+        assert response.status_code == 201
+        data = client.get(f"/api/graph/{response.json()['id']}/").json()
+        assert data["reduced"] is True
+        assert data["edges"] == [{"source": "a", "target": "b"}, {"source": "b", "target": "c"}]
+
+
+def test_get_graph_stats(client: TestClient):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c", "d"],
+                                                             [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.get(f"/api/graph/{graph_id}/stats")
+    assert response.status_code == 200
+    assert response.json() == {"nodes": 4, "edges": 4, "sources": 1, "sinks": 1,
+                               "max_in_degree": 2, "max_out_degree": 2, "depth": 3, "width": 2}
+
+    response = client.delete(f"/api/graph/{graph_id}/node/d/")
+    assert response.status_code == 204
+
+    response = client.get(f"/api/graph/{graph_id}/stats")
+    assert response.json()["nodes"] == 3
+    assert response.json()["sinks"] == 2
+
+    response = client.get("/api/graph/100/stats")
+    assert response.status_code == 404
+
+
+def test_delete_graph(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    response = client.post(f"/api/graph/{graph_id}/versions", json={"remove_nodes": ["c"]})
+    assert response.status_code == 201
+    version_id = response.json()["id"]
+
+    response = client.delete(f"/api/graph/{graph_id}")
+    assert response.status_code == 409
+
+    response = client.get(f"/api/graph/{version_id}/critical_path")
+    assert response.status_code == 200
+
+    for _id in (version_id, graph_id):
+        response = client.delete(f"/api/graph/{_id}")
+        assert response.status_code == 204
+
+    for path in ["/", "/adjacency_list", "/critical_path", "/stats"]:
+        response = client.get(f"/api/graph/{version_id}{path}")
+        assert response.status_code == 404
+
+    response = client.delete(f"/api/graph/{graph_id}")
+    assert response.status_code == 404
+
+    with monkeypatch.context() as patch:
+        patch.setattr("app.utils.purge.db_purge_lock", lambda db: nullcontext(False))
+        assert graph_purger.purge_pending() == 0
+
+    assert graph_purger.purge_pending() == 2
+    assert graph_purger.purge_pending() == 0
+
+
+@pytest.mark.parametrize(
+    "setting, value, payload",
+    [
+        ("MAX_GRAPH_NODES", 2, get_dict_data(["a", "b", "c"], [])),
+        ("MAX_GRAPH_EDGES", 1, get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")])),
+        ("MAX_BODY_BYTES", 10, get_dict_data(["a"], [])),
+    ], ids=[
+        "too-many-nodes",
+        "too-many-edges",
+        "body-too-large",
+    ]
+)
+def test_create_graph_too_large(client: TestClient,
+                                monkeypatch: pytest.MonkeyPatch,
+                                setting: str,
+                                value: int,
+                                payload: dict):
+    monkeypatch.setattr(settings, setting, value)
+    response = client.post("/api/graph/", json=payload)
+    assert response.status_code == 413
+    assert "message" in response.json()
+
+    metrics = client.get("/api/admission/metrics").json()
+    assert metrics["payload_rejected"] + metrics["graph_size_rejected"] == 1
+
+
+def test_create_graph_streamed_body_too_large(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "MAX_BODY_BYTES", 10)
+    response = client.post("/api/graph/", content=iter([b'{"nodes": [', b'{"name": "a"}], "edges": []}']),
+                           headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert response.json() == {"message": "Request body is too large"}
+
+
+def test_admission_limits(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b"], [("a", "b")]))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    monkeypatch.setattr(settings, "ADMISSION_MAX_CONCURRENT", 0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED", 0)
+    response = client.get(f"/api/graph/{graph_id}/critical_path")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(settings.ADMISSION_RETRY_AFTER)
+
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED", 1)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.01)
+    response = client.get(f"/api/graph/{graph_id}/subgraph?roots=a")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+    response = client.get(f"/api/graph/{graph_id}/")
+    assert response.status_code == 200
+
+    metrics = client.get("/api/admission/metrics").json()
+    assert metrics["endpoints"]["create_graph"]["admitted"] == 1
+    assert metrics["endpoints"]["critical_path"]["rejected"] == 1
+    assert metrics["endpoints"]["subgraph"]["timed_out"] == 1
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected_encoding",
+    [
+        ("gzip", "gzip"),
+        ("zstd, gzip", "zstd"),
+        ("gzip;q=1, zstd;q=0.1", "gzip"),
+        ("*", "zstd"),
+        ("gzip;q=0, zstd;q=0", None),
+        ("identity", None),
+    ], ids=[
+        "gzip",
+        "zstd-preferred",
+        "quality-order",
+        "wildcard",
+        "all-refused",
+        "identity",
+    ]
+)
+def test_compressed_response(client: TestClient, accept_encoding: str, expected_encoding: str | None):
+    names = ["".join(chr(ord("a") + i // 26 ** k % 26) for k in range(2)) for i in range(200)]
+    response = client.post("/api/graph/", json=get_dict_data(names, list(zip(names, names[1:]))))
+    assert response.status_code == 201
+    graph_id = response.json()["id"]
+
+    for path in ["/", "/adjacency_list", "/reverse_adjacency_list"]:
+        response = client.get(f"/api/graph/{graph_id}{path}", headers={"Accept-Encoding": accept_encoding})
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") == expected_encoding
+        assert len(response.json()["nodes" if path == "/" else "adjacency_list"]) == 200
+
+    response = client.get("/health", headers={"Accept-Encoding": accept_encoding})
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [
+        ("gzip", gzip.compress),
+        ("zstd", lambda data: zstandard.ZstdCompressor().compress(data)),
+    ], ids=[
+        "gzip",
+        "zstd",
+    ]
+)
+def test_create_graph_compressed_body(client: TestClient, monkeypatch: pytest.MonkeyPatch, encoding: str, compress):
+    body = compress(json.dumps(get_dict_data(["a", "b"], [("a", "b")])).encode())
+    headers = {"Content-Type": "application/json", "Content-Encoding": encoding}
+    response = client.post("/api/graph/", content=body, headers=headers)
+    assert response.status_code == 201
+
+    response = client.get(f"/api/graph/{response.json()['id']}/")
+    assert response.json()["edges"] == [{"source": "a", "target": "b"}]
+
+    response = client.post("/api/graph/", content=b"not compressed", headers=headers)
+    assert response.status_code == 400
+    assert "message" in response.json()
+
+    monkeypatch.setattr(settings, "MAX_DECOMPRESSED_BYTES", 1024)
+    bomb = compress(json.dumps(get_dict_data(["a" * 100000], [])).encode())
+    assert len(bomb) < 1024
+    response = client.post("/api/graph/", content=bomb, headers=headers)
+    assert response.status_code == 413
+
+
+def test_create_graph_unsupported_encoding(client: TestClient):
+    response = client.post("/api/graph/", content=b"{}",
+                           headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize(
+    "fmt, media_type",
+    [
+        ("parquet", "application/vnd.apache.parquet"),
+        ("arrow", "application/vnd.apache.arrow.stream"),
+    ], ids=[
+        "parquet",
+        "arrow",
+    ]
+)
+def test_export_graphs(client: TestClient, monkeypatch: pytest.MonkeyPatch, fmt: str, media_type: str):
+    monkeypatch.setattr(graph_exporter, "batch_size", 2)
+    first_id = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")])).json()["id"]
+    second_id = client.post("/api/graph/", json=get_dict_data(["b", "d"], [("d", "b")])).json()["id"]
+
+    def read_table(table: str, end_id: int) -> dict[str, list]:
+        response = client.get(f"/api/export/{table}?start_id={first_id}&end_id={end_id}&format={fmt}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == media_type
+        if fmt == "arrow":
+            return pyarrow.ipc.open_stream(response.content).read_all().to_pydict()
+        return pyarrow.parquet.read_table(io.BytesIO(response.content)).to_pydict()
+
+    nodes = read_table("nodes", second_id)
+    assert nodes["graph_id"] == [first_id] * 3 + [second_id] * 2
+    assert nodes["name"] == ["a", "b", "c", "b", "d"]
+    ids = dict(zip(zip(nodes["graph_id"], nodes["name"]), nodes["node_id"]))
+
+    edges = read_table("edges", second_id)
+    assert edges["graph_id"] == [first_id, first_id, second_id]
+    assert list(zip(edges["source_id"], edges["target_id"])) == [
+        (ids[first_id, "a"], ids[first_id, "b"]),
+        (ids[first_id, "b"], ids[first_id, "c"]),
+        (ids[second_id, "d"], ids[second_id, "b"]),
+    ]
+
+    assert read_table("edges", first_id)["graph_id"] == [first_id, first_id]
+
+
+def test_export_holds_admission_slot(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    graph_id = client.post("/api/graph/", json=get_dict_data(["a", "b"], [("a", "b")])).json()["id"]
+    monkeypatch.setattr(settings, "ADMISSION_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED", 0)
+
+    started = threading.Event()
+    finish = threading.Event()
+    iter_rows = graph_exporter._iter_rows
+
+    def blocking_iter_rows(*args):
+        started.set()
+        finish.wait(5)
+        return iter_rows(*args)
+
+    monkeypatch.setattr(graph_exporter, "_iter_rows", blocking_iter_rows)
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(client.get(f"/api/export/nodes?start_id={graph_id}")))
+    thread.start()
+    assert started.wait(5)
+
+    response = client.get(f"/api/export/edges?start_id={graph_id}")
+    assert response.status_code == 429
+
+    finish.set()
+    thread.join(5)
+    assert responses[0].status_code == 200
+
+    metrics = client.get("/api/admission/metrics").json()
+    assert metrics["endpoints"]["export"]["active"] == 0
+    assert metrics["endpoints"]["export"]["rejected"] == 1
+
+
+@pytest.mark.parametrize(
+    "path, expected_status",
+    [
+        ("nodes?start_id=100", 404),
+        ("nodes?start_id=2&end_id=1", 400),
+        ("vertices?start_id=1", 422),
+        ("edges?start_id=1&format=csv", 422),
+    ], ids=[
+        "not-found",
+        "invalid-range",
+        "invalid-table",
+        "invalid-format",
+    ]
+)
+def test_export_graphs_invalid(client: TestClient, path: str, expected_status: int):
+    response = client.get(f"/api/export/{path}")
+    assert response.status_code == expected_status
+
+
+@pytest.mark.parametrize(
+    "configured_token, token, expected_profiled",
+    [
+        ("secret", "secret", True),
+        ("secret", "wrong", False),
+        ("secret", None, False),
+        ("", "", False),
+    ], ids=[
+        "valid-token",
+        "wrong-token",
+        "no-header",
+        "token-not-configured",
+    ]
+)
+def test_profiling(db_session: Session, monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+                   configured_token: str, token: str | None, expected_profiled: bool):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", configured_token)
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    profiled_app = FastAPI()
+    profiled_app.include_router(main_router)
+    profiled_app.dependency_overrides[get_db] = lambda: db_session
+    install_profiling(profiled_app)
+    client = TestClient(profiled_app)
+
+    headers = {} if token is None else {"X-Profile-Token": token}
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]),
+                           headers=headers)
+    assert response.status_code == 201
+    assert ("X-Profile-Id" in response.headers) == expected_profiled
+    if not expected_profiled:
+        assert list(tmp_path.iterdir()) == []
+        return
+
+    profile_id = response.headers["X-Profile-Id"]
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+    report = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert report["path"] == "/api/graph/"
+    assert report["status_code"] == 201
+    assert report["queries"] and all(query["duration_ms"] >= 0 for query in report["queries"])
+    assert report["functions"]
+    functions = {name for _, _, name in pstats.Stats(str(tmp_path / f"{profile_id}.prof")).stats}
+    assert {"detect_cycles", "db_create_graph"} <= functions
+
+
+def test_profiling_one_request_at_a_time(db_session: Session, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    profiled_app = FastAPI()
+    profiled_app.include_router(main_router)
+    profiled_app.dependency_overrides[get_db] = lambda: db_session
+    install_profiling(profiled_app)
+    client = TestClient(profiled_app)
+
+    with profiling_lock:
+        response = client.get("/api/graph/jobs/100", headers={"X-Profile-Token": "secret"})
+        assert response.status_code == 409
+        assert "X-Profile-Id" not in response.headers
+        assert client.get("/api/graph/jobs/100").status_code == 404
+
+    response = client.get("/api/graph/jobs/100", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 404
+    assert "X-Profile-Id" in response.headers
+
+
+def test_tracing(db_session: Session, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(tracer, "exporter", None)
+    traced_app = FastAPI()
+    traced_app.include_router(main_router)
+    traced_app.dependency_overrides[get_db] = lambda: db_session
+    install_tracing(traced_app, JsonFileExporter(str(tmp_path / "traces.jsonl")))
+    client = TestClient(traced_app)
+
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    response = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")]),
+                           headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+    assert response.status_code == 201
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+
+    spans = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()]
+    assert {span["trace_id"] for span in spans} == {trace_id}
+    root = spans[-1]
+    assert root["name"] == "POST /api/graph/"
+    assert root["parent_id"] == parent_id
+    assert root["attributes"]["http.status_code"] == 201
+
+    span_ids = {span["span_id"] for span in spans}
+    assert all(span["parent_id"] in span_ids for span in spans[:-1])
+    names = {span["name"] for span in spans}
+    assert {"routers.graph.create_graph", "utils.graph.validate_graph", "utils.graph.detect_cycles",
+            "crud.graph.db_create_graph", "sql"} <= names
+
+    graph_id = response.json()["id"]
+    response = client.get(f"/api/graph/{graph_id}/", headers={"traceparent": f"00-{trace_id}-{parent_id}-00"})
+    assert response.status_code == 200
+    assert "traceparent" not in response.headers
+    assert len((tmp_path / "traces.jsonl").read_text().splitlines()) == len(spans)
+
+    monkeypatch.setattr(graph_exporter, "session_factory", lambda: db_session)
+    response = client.get(f"/api/export/nodes?start_id={graph_id}&format=arrow",
+                          headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+    assert response.status_code == 200
+    spans = [json.loads(line) for line in (tmp_path / "traces.jsonl").read_text().splitlines()][len(spans):]
+    iter_span = next(span for span in spans if span["name"] == "crud.graph.db_iter_graph_nodes")
+    assert iter_span["parent_id"] == spans[-1]["span_id"]
+    assert any(span["name"] == "sql" and span["parent_id"] == iter_span["span_id"] for span in spans)
+
+
+def read_events(response) -> list[dict]:
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for message in response.text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if fields:
+            data = json.loads(fields["data"])
+            assert (int(fields["id"]), fields["event"]) == (data["seq"], data["type"])
+            events.append(data)
+    return events
+
+
+def test_stream_events(client: TestClient):
+    assert read_events(client.get("/api/events?since=0&follow=false")) == []
+    since = 0
+
+    first_id = client.post("/api/graph/", json=get_dict_data(["a", "b", "c"], [("a", "b"), ("b", "c")])).json()["id"]
+    second_id = client.post("/api/graph/", json=get_dict_data(["x", "y"], [("x", "y")])).json()["id"]
+    assert client.delete(f"/api/graph/{first_id}/node/b").status_code == 204
+
+    events = read_events(client.get(f"/api/events?since={since}&follow=false"))
+    assert [(event["type"], event["graph_id"]) for event in events] == [
+        ("graph_created", first_id),
+        ("graph_created", second_id),
+        ("node_deleted", first_id),
+    ]
+    assert events[2] | {"seq": 0} == {"seq": 0, "type": "node_deleted", "graph_id": first_id, "version": 2,
+                                      "node": "b", "edges": [["a", "b"], ["b", "c"]]}
+
+    assert read_events(client.get(f"/api/events?graph_id={first_id}&since={since}&follow=false")) == [
+        events[0], events[2]
+    ]
+    assert read_events(client.get("/api/events?follow=false",
+                                  headers={"Last-Event-ID": str(events[0]["seq"])})) == events[1:]
+    assert client.get("/api/events?follow=false", headers={"Last-Event-ID": "abc"}).status_code == 400
+
+
+def test_stream_events_after_gaps_and_expiry(client: TestClient, db_session: Session,
+                                             monkeypatch: pytest.MonkeyPatch):
+    graph_ids = [client.post("/api/graph/", json=get_dict_data(["a"], [])).json()["id"] for _ in range(3)]
+    events = read_events(client.get("/api/events?since=0&follow=false"))
+    db_session.query(GraphEvent).filter(GraphEvent.id == events[1]["seq"]).delete()
+    db_session.commit()
+
+    assert read_events(client.get("/api/events?since=0&follow=false")) == events[:1]
+    assert read_events(client.get(f"/api/events?graph_id={graph_ids[2]}&since=0&follow=false")) == events[2:]
+    monkeypatch.setattr(settings, "FEED_GAP_SECONDS", 0)
+    assert read_events(client.get("/api/events?since=0&follow=false")) == [events[0], events[2]]
+
+    db_delete_expired_events(db_session, datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1), 1)
+    reset = {"seq": events[2]["seq"], "type": "reset", "graph_id": None}
+    assert read_events(client.get("/api/events?since=0&follow=false")) == [reset]
+    assert read_events(client.get("/api/events?follow=false", headers={"Last-Event-ID": "0"})) == [reset]
+    assert read_events(client.get(f"/api/events?since={events[0]['seq']}&follow=false")) == events[2:]
+
+
+def test_sharded_graphs(use_shards):
+    use_shards(2)
+    sharded_app = FastAPI()
+    sharded_app.include_router(main_router)
+    client = TestClient(sharded_app)
+
+    graph_ids = [
+        client.post("/api/graph/", json=get_dict_data(["a", "b", name], [("a", "b"), ("b", name)])).json()["id"]
+        for name in ["c", "d", "e"]
+    ]
+    assert [shard_router.shard_for(graph_id) for graph_id in graph_ids] == [0, 1, 0]
+    response = client.post(f"/api/graph/{graph_ids[1]}/versions", json={"remove_nodes": ["a"]})
+    assert response.status_code == 201
+    version_id = response.json()["id"]
+    assert shard_router.shard_for(version_id) == 1
+
+    assert client.get(f"/api/graph/{graph_ids[2]}/adjacency_list").json() == {
+        "adjacency_list": {"a": ["b"], "b": ["e"], "e": []}
+    }
+    assert client.delete(f"/api/graph/{graph_ids[0]}/node/c").status_code == 204
+    response = client.post("/api/graph/batch_get",
+                           json={"ids": [version_id, *graph_ids, 100000], "adjacency_list": True})
+    assert response.json() == {
+        "adjacency_lists": {
+            str(version_id): {"b": ["d"], "d": []},
+            str(graph_ids[0]): {"a": ["b"], "b": []},
+            str(graph_ids[1]): {"a": ["b"], "b": ["d"], "d": []},
+            str(graph_ids[2]): {"a": ["b"], "b": ["e"], "e": []},
+        },
+        "missing": [100000],
+    }
+
+    response = client.post("/api/graph/?async=true", json=get_dict_data(["x", "y"], [("x", "y")]))
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    ingest_pool.drain(timeout=10)
+    job = client.get(f"/api/graph/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert shard_router.shard_for(job["graph_id"]) == shard_router.shard_for(job_id)
+
+    events = read_events(client.get(f"/api/events?graph_id={graph_ids[0]}&since=0&follow=false"))
+    assert [event["type"] for event in events] == ["graph_created", "node_deleted"]
+    assert client.get("/api/events?since=0&follow=false").status_code == 400
+
+    response = client.get(f"/api/export/nodes?start_id=1&end_id={job['graph_id']}&format=arrow")
+    nodes = pyarrow.ipc.open_stream(response.content).read_all().to_pydict()
+    assert sorted(set(nodes["graph_id"])) == sorted([*graph_ids, version_id, job["graph_id"]])
+
+    duplicate = get_dict_data(["a", "b", "e"], [("a", "b"), ("b", "e")])
+    for _ in range(shard_router.shards_cnt):
+        response = client.post("/api/graph/?dedupe=true", json=duplicate)
+        assert response.status_code == 200
+        assert response.json() == {"id": graph_ids[2]}
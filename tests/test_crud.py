@@ -1,8 +1,21 @@
+import sqlite3
+
 import pytest
 from sqlalchemy.orm import Session
 
-from app.models.graph import Graph
-from app.crud.graph import db_create_graph, db_get_graph_by_id, db_delete_node, NotFoundError
+from app.config import settings
+from app.models.graph import Graph, Node, Edge, NodeName
+from app.crud.graph import db_create_graph, db_get_graph_by_id, db_delete_node, db_get_subgraph, NotFoundError, \
+    db_get_graph_contents, db_create_graph_version, ConflictError, db_get_graph_stats, db_encode_node_names, \
+    db_delete_graph, db_get_deleted_graph_ids, db_purge_graph_batch, db_get_graph_id_by_content_hash, \
+    db_get_graph_ids_in_range, db_iter_graph_nodes, db_iter_graph_edges, db_get_events, db_get_last_event_id, \
+    db_get_graphs_contents, db_delete_expired_events, db_get_expired_event_id
+from app.crud.job import db_create_job, db_get_job_by_id, db_get_unfinished_job_ids, db_claim_job, db_update_job
+from app.schemas.graph import Direction
+from app.schemas.job import JobStatus
+from app.utils.cache import node_name_cache
+from app.utils.jobs import run_ingest_job, IngestWorkerPool
+from datetime import datetime, timedelta, timezone
 from string import ascii_lowercase
 from itertools import product
 
@@ -159,3 +172,361 @@ def test_crud_delete_invalid_node(db_session: Session,
 
     assert exc_info.type is error
     assert str(exc_info.value) == error_message
+
+
+@pytest.mark.parametrize(
+    "roots, direction, max_depth, result_nodes, result_edges",
+    [
+        (["b"], Direction.downstream, None, ["b", "c", "d", "e"], [("b", "c"), ("b", "d"), ("c", "e"), ("d", "e")]),
+        (["b"], Direction.downstream, 1, ["b", "c", "d"], [("b", "c"), ("b", "d")]),
+        (["b"], Direction.downstream, 0, ["b"], []),
+        (["e"], Direction.upstream, None, ["a", "b", "c", "d", "e"],
+         [("a", "b"), ("b", "c"), ("b", "d"), ("c", "e"), ("d", "e")]),
+        (["c", "d"], Direction.upstream, 1, ["b", "c", "d"], [("b", "c"), ("b", "d")]),
+        (["a", "f"], Direction.downstream, 1, ["a", "b", "f"], [("a", "b")]),
+        (["c", "e"], Direction.downstream, 0, ["c", "e"], [("c", "e")]),
+    ], ids=[
+        "downstream-unbounded",
+        "downstream-depth-1",
+        "depth-0",
+        "upstream-unbounded",
+        "upstream-several-roots",
+        "isolated-root",
+        "induced-edges-between-roots",
+    ]
+)
+def test_crud_get_subgraph(db_session: Session,
+                           roots: list[str],
+                           direction: Direction,
+                           max_depth: int | None,
+                           result_nodes: list[str],
+                           result_edges: list[tuple[str, str]]):
+    graph: Graph = db_create_graph(
+        db_session,
+        ["a", "b", "c", "d", "e", "f"],
+        [("a", "b"), ("b", "c"), ("b", "d"), ("c", "e"), ("d", "e")],
+    )
+
+    names, edges = db_get_subgraph(db_session, graph.id, roots, direction, max_depth)
+    assert names == result_nodes
+    assert edges == result_edges
+
+
+@pytest.mark.parametrize(
+    "graph_id, roots, error_message",
+    [
+        (100, ["a"], "Graph not found"),
+        (None, ["x"], "Node not found"),
+    ], ids=[
+        "invalid-graph-id",
+        "invalid-root",
+    ]
+)
+def test_crud_get_invalid_subgraph(db_session: Session, graph_id: int | None, roots: list[str], error_message: str):
+    graph: Graph = db_create_graph(db_session, ["a", "b"], [("a", "b")])
+
+    with pytest.raises(NotFoundError) as exc_info:
+        db_get_subgraph(db_session, graph_id or graph.id, roots, Direction.downstream)
+
+    assert str(exc_info.value) == error_message
+
+
+def test_crud_create_weighted_graph(db_session: Session):
+    graph: Graph = db_create_graph(
+        db_session,
+        ["a", "b", "c"],
+        [("a", "b"), ("b", "c")],
+        node_weights={"a": 1.5, "c": 2},
+        edge_weights={("b", "c"): 0.5},
+    )
+
+    fetched = db_get_graph_by_id(db_session, graph.id)
+    assert {node.name: node.weight for node in fetched.nodes} == {"a": 1.5, "b": None, "c": 2}
+    assert {(edge.source, edge.target): edge.weight for edge in fetched.edges} == {("a", "b"): None, ("b", "c"): 0.5}
+    assert fetched.version == 1
+
+    db_delete_node(db_session, graph.id, "a")
+    assert db_get_graph_by_id(db_session, graph.id).version == 2
+
+
+def create_version(db_session: Session,
+                   parent: Graph,
+                   add_names: list[str] = (),
+                   remove_names: list[str] = (),
+                   add_edges: list[tuple[str, str]] = (),
+                   remove_edges: list[tuple[str, str]] = ()) -> Graph:
+    nodes, edges = db_get_graph_contents(db_session, parent)
+    return db_create_graph_version(db_session, parent, nodes, edges,
+                                   list(add_names), list(remove_names), list(add_edges), list(remove_edges))
+
+
+def get_names_and_edges(db_session: Session, graph: Graph) -> tuple[list[str], list[tuple[str, str]]]:
+    nodes, edges = db_get_graph_contents(db_session, graph)
+    return [node.name for node in nodes], [(edge.source, edge.target) for edge in edges]
+
+
+def test_crud_create_graph_version(db_session: Session):
+    base: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")])
+    first: Graph = create_version(db_session, base, add_names=["d"], add_edges=[("c", "d")], remove_edges=[("a", "b")])
+    second: Graph = create_version(db_session, first, remove_names=["b"], add_edges=[("a", "d")])
+
+    assert get_names_and_edges(db_session, base) == (["a", "b", "c"], [("a", "b"), ("b", "c")])
+    assert get_names_and_edges(db_session, first) == (["a", "b", "c", "d"], [("b", "c"), ("c", "d")])
+    assert get_names_and_edges(db_session, second) == (["a", "c", "d"], [("c", "d"), ("a", "d")])
+
+    assert (first.parent_id, first.depth) == (base.id, 1)
+    assert (second.parent_id, second.depth) == (first.id, 2)
+    assert db_session.query(Node).filter(Node.graph_id == second.id).count() == 0
+    assert db_session.query(Edge).filter(Edge.graph_id == second.id).count() == 1
+
+
+def test_crud_compact_graph_versions(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "GRAPH_VERSION_MAX_DEPTH", 2)
+    graph: Graph = db_create_graph(db_session, ["a"], [])
+    for name in ["b", "c", "d"]:
+        graph = create_version(db_session, graph, add_names=[name], add_edges=[("a", name)])
+
+    assert graph.depth == 0
+    assert get_names_and_edges(db_session, graph) == (["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("a", "d")])
+    assert db_session.query(Node).filter(Node.graph_id == graph.id).count() == 4
+
+
+def test_crud_delete_node_in_graph_version(db_session: Session):
+    base: Graph = db_create_graph(db_session, ["a", "b"], [("a", "b")])
+    version: Graph = create_version(db_session, base, add_names=["c"], add_edges=[("b", "c")])
+
+    with pytest.raises(ConflictError):
+        db_delete_node(db_session, base.id, "a")
+
+    db_delete_node(db_session, version.id, "b")
+    db_delete_node(db_session, version.id, "c")
+    assert get_names_and_edges(db_session, version) == (["a"], [])
+    assert get_names_and_edges(db_session, base) == (["a", "b"], [("a", "b")])
+
+
+def test_crud_resume_unfinished_jobs(db_session: Session):
+    job = db_create_job(db_session, {"nodes": [{"name": "a"}, {"name": "b"}], "edges": [{"source": "a", "target": "b"}]})
+    assert db_get_unfinished_job_ids(db_session) == [job.id]
+
+    run_ingest_job(db_session, job.id)
+
+    job = db_get_job_by_id(db_session, job.id)
+    assert job.status == JobStatus.done.value
+    assert job.payload is None
+    assert {node.name for node in db_get_graph_by_id(db_session, job.graph_id).nodes} == {"a", "b"}
+    assert db_get_unfinished_job_ids(db_session) == []
+
+
+def test_crud_claim_job(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    job = db_create_job(db_session, {"nodes": [{"name": "a"}], "edges": []})
+    assert db_claim_job(db_session, job.id, "first")
+    assert not db_claim_job(db_session, job.id, "second")
+    assert job.owner == "first"
+
+    monkeypatch.setattr(settings, "INGEST_JOB_LEASE_SECONDS", -1)
+    db_update_job(db_session, job, JobStatus.validating)
+    assert db_claim_job(db_session, job.id, "second")
+    assert job.owner == "second"
+
+    db_update_job(db_session, job, JobStatus.done)
+    assert not db_claim_job(db_session, job.id, "third")
+
+
+
+def test_ingest_pool_reclaims_jobs_after_restart(db_session: Session):
+    job_id = db_create_job(db_session, {"nodes": [{"name": "a"}], "edges": []}).id
+    crashed = IngestWorkerPool(1, 1, reclaim_interval=3600)
+    assert db_claim_job(db_session, job_id, crashed.owner)
+
+    pool = IngestWorkerPool(1, 1, reclaim_interval=3600)
+    pool.session_factory = lambda *args: db_session
+    try:
+        pool.start()
+        assert pool.owner != crashed.owner
+        pool.drain(timeout=10)
+        assert pool.reclaim() == 0
+        job = db_get_job_by_id(db_session, job_id)
+        assert job.status == JobStatus.pending.value
+
+        job.lease_expires_at = datetime(2000, 1, 1)
+        db_session.commit()
+        assert pool.reclaim() == 1
+        pool.drain(timeout=10)
+    finally:
+        pool.shutdown()
+
+    job = db_get_job_by_id(db_session, job_id)
+    assert job.status == JobStatus.done.value
+    assert job.owner == pool.owner
+
+
+def test_crud_get_graph_stats(db_session: Session):
+    base: Graph = db_create_graph(db_session, ["a", "b", "c", "d", "e"],
+                                  [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("a", "d")])
+    assert db_get_graph_stats(db_session, base) == {
+        "nodes": 5, "edges": 5, "sources": 2, "sinks": 2,
+        "max_in_degree": 3, "max_out_degree": 3, "depth": 3, "width": 2,
+    }
+
+    version: Graph = create_version(db_session, base, remove_names=["d"], add_edges=[("e", "b")])
+    assert db_get_graph_stats(db_session, version) == {
+        "nodes": 4, "edges": 3, "sources": 2, "sinks": 2,
+        "max_in_degree": 2, "max_out_degree": 2, "depth": 2, "width": 2,
+    }
+
+
+
+def test_crud_live_rows_with_many_removed(db_session: Session):
+    names: list[str] = [f"n{i}" for i in range(40)]
+    base: Graph = db_create_graph(db_session, names, list(zip(names, names[1:])))
+    version: Graph = create_version(db_session, base, remove_names=names[:30])
+
+    sqlite_connection = db_session.connection().connection.driver_connection
+    limit: int = sqlite_connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    sqlite_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 20)
+    try:
+        assert db_get_graph_stats(db_session, version)["nodes"] == 10
+        assert sum(len(batch) for batch in db_iter_graph_nodes(db_session, version, batch_size=4)) == 10
+        assert sum(len(batch) for batch in db_iter_graph_edges(db_session, version, batch_size=4)) == 9
+    finally:
+        sqlite_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, limit)
+
+
+def test_crud_node_name_dictionary(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "NODE_NAME_DICTIONARY", True)
+    first: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")])
+    second: Graph = db_create_graph(db_session, ["b", "c", "d"], [("b", "d"), ("c", "d")])
+    version: Graph = create_version(db_session, second, add_names=["a"], add_edges=[("a", "b")])
+
+    assert db_session.query(NodeName).count() == 4
+    assert db_session.query(Node).filter(Node.raw_name.is_not(None)).count() == 0
+
+    node_name_cache.clear()
+    assert get_names_and_edges(db_session, first) == (["a", "b", "c"], [("a", "b"), ("b", "c")])
+    assert get_names_and_edges(db_session, version) == (["b", "c", "d", "a"], [("b", "d"), ("c", "d"), ("a", "b")])
+    assert db_get_subgraph(db_session, version.id, ["a"], Direction.downstream) == (
+        ["b", "d", "a"], [("b", "d"), ("a", "b")]
+    )
+
+    db_delete_node(db_session, first.id, "b")
+    assert get_names_and_edges(db_session, first) == (["a", "c"], [])
+
+
+def test_crud_encode_node_names(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    plain: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")])
+    monkeypatch.setattr(settings, "NODE_NAME_DICTIONARY", True)
+    encoded: Graph = db_create_graph(db_session, ["b", "c"], [("b", "c")])
+
+    assert db_encode_node_names(db_session, batch_size=2) == 2
+    assert db_encode_node_names(db_session, batch_size=2) == 1
+    assert db_encode_node_names(db_session, batch_size=2) == 0
+
+    assert db_session.query(NodeName).count() == 3
+    assert db_session.query(Node).filter(Node.raw_name.is_not(None)).count() == 0
+    assert get_names_and_edges(db_session, plain) == (["a", "b", "c"], [("a", "b"), ("b", "c")])
+    assert get_names_and_edges(db_session, encoded) == (["b", "c"], [("b", "c")])
+
+
+def test_crud_delete_and_purge_graph(db_session: Session):
+    base: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")], content_hash="base")
+    version: Graph = create_version(db_session, base, add_names=["d"], add_edges=[("c", "d")])
+    base_id, version_id = base.id, version.id
+
+    with pytest.raises(ConflictError):
+        db_delete_graph(db_session, base_id)
+
+    db_delete_graph(db_session, version_id)
+    db_delete_graph(db_session, base_id)
+    with pytest.raises(NotFoundError):
+        db_get_graph_by_id(db_session, base_id)
+    assert db_get_graph_id_by_content_hash(db_session, "base") is None
+    assert db_get_deleted_graph_ids(db_session) == [version_id, base_id]
+
+    purged: list[bool] = [db_purge_graph_batch(db_session, graph_id, batch_size=2)
+                          for graph_id in [version_id] * 3 + [base_id] * 4]
+    assert purged == [False, False, True, False, False, False, True]
+
+    assert db_get_deleted_graph_ids(db_session) == []
+    assert db_session.query(Node).filter(Node.graph_id.in_([base_id, version_id])).count() == 0
+    assert db_session.query(Edge).filter(Edge.graph_id.in_([base_id, version_id])).count() == 0
+    assert [(event.graph_id, event.type) for event in db_get_events(db_session, 0, None, limit=None)] == [
+        (version_id, "graph_deleted"), (base_id, "graph_deleted")
+    ]
+
+
+def test_crud_delete_expired_events(db_session: Session):
+    graph_ids: list[int] = [db_create_graph(db_session, ["a"], []).id for _ in range(3)]
+    assert db_delete_expired_events(db_session, datetime(2000, 1, 1), batch_size=2) == 0
+
+    before: datetime = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1)
+    assert db_get_expired_event_id(db_session) == 0
+    event_ids: list[int] = [event.id for event in db_get_events(db_session, 0, None, limit=None)]
+    assert db_delete_expired_events(db_session, before, batch_size=2) == 2
+    assert [event.graph_id for event in db_get_events(db_session, 0, None, limit=None)] == graph_ids[2:]
+    assert db_get_expired_event_id(db_session) == event_ids[1]
+    assert db_delete_expired_events(db_session, before, batch_size=2) == 1
+    assert db_delete_expired_events(db_session, before, batch_size=2) == 0
+    assert db_get_expired_event_id(db_session) == event_ids[2]
+
+
+def test_crud_iter_graph_rows(db_session: Session, monkeypatch: pytest.MonkeyPatch):
+    base: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")])
+    monkeypatch.setattr(settings, "NODE_NAME_DICTIONARY", True)
+    version: Graph = create_version(db_session, base, add_names=["d", "e"], remove_names=["a"],
+                                    add_edges=[("c", "d"), ("d", "e")])
+    deleted: Graph = db_create_graph(db_session, ["f"], [])
+    db_delete_graph(db_session, deleted.id)
+
+    assert db_get_graph_ids_in_range(db_session, base.id, deleted.id) == [base.id, version.id]
+
+    for graph in (base, version):
+        nodes, edges = db_get_graph_contents(db_session, graph)
+        node_batches = list(db_iter_graph_nodes(db_session, graph, batch_size=2))
+        edge_batches = list(db_iter_graph_edges(db_session, graph, batch_size=2))
+        assert all(len(batch) <= 2 for batch in node_batches + edge_batches)
+        assert [tuple(row) for batch in node_batches for row in batch] == [(node.id, node.name) for node in nodes]
+        assert [tuple(row) for batch in edge_batches for row in batch] == [
+            (edge.id, edge.source_id, edge.target_id) for edge in edges
+        ]
+
+
+def test_crud_graph_events(db_session: Session):
+    since: int = db_get_last_event_id(db_session)
+    base: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")])
+    version: Graph = create_version(db_session, base, add_names=["d"], add_edges=[("c", "d")])
+    db_delete_node(db_session, version.id, "c")
+    db_delete_node(db_session, version.id, "a")
+    other: Graph = db_create_graph(db_session, ["x"], [])
+    db_delete_graph(db_session, other.id)
+
+    events = db_get_events(db_session, since, None, limit=100)
+    assert [(event.graph_id, event.type, event.payload) for event in events] == [
+        (base.id, "graph_created", {"parent_id": None}),
+        (version.id, "graph_created", {"parent_id": base.id}),
+        (version.id, "node_deleted", {"version": 2, "node": "c", "edges": [["b", "c"], ["a", "c"], ["c", "d"]]}),
+        (version.id, "node_deleted", {"version": 3, "node": "a", "edges": [["a", "b"]]}),
+        (other.id, "graph_created", {"parent_id": None}),
+        (other.id, "graph_deleted", {}),
+    ]
+    assert db_get_last_event_id(db_session) == events[-1].id
+    assert [event.id for event in db_get_events(db_session, events[1].id, version.id, limit=1)] == [events[2].id]
+
+
+def test_crud_get_graphs_contents(db_session: Session):
+    base: Graph = db_create_graph(db_session, ["a", "b", "c"], [("a", "b"), ("b", "c")])
+    first: Graph = create_version(db_session, base, add_names=["d"], add_edges=[("c", "d")], remove_edges=[("a", "b")])
+    second: Graph = create_version(db_session, first, remove_names=["b"], add_edges=[("a", "d")])
+    other: Graph = db_create_graph(db_session, ["x", "y"], [("x", "y")])
+    deleted: Graph = db_create_graph(db_session, ["z"], [])
+    db_delete_graph(db_session, deleted.id)
+
+    graph_ids: list[int] = [second.id, other.id, base.id, deleted.id, 100000, first.id]
+    contents = db_get_graphs_contents(db_session, graph_ids)
+
+    assert set(contents) == {base.id, first.id, second.id, other.id}
+    for graph in [base, first, second, other]:
+        fetched, nodes, edges = contents[graph.id]
+        assert fetched.id == graph.id
+        assert ([node.name for node in nodes], [(edge.source, edge.target) for edge in edges]) == \
+               get_names_and_edges(db_session, graph)
+    assert db_get_graphs_contents(db_session, []) == {}
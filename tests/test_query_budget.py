@@ -0,0 +1,176 @@
+from typing import Callable, ContextManager
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.routers.graph import router
+from app.utils.jobs import ingest_pool
+from tests.test_api import get_dict_data
+
+NODES_CNT = 300
+EDGES_PER_NODE = 5
+
+QUERY_BUDGETS: dict[tuple[str, str], int] = {
+    ("POST", "/api/graph/"): 9,
+    ("POST", "/api/graph/{graph_id}/versions"): 11,
+    ("GET", "/api/graph/{graph_id}/"): 6,
+    ("GET", "/api/graph/{graph_id}/adjacency_list"): 6,
+    ("GET", "/api/graph/{graph_id}/reverse_adjacency_list"): 6,
+    ("GET", "/api/graph/{graph_id}/critical_path"): 6,
+    ("GET", "/api/graph/{graph_id}/stats"): 10,
+    ("GET", "/api/graph/{graph_id}/transitive_reduction"): 6,
+    ("POST", "/api/graph/{graph_id}/lca"): 6,
+    ("POST", "/api/graph/{graph_id}/dominators"): 6,
+    ("GET", "/api/graph/{graph_id}/paths"): 6,
+    ("POST", "/api/graph/{graph_id}/paths"): 6,
+    ("GET", "/api/graph/{graph_id}/subgraph"): 8,
+    ("POST", "/api/graph/batch_get"): 7,
+    ("DELETE", "/api/graph/{graph_id}/node/{node_name}"): 16,
+    ("DELETE", "/api/graph/{graph_id}"): 6,
+}
+
+
+def generate_graph(nodes_cnt: int) -> tuple[list[str], list[tuple[str, str]]]:
+    names = ["".join(chr(ord("a") + i // 26 ** k % 26) for k in range(3)) for i in range(nodes_cnt)]
+    edges = [
+        (names[i], names[j])
+        for i in range(nodes_cnt)
+        for j in range(i + 1, min(nodes_cnt, i + 1 + EDGES_PER_NODE))
+    ]
+    return names, edges
+
+
+@pytest.fixture()
+def large_graph(client: TestClient) -> tuple[int, list[str]]:
+    names, edges = generate_graph(NODES_CNT)
+    response = client.post("/api/graph/", json=get_dict_data(names, edges))
+    assert response.status_code == 201
+    return response.json()["id"], names
+
+
+@pytest.fixture()
+def large_version(client: TestClient, large_graph: tuple[int, list[str]]) -> tuple[int, list[str]]:
+    graph_id, names = large_graph
+    response = client.post(f"/api/graph/{graph_id}/versions",
+                           json={"add_nodes": [{"name": "zzzz"}], "remove_nodes": [names[1]],
+                                 "add_edges": [{"source": names[0], "target": "zzzz"}]})
+    assert response.status_code == 201
+    return response.json()["id"], [name for name in names if name != names[1]] + ["zzzz"]
+
+
+def test_every_route_has_query_budget():
+    routes = {
+        (method, route.path)
+        for route in router.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    assert routes == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize("graph_fixture", ["large_graph", "large_version"])
+@pytest.mark.parametrize(
+    "method, path, make_request",
+    [
+        ("GET", "/api/graph/{graph_id}/",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/")),
+        ("GET", "/api/graph/{graph_id}/adjacency_list",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/adjacency_list")),
+        ("GET", "/api/graph/{graph_id}/reverse_adjacency_list",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/reverse_adjacency_list")),
+        ("GET", "/api/graph/{graph_id}/critical_path",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/critical_path")),
+        ("GET", "/api/graph/{graph_id}/stats",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/stats")),
+        ("GET", "/api/graph/{graph_id}/transitive_reduction",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/transitive_reduction")),
+        ("POST", "/api/graph/{graph_id}/lca",
+         lambda client, graph_id, names: client.post(f"/api/graph/{graph_id}/lca",
+                                                     json={"pairs": [[names[3], names[-1]]]})),
+        ("POST", "/api/graph/{graph_id}/dominators",
+         lambda client, graph_id, names: client.post(f"/api/graph/{graph_id}/dominators",
+                                                     json={"nodes": [names[-1]]})),
+        ("GET", "/api/graph/{graph_id}/paths",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/paths?source={names[0]}&target={names[-1]}")),
+        ("POST", "/api/graph/{graph_id}/paths",
+         lambda client, graph_id, names: client.post(f"/api/graph/{graph_id}/paths",
+                                                     json={"pairs": [[names[0], names[-1]], [names[3], names[5]]]})),
+        ("GET", "/api/graph/{graph_id}/subgraph",
+         lambda client, graph_id, names: client.get(f"/api/graph/{graph_id}/subgraph?roots={names[0]}&max_depth=2")),
+        ("POST", "/api/graph/batch_get",
+         lambda client, graph_id, names: client.post("/api/graph/batch_get",
+                                                     json={"ids": [graph_id, graph_id - 1, 100000]})),
+        ("POST", "/api/graph/{graph_id}/versions",
+         lambda client, graph_id, names: client.post(f"/api/graph/{graph_id}/versions",
+                                                     json={"remove_nodes": [names[-1]]})),
+        ("DELETE", "/api/graph/{graph_id}/node/{node_name}",
+         lambda client, graph_id, names: client.delete(f"/api/graph/{graph_id}/node/{names[2]}")),
+        ("DELETE", "/api/graph/{graph_id}",
+         lambda client, graph_id, names: client.delete(f"/api/graph/{graph_id}")),
+    ], ids=[
+        "read-graph",
+        "adjacency-list",
+        "reverse-adjacency-list",
+        "critical-path",
+        "stats",
+        "transitive-reduction",
+        "lca",
+        "dominators",
+        "paths",
+        "paths-batch",
+        "subgraph",
+        "batch-get",
+        "create-version",
+        "delete-node",
+        "delete-graph",
+    ]
+)
+def test_graph_route_query_budget(client: TestClient,
+                                  request: pytest.FixtureRequest,
+                                  query_budget: Callable[[int], ContextManager[list[str]]],
+                                  graph_fixture: str,
+                                  method: str,
+                                  path: str,
+                                  make_request: Callable):
+    graph_id, names = request.getfixturevalue(graph_fixture)
+
+    with query_budget(QUERY_BUDGETS[(method, path)]):
+        response = make_request(client, graph_id, names)
+    assert response.status_code < 300
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["", "?dedupe=true", "?reduce=true", "?async=true"],
+    ids=["sync", "dedupe", "reduce", "async"],
+)
+@pytest.mark.parametrize("name_dictionary", [False, True], ids=["plain-names", "name-dictionary"])
+def test_create_graph_query_budget(client: TestClient,
+                                   monkeypatch: pytest.MonkeyPatch,
+                                   query_budget: Callable[[int], ContextManager[list[str]]],
+                                   query: str,
+                                   name_dictionary: bool):
+    monkeypatch.setattr(settings, "NODE_NAME_DICTIONARY", name_dictionary)
+    names, edges = generate_graph(NODES_CNT)
+
+    with query_budget(QUERY_BUDGETS[("POST", "/api/graph/")]):
+        response = client.post(f"/api/graph/{query}", json=get_dict_data(names, edges))
+    ingest_pool.drain(timeout=10)
+    assert response.status_code < 300
+
+
+@pytest.mark.parametrize("adjacency_list", [False, True], ids=["graphs", "adjacency-lists"])
+def test_batch_get_query_budget(client: TestClient,
+                                query_budget: Callable[[int], ContextManager[list[str]]],
+                                adjacency_list: bool):
+    names, edges = generate_graph(10)
+    graph_ids = [client.post("/api/graph/", json=get_dict_data(names, edges)).json()["id"] for _ in range(20)]
+    for graph_id in graph_ids[::2]:
+        response = client.post(f"/api/graph/{graph_id}/versions", json={"remove_nodes": [names[0]]})
+        graph_ids.append(response.json()["id"])
+
+    with query_budget(QUERY_BUDGETS[("POST", "/api/graph/batch_get")]):
+        response = client.post("/api/graph/batch_get", json={"ids": graph_ids, "adjacency_list": adjacency_list})
+    assert response.status_code == 200
+    assert response.json()["missing"] == []
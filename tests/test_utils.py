@@ -1,6 +1,41 @@
+import asyncio
+import importlib.util
+import json
+import re
+import time
+from pathlib import Path
+from threading import Thread
+from types import SimpleNamespace
+
 import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
-from app.utils.graph import detect_cycles, build_adjacency_list, build_reverse_adjacency_list
+from app.utils.graph import detect_cycles, build_adjacency_list, build_reverse_adjacency_list, topological_sort, \
+    critical_path, graph_content_hash, transitive_reduction, depth_and_width, validate_graph
+from app.utils.graph_index import AncestorIndex, DominatorTree, PathIndex
+from app.utils.admission import ConcurrencyLimiter, AdmissionError
+from app.utils.cache import NodeNameCache, graph_cache
+from app.utils.compression import preferred_encoding
+from app.utils.feed import ChangeFeed
+from app.utils.offload import CpuWorkerPool, pack_graph, unpack_edges
+from app.utils.tracing import Tracer, SpanExporter
+from app.utils.warmup import warm_up_pool, prefetch_graphs
+from app.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, create_db_engine
+from app.db.shards import shard_router, SHARD_KEY
+from app.db.writer import SingleWriter
+from app.crud.graph import db_create_graph, db_get_graph_by_id, db_get_graph_contents, db_create_graph_version, \
+    db_delete_graph, db_get_graphs, db_get_events, db_purge_graph_batch, NotFoundError
+from app.crud.job import db_create_job, db_update_job, db_get_job_by_id
+from app.models.graph import Graph
+from app.models.job import IngestJob
+from app.schemas.graph import GraphReadResponse
+from app.schemas.job import JobStatus
+from app.utils.rebalance import rebalance
+from app.launcher import get_workers_count
 
 
 @pytest.mark.parametrize(
@@ -60,3 +95,697 @@ def test_get_adjacency_list(names: list[str], edges: list[tuple[str, str]], expe
 )
 def test_get_reverse_adjacency_list(names: list[str], edges: list[tuple[str, str]], expected: dict[str, list[str]]):
     assert build_reverse_adjacency_list(names, edges) == expected
+
+
+@pytest.mark.parametrize(
+    "names, edges, expected",
+    [
+        (["c", "b", "a"], [("a", "b"), ("b", "c")], ["a", "b", "c"]),
+        (["a", "b", "c", "d"], [("a", "c"), ("b", "c"), ("c", "d")], ["a", "b", "c", "d"]),
+        (["a", "b"], [], ["a", "b"]),
+    ],
+    ids=[
+        "reversed-chain",
+        "diamond",
+        "no-edges",
+    ],
+)
+def test_topological_sort(names: list[str], edges: list[tuple[str, str]], expected: list[str]):
+    assert topological_sort(names, edges) == expected
+
+
+@pytest.mark.parametrize(
+    "names, edges, node_weights, edge_weights, expected_path, expected_length, expected_slack",
+    [
+        (["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")],
+         {"a": 1, "b": 5, "c": 2, "d": 1}, {},
+         ["a", "b", "d"], 7, {"a": 0, "b": 0, "c": 3, "d": 0}),
+        (["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")],
+         {}, {("a", "c"): 4, ("c", "d"): 1, ("a", "b"): 2},
+         ["a", "c", "d"], 5, {"a": 0, "b": 3, "c": 0, "d": 0}),
+        (["a", "b", "c"], [("a", "b")],
+         {"a": 1, "b": 1, "c": 3}, {},
+         ["c"], 3, {"a": 1, "b": 1, "c": 0}),
+        ([], [], {}, {}, [], 0, {}),
+    ],
+    ids=[
+        "node-weights",
+        "edge-weights",
+        "disconnected",
+        "empty",
+    ],
+)
+def test_critical_path(names: list[str],
+                       edges: list[tuple[str, str]],
+                       node_weights: dict[str, float],
+                       edge_weights: dict[tuple[str, str], float],
+                       expected_path: list[str],
+                       expected_length: float,
+                       expected_slack: dict[str, float]):
+    path, length, slack = critical_path(names, edges, node_weights, edge_weights)
+    assert path == expected_path
+    assert length == expected_length
+    assert slack == expected_slack
+
+
+@pytest.mark.parametrize(
+    "first, second, expected",
+    [
+        ((["a", "b", "c"], [("a", "b"), ("b", "c")], {}, {}),
+         (["c", "a", "b"], [("b", "c"), ("a", "b")], {}, {}), True),
+        ((["a", "b"], [("a", "b")], {}, {}),
+         (["a", "b"], [("b", "a")], {}, {}), False),
+        ((["a", "b"], [("a", "b")], {"a": 1}, {}),
+         (["a", "b"], [("a", "b")], {"a": 2}, {}), False),
+        ((["a", "b"], [], {}, {}),
+         (["a", "b", "b"], [], {}, {}), False),
+    ],
+    ids=[
+        "reordered",
+        "reversed-edge",
+        "different-weights",
+        "duplicate-node",
+    ],
+)
+def test_graph_content_hash(first: tuple, second: tuple, expected: bool):
+    assert (graph_content_hash(*first) == graph_content_hash(*second)) is expected
+
+
+def test_warm_up_pool(tmp_path: Path):
+    file_engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'pool.db'}", pool_size=3)
+    warm_up_pool(file_engine, 3)
+    assert file_engine.pool.checkedin() == 3
+    file_engine.dispose()
+
+
+def test_prefetch_graphs(db_session: Session):
+    graph = db_create_graph(db_session, ["a", "b"], [("a", "b")])
+    assert prefetch_graphs(db_session, [graph.id, 100]) == 1
+
+    cached: GraphReadResponse = graph_cache.get(graph.id, graph.version, "read")
+    assert [node.name for node in cached.nodes] == ["a", "b"]
+    assert [(edge.source, edge.target) for edge in cached.edges] == [("a", "b")]
+
+
+@pytest.mark.parametrize(
+    "backend, shard_urls, workers, cpu_count, expected",
+    [
+        ("postgresql", [], 4, 16, 4),
+        ("postgresql", [], 0, 16, 16),
+        ("postgresql", [], 0, None, 1),
+        ("sqlite", [], 4, 16, 1),
+        ("postgresql", ["postgresql://db/shard0", "postgresql://db/shard1"], 4, 16, 4),
+        ("postgresql", ["sqlite+pysqlite:///shard0.db", "sqlite+pysqlite:///shard1.db"], 4, 16, 1),
+    ],
+    ids=[
+        "configured",
+        "cpu-count",
+        "unknown-cpu-count",
+        "sqlite-single-process",
+        "postgresql-shards",
+        "sqlite-shards-single-process",
+    ],
+)
+def test_get_workers_count(monkeypatch: pytest.MonkeyPatch, backend: str, shard_urls: list[str], workers: int,
+                           cpu_count: int | None, expected: int):
+    monkeypatch.setattr(settings, "DB_BACKEND", backend)
+    monkeypatch.setattr(settings, "SHARD_URLS", shard_urls)
+    monkeypatch.setattr(settings, "WEB_WORKERS", workers)
+    monkeypatch.setattr("app.launcher.os.cpu_count", lambda: cpu_count)
+    assert get_workers_count() == expected
+
+
+INDEX_NODES = ["a", "b", "c", "d", "e", "x"]
+INDEX_EDGES = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("x", "e")]
+
+
+@pytest.mark.parametrize(
+    "names, edges, u, v, expected",
+    [
+        (INDEX_NODES, INDEX_EDGES, "b", "c", ["a"]),
+        (INDEX_NODES, INDEX_EDGES, "d", "b", ["b"]),
+        (INDEX_NODES, INDEX_EDGES, "e", "x", ["x"]),
+        (INDEX_NODES, INDEX_EDGES, "b", "x", []),
+        (["p", "q", "r", "s"], [("p", "r"), ("q", "r"), ("p", "s"), ("q", "s")], "r", "s", ["p", "q"]),
+    ],
+    ids=[
+        "siblings",
+        "ancestor",
+        "second-source",
+        "no-common-ancestor",
+        "several-lowest",
+    ],
+)
+def test_lowest_common_ancestors(names: list[str], edges: list[tuple[str, str]], u: str, v: str,
+                                 expected: list[str]):
+    assert AncestorIndex(names, edges).lowest_common_ancestors(u, v) == expected
+    index = AncestorIndex(names, edges, max_bitset_nodes=len(names) - 1)
+    assert index.ancestors is None
+    assert index.lowest_common_ancestors(u, v) == expected
+
+
+@pytest.mark.parametrize(
+    "node, expected_idom, expected_dominators",
+    [
+        ("a", None, []),
+        ("b", "a", ["a"]),
+        ("d", "a", ["a"]),
+        ("e", None, []),
+    ],
+    ids=[
+        "source",
+        "child",
+        "join",
+        "join-of-sources",
+    ],
+)
+def test_dominator_tree(node: str, expected_idom: str | None, expected_dominators: list[str]):
+    tree = DominatorTree(INDEX_NODES, INDEX_EDGES)
+    assert tree.immediate_dominator(node) == expected_idom
+    assert tree.dominators(node) == expected_dominators
+
+
+@pytest.mark.parametrize(
+    "u, v, expected",
+    [
+        ("b", "c", "a"),
+        ("d", "d", "a"),
+        ("a", "d", None),
+        ("b", "d", "a"),
+        ("b", "x", None),
+    ],
+    ids=[
+        "siblings",
+        "same-node",
+        "source-and-descendant",
+        "node-and-descendant",
+        "different-sources",
+    ],
+)
+def test_nearest_common_dominator(u: str, v: str, expected: str | None):
+    tree = DominatorTree(INDEX_NODES, INDEX_EDGES)
+    common_dominator = tree.nearest_common_dominator(u, v)
+    assert common_dominator == expected
+    assert common_dominator is None or common_dominator in set(tree.dominators(u)) & set(tree.dominators(v))
+
+
+DIAMONDS_CNT = 70
+DIAMOND_NAMES = [name for i in range(DIAMONDS_CNT) for name in (f"s{'a' * i}", f"l{'a' * i}", f"r{'a' * i}")] + ["t"]
+DIAMOND_EDGES = [edge for i in range(DIAMONDS_CNT)
+                 for edge in ((DIAMOND_NAMES[3 * i], DIAMOND_NAMES[3 * i + 1]),
+                              (DIAMOND_NAMES[3 * i], DIAMOND_NAMES[3 * i + 2]),
+                              (DIAMOND_NAMES[3 * i + 1], DIAMOND_NAMES[3 * i + 3]),
+                              (DIAMOND_NAMES[3 * i + 2], DIAMOND_NAMES[3 * i + 3]))]
+
+
+@pytest.mark.parametrize(
+    "names, edges, source, target, expected_count, expected_shortest, expected_longest",
+    [
+        (INDEX_NODES, INDEX_EDGES, "a", "e", 2, 4, 4),
+        (["a", "b", "c", "d"], [("a", "b"), ("b", "c"), ("c", "d"), ("a", "c"), ("a", "d")], "a", "d", 3, 2, 4),
+        (INDEX_NODES, INDEX_EDGES, "b", "c", 0, None, None),
+        (INDEX_NODES, INDEX_EDGES, "e", "a", 0, None, None),
+        (INDEX_NODES, INDEX_EDGES, "d", "d", 1, 1, 1),
+        (DIAMOND_NAMES, DIAMOND_EDGES, "s", "t", 2 ** DIAMONDS_CNT, 2 * DIAMONDS_CNT + 1, 2 * DIAMONDS_CNT + 1),
+    ],
+    ids=[
+        "diamond",
+        "shortcuts",
+        "no-path",
+        "reversed",
+        "same-node",
+        "chain-of-diamonds",
+    ],
+)
+def test_path_index(names: list[str], edges: list[tuple[str, str]], source: str, target: str,
+                    expected_count: int, expected_shortest: int | None, expected_longest: int | None):
+    count, shortest, longest = PathIndex(names, edges).paths(source, target)
+    assert count == expected_count
+    for path, expected_len in ((shortest, expected_shortest), (longest, expected_longest)):
+        if expected_len is None:
+            assert path is None
+            continue
+        assert len(path) == expected_len
+        assert path[0] == source and path[-1] == target
+        assert all(edge in edges for edge in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize(
+    "names, edges, keep, expected",
+    [
+        (["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")], None, [("a", "b"), ("b", "c")]),
+        (["a", "b", "c", "d"], [("a", "d"), ("a", "b"), ("b", "c"), ("c", "d"), ("b", "d")], None,
+         [("a", "b"), ("b", "c"), ("c", "d")]),
+        (["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")], None,
+         [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")]),
+        (["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")], {("a", "c")}, [("a", "b"), ("b", "c"), ("a", "c")]),
+        (["a"], [], None, []),
+    ],
+    ids=[
+        "triangle",
+        "chain-with-shortcuts",
+        "diamond",
+        "kept-edge",
+        "single-node",
+    ],
+)
+def test_transitive_reduction(names: list[str],
+                              edges: list[tuple[str, str]],
+                              keep: set[tuple[str, str]] | None,
+                              expected: list[tuple[str, str]]):
+    assert transitive_reduction(names, edges, keep) == expected
+
+
+@pytest.mark.parametrize(
+    "names, edges, expected",
+    [
+        (["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")], (3, 2)),
+        (["a", "b", "c"], [("a", "b"), ("b", "c"), ("a", "c")], (3, 1)),
+        (["a", "b", "c"], [], (1, 3)),
+        ([], [], (0, 0)),
+    ],
+    ids=[
+        "diamond",
+        "chain-with-shortcut",
+        "no-edges",
+        "empty",
+    ],
+)
+def test_depth_and_width(names: list[str], edges: list[tuple[str, str]], expected: tuple[int, int]):
+    assert depth_and_width(names, edges) == expected
+
+
+def test_node_name_cache():
+    cache = NodeNameCache(maxsize=2)
+    cache.put({"a": 1, "b": 2})
+    assert cache.get_ids(["a", "c"]) == {"a": 1}
+    assert cache.get_names([1, 2, 3]) == {1: "a", 2: "b"}
+
+    cache.get_names([1])
+    cache.put({"c": 3})
+    assert cache.get_ids(["a", "b", "c"]) == {"a": 1, "c": 3}
+    assert cache.get_names([2]) == {}
+
+
+@pytest.mark.parametrize(
+    "names, edges",
+    [
+        (["a", "b", "c"], [("a", "b"), ("b", "c")]),
+        (["a", "a", "b"], [("a", "b")]),
+        (["a"], [("a", "x"), ("y", "a")]),
+        ([], []),
+    ],
+    ids=[
+        "simple-graph",
+        "duplicate-nodes",
+        "unknown-nodes",
+        "empty",
+    ],
+)
+def test_pack_graph(names: list[str], edges: list[tuple[str, str]]):
+    symbols, packed = pack_graph(names, edges)
+    assert symbols[:len(names)] == names
+    assert len(packed) == 2 * len(edges)
+    assert unpack_edges(symbols, packed) == edges
+
+
+def test_cpu_worker_pool():
+    names = ["a", "b", "c"]
+    edges = [("a", "b"), ("b", "c"), ("c", "a")]
+
+    inline_pool = CpuWorkerPool(max_workers=1, min_size=100)
+    assert inline_pool.run(validate_graph, names, edges) == validate_graph(names, edges)
+    assert inline_pool._executor is None
+
+    pool = CpuWorkerPool(max_workers=1, min_size=0)
+    try:
+        assert pool.run(validate_graph, names, edges) == validate_graph(names, edges)
+        assert pool.run(transitive_reduction, names, edges[:2], set()) == transitive_reduction(names, edges[:2])
+        assert pool._executor is not None
+    finally:
+        pool.shutdown()
+
+
+def test_concurrency_limiter():
+    async def scenario() -> None:
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queued=1, queue_timeout=1)
+        await limiter.acquire()
+
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert (limiter.active, limiter.queued) == (1, 1)
+
+        with pytest.raises(AdmissionError) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.status_code == 429
+
+        limiter.release()
+        await waiting
+        assert (limiter.active, limiter.queued) == (1, 0)
+
+        limiter.queue_timeout = 0.01
+        with pytest.raises(AdmissionError) as exc_info:
+            await limiter.acquire()
+        assert exc_info.value.status_code == 503
+
+        limiter.release()
+        assert limiter.metrics() == {
+            "max_concurrent": 1, "max_queued": 1, "active": 0, "queued": 0,
+            "admitted": 2, "rejected": 1, "timed_out": 1,
+        }
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, zstd", "zstd"),
+        ("gzip;q=1, zstd;q=0.1", "gzip"),
+        ("gzip;q=0.5, zstd;q=0", "gzip"),
+        ("GZIP ; q=1.0", "gzip"),
+        ("*", "zstd"),
+        ("*;q=0.5, gzip", "gzip"),
+        ("*, zstd;q=0", "gzip"),
+        ("gzip;q=abc, deflate", None),
+        ("", None),
+    ],
+    ids=[
+        "plain-list",
+        "quality-order",
+        "zero-quality",
+        "case-and-spaces",
+        "wildcard",
+        "wildcard-lower-quality",
+        "wildcard-with-exclusion",
+        "invalid-quality",
+        "empty",
+    ],
+)
+def test_preferred_encoding(header: str, expected: str | None):
+    assert preferred_encoding(header) == expected
+
+
+@pytest.mark.parametrize(
+    "traceparent, sample_rate, expected_sampled, expected_trace_id, expected_parent_id",
+    [
+        ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01", 0.0, True,
+         "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"),
+        ("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00", 1.0, False, None, None),
+        ("00-00000000000000000000000000000000-00f067aa0ba902b7-01", 1.0, True, None, None),
+        ("garbage", 1.0, True, None, None),
+        (None, 0.0, False, None, None),
+    ],
+    ids=[
+        "sampled-parent",
+        "not-sampled-parent",
+        "invalid-trace-id",
+        "invalid-header",
+        "no-header-not-sampled",
+    ],
+)
+def test_tracer_start_trace(monkeypatch: pytest.MonkeyPatch, traceparent: str | None, sample_rate: float,
+                            expected_sampled: bool, expected_trace_id: str | None, expected_parent_id: str | None):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", sample_rate)
+    started = Tracer().start_trace(traceparent)
+    assert (started is not None) == expected_sampled
+    if started is None:
+        return
+
+    trace, parent_id = started
+    assert len(trace.trace_id) == 32
+    assert parent_id == expected_parent_id
+    if expected_trace_id is not None:
+        assert trace.trace_id == expected_trace_id
+
+
+def test_span_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        SpanExporter()
+
+
+def test_sqlite_engine(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setattr(settings, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "dag.db"))
+    assert settings.DATABASE_URL == f"sqlite+pysqlite:///{tmp_path / 'dag.db'}"
+
+    sqlite_engine = create_db_engine()
+    with sqlite_engine.connect() as connection:
+        assert connection.scalar(text("PRAGMA journal_mode")) == "wal"
+        assert connection.scalar(text("PRAGMA synchronous")) == 1
+        assert connection.scalar(text("PRAGMA cache_size")) == settings.SQLITE_CACHE_SIZE
+        assert connection.scalar(text("PRAGMA foreign_keys")) == 1
+    sqlite_engine.dispose()
+
+
+def load_partition_migration():
+    pytest.importorskip("alembic.op")
+    path: Path = Path(__file__).parents[1] / "alembic" / "versions" / "d51a8c3f7e20_partition_nodes_and_edges.py"
+    spec = importlib.util.spec_from_file_location("partition_migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+class RecordingOperations:
+    def __init__(self, dialect: str) -> None:
+        self.dialect: str = dialect
+        self.statements: list[str] = []
+        self.partitioned: bool = False
+
+    def get_context(self) -> SimpleNamespace:
+        return SimpleNamespace(dialect=SimpleNamespace(name=self.dialect))
+
+    def get_bind(self) -> SimpleNamespace:
+        return SimpleNamespace(scalar=lambda statement: "p" if self.partitioned else "r")
+
+    def execute(self, statement: str) -> None:
+        self.statements.append(statement)
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self.statements.append(f"{name} {args}")
+
+
+@pytest.mark.parametrize(
+    "dialect, x_arguments, partitions",
+    [
+        ("postgresql", {"partitions": "16"}, 16),
+        ("postgresql", {}, 0),
+        ("sqlite", {"partitions": "16"}, 0),
+    ], ids=[
+        "postgresql-opt-in",
+        "postgresql-default",
+        "sqlite",
+    ]
+)
+def test_partition_migration(monkeypatch: pytest.MonkeyPatch, dialect: str, x_arguments: dict, partitions: int):
+    migration = load_partition_migration()
+    operations: RecordingOperations = RecordingOperations(dialect)
+    monkeypatch.setattr(migration, "op", operations)
+    monkeypatch.setattr(migration, "context", SimpleNamespace(get_x_argument=lambda as_dictionary: x_arguments))
+
+    migration.upgrade()
+    if not partitions:
+        assert operations.statements == []
+        migration.downgrade()
+        assert operations.statements == []
+        return
+    assert [statement for statement in operations.statements if statement.startswith("drop_constraint")] == [
+        f"drop_constraint {(name, source)}" for name, source, _, _ in migration.REFERENCES
+    ]
+    for table in ["nodes", "edges"]:
+        assert f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS) PARTITION BY HASH (graph_id)" \
+               in operations.statements
+        assert [statement for statement in operations.statements if f"PARTITION OF {table} " in statement] == [
+            f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ]
+
+    operations.statements.clear()
+    operations.partitioned = True
+    migration.downgrade()
+    assert "CREATE TABLE nodes (LIKE nodes_old INCLUDING DEFAULTS)" in operations.statements
+    assert not any("PARTITION" in statement for statement in operations.statements)
+
+
+def test_partition_pruning():
+    migration = load_partition_migration()
+    postgres_engine = create_db_engine(settings.DATABASE_URL_psycopg)
+    try:
+        connection = postgres_engine.connect()
+    except OperationalError:
+        pytest.skip("PostgreSQL is not available")
+
+    with connection, connection.begin() as transaction:
+        connection.execute(text("CREATE SCHEMA partition_pruning"))
+        connection.execute(text("SET LOCAL search_path TO partition_pruning"))
+        connection.execute(text("CREATE TABLE nodes (id bigint, graph_id bigint, name text) PARTITION BY HASH (graph_id)"))
+        for statement in migration.partition_ddl("nodes", 16):
+            connection.execute(text(statement))
+
+        plan = connection.scalar(text("EXPLAIN (FORMAT JSON) SELECT id FROM nodes WHERE graph_id = 42"))
+        scanned: list[str] = re.findall(r'"Relation Name": "(nodes_p\d+)"', json.dumps(plan))
+        assert len(scanned) == 1
+        plan = connection.scalar(text("EXPLAIN (FORMAT JSON) SELECT id FROM nodes WHERE graph_id IN (1, 2)"))
+        assert len(re.findall(r'"Relation Name": "(nodes_p\d+)"', json.dumps(plan))) <= 2
+        transaction.rollback()
+    postgres_engine.dispose()
+
+
+def test_single_writer():
+    writer = SingleWriter(enabled=True)
+    order: list[int] = []
+
+    @writer.serialized
+    def write(i: int) -> None:
+        order.append(i)
+        time.sleep(0.01)
+        order.append(i)
+
+    @writer.serialized
+    def nested_write() -> None:
+        write(0)
+
+    writer.acquire()
+    threads = [Thread(target=write, args=(i,)) for i in range(1, 4)]
+    for i, thread in enumerate(threads, start=1):
+        thread.start()
+        while writer.waiting < i:
+            time.sleep(0.001)
+    assert order == []
+    writer.release()
+    for thread in threads:
+        thread.join()
+    nested_write()
+
+    assert order == [1, 1, 2, 2, 3, 3, 0, 0]
+    assert writer.waiting == 0
+
+
+def test_change_feed():
+    async def scenario() -> None:
+        feed = ChangeFeed()
+        with feed.subscribe() as wakeup:
+            assert feed.subscribers == 1
+            notifier = Thread(target=feed.notify)
+            notifier.start()
+            await asyncio.wait_for(wakeup.wait(), timeout=1)
+            notifier.join()
+        assert feed.subscribers == 0
+        feed.notify()
+
+    asyncio.run(scenario())
+
+
+def graph_contents(db: Session, graph_id: int) -> tuple[list[str], list[tuple[str, str]]]:
+    nodes, edges = db_get_graph_contents(db, db_get_graph_by_id(db, graph_id))
+    return [node.name for node in nodes], [(edge.source, edge.target) for edge in edges]
+
+
+def create_version(db: Session, graph_id: int, add_names: list[str], remove_names: list[str]) -> Graph:
+    parent: Graph = db_get_graph_by_id(db, graph_id)
+    nodes, edges = db_get_graph_contents(db, parent)
+    return db_create_graph_version(db, parent, nodes, edges, add_names, remove_names,
+                                   [(nodes[0].name, name) for name in add_names], [])
+
+
+def test_shard_router(use_shards):
+    use_shards(3)
+    graph_ids: list[int] = []
+    for _ in range(6):
+        with shard_router.session_for() as db:
+            graph_ids.append(db_create_graph(db, ["a", "b"], [("a", "b")]).id)
+    assert [shard_router.shard_for(graph_id) for graph_id in graph_ids] == [0, 1, 2, 0, 1, 2]
+    assert len(set(graph_ids)) == 6
+
+    with shard_router.session_for(graph_ids[1]) as db:
+        version: Graph = create_version(db, graph_ids[1], ["c"], [])
+        job: IngestJob = db_create_job(db, {})
+    assert version.id % shard_router.buckets == graph_ids[1] % shard_router.buckets
+    assert shard_router.shard_for(job.id) == 1
+
+    with shard_router.session_for(version.id) as db:
+        assert graph_contents(db, version.id) == (["a", "b", "c"], [("a", "b"), ("a", "c")])
+        with pytest.raises(NotFoundError):
+            db_get_graph_by_id(db, graph_ids[0])
+
+        assert [
+            (shard_db.info[SHARD_KEY], shard_graph_ids)
+            for shard_db, shard_graph_ids in shard_router.partition(db, [version.id] + graph_ids)
+        ] == [(0, graph_ids[::3]), (1, [version.id, graph_ids[1], graph_ids[4]]), (2, graph_ids[2::3])]
+
+    with shard_router.session_for(graph_ids[5]) as db:
+        db_delete_graph(db, graph_ids[5])
+        while not db_purge_graph_batch(db, graph_ids[5], 10):
+            pass
+        assert db_create_graph(db, ["a"], []).id > graph_ids[5]
+
+
+def test_rebalance_shards(use_shards):
+    use_shards(1)
+    with SessionLocal(bind=shard_router.get_engine(0)) as db:
+        base: Graph = db_create_graph(db, ["a", "b", "c"], [("a", "b"), ("b", "c")], node_weights={"a": 1.5})
+        first: Graph = create_version(db, base.id, ["d"], ["b"])
+        second: Graph = create_version(db, first.id, ["e"], [])
+        other: Graph = db_create_graph(db, ["x", "y"], [("x", "y")])
+        db_delete_graph(db, db_create_graph(db, ["z"], []).id)
+        job: IngestJob = db_create_job(db, {})
+        db_update_job(db, job, JobStatus.done, graph_id=second.id)
+        expected = {graph.id: graph_contents(db, graph.id) for graph in [base, first, second, other]}
+    assert [base.id, first.id, second.id, other.id, job.id] == [1, 2, 3, 4, 1]
+
+    report = rebalance(shard_router, [], batch_size=2)
+    assert report == {"purged": 1}
+
+    use_shards(2)
+    report = rebalance(shard_router, [], batch_size=2)
+    assert report == {"moved": 2, "materialized": 1, "jobs_moved": 1}
+    for graph_id, contents in expected.items():
+        with shard_router.session_for(graph_id) as db:
+            assert graph_contents(db, graph_id) == contents
+            graph: Graph = db_get_graph_by_id(db, graph_id)
+            assert (graph.parent_id, graph.depth) == (None, 0)
+    with shard_router.session_for(job.id) as db:
+        assert db_get_job_by_id(db, job.id).graph_id == second.id
+    with shard_router.session_for(0) as db:
+        assert [graph.id for graph in db_get_graphs(db)] == [first.id, other.id]
+        assert [event.type for event in db_get_events(db, 0, base.id, limit=None)] == []
+    with shard_router.session_for(1) as db:
+        assert [event.type for event in db_get_events(db, 0, base.id, limit=None)] == ["graph_created"]
+
+    with shard_router.session_for(second.id) as db:
+        third: Graph = create_version(db, second.id, ["f"], [])
+        fourth: Graph = create_version(db, third.id, [], ["a"])
+        expected[third.id] = graph_contents(db, third.id)
+        expected[fourth.id] = graph_contents(db, fourth.id)
+
+    use_shards(3)
+    report = rebalance(shard_router, [], batch_size=2)
+    assert report == {"moved": 5}
+    for graph_id, contents in expected.items():
+        with shard_router.session_for(graph_id) as db:
+            assert graph_contents(db, graph_id) == contents
+    with shard_router.session_for(job.id) as db:
+        assert db_get_job_by_id(db, job.id).graph_id is None
+    with shard_router.session_for(fourth.id) as db:
+        assert db_get_graph_by_id(db, fourth.id).parent_id == third.id
+        assert db_get_graph_by_id(db, third.id).parent_id == second.id
+
+
+def test_rebalance_shards_from_source(use_shards, tmp_path: Path):
+    source_engine = create_db_engine(f"sqlite+pysqlite:///{tmp_path / 'source.db'}")
+    Base.metadata.create_all(source_engine)
+    with SessionLocal(bind=source_engine) as db:
+        base: Graph = db_create_graph(db, ["a", "b"], [("a", "b")])
+        version: Graph = create_version(db, base.id, ["c"], [])
+        expected = {graph.id: graph_contents(db, graph.id) for graph in [base, version]}
+
+    use_shards(2)
+    assert rebalance(shard_router, [str(source_engine.url)], batch_size=100) == {"moved": 2}
+    for graph_id, contents in expected.items():
+        with shard_router.session_for(graph_id) as db:
+            assert graph_contents(db, graph_id) == contents
+    with SessionLocal(bind=source_engine) as db:
+        assert db_get_graphs(db) == []
+    source_engine.dispose()